@@ -1,16 +1,62 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List
+from fastapi import (
+    APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response,
+    WebSocket, WebSocketDisconnect
+)
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from starlette.concurrency import run_in_threadpool
+from contextlib import nullcontext
+from typing import Iterator, List, Optional, Tuple, Union
+import hashlib
+import json
+import logging
+import math
+import time
 
-from app.services.rule_engine import RuleEngine, CorrectionResult
+from app.core.compression import strip_encoding_suffix
+from app.core.database import SessionLocal
+from app.core.lifecycle import (
+    EngineState, get_engine_state, get_job_broker, get_memory_stats, get_rule_engine,
+    get_scheduler
+)
+from app.services.corrections import CorrectionStore
+from app.services.history_index import HISTORY_RECORDING, record_history
+from app.services.jobs import JobBroker, JobError
+from app.services.live_checker import LiveCheckSession
+from app.services.memory_accounting import (
+    MEMORY_BUDGET_ACTION, MEMORY_REQUEST_BUDGET, MemoryBudgetExceeded, MemoryStats,
+    StageTracker, memory_stage, project_check_bytes, project_text_bytes
+)
+from app.services.rule_engine import (
+    FIXPOINT_MAX_ITERATIONS, FixpointResult, RuleEngine
+)
+from app.services.scheduler import (
+    Lane, LaneScheduler, SchedulerRejected, classify_lane, client_id
+)
+from app.services.shadow import ShadowSample
+from app.services.tenants import TENANT_HEADER, TenantError, TenantRegistry
 
 
+logger = logging.getLogger(__name__)
+
+# 省メモリのストリーミングで返すときに1回に送る修正の件数
+STREAM_BATCH_SIZE = 256
+
 router = APIRouter(prefix="/api/v1/proofreading", tags=["proofreading"])
 
 
 class ProofreadingRequest(BaseModel):
     text: str
     apply_corrections: bool = False
+    # 修正で新たに生じた誤りがなくなるまで適用を繰り返す
+    apply_until_stable: bool = False
+    max_iterations: int = Field(FIXPOINT_MAX_ITERATIONS, ge=1, le=20)
+
+
+class LiveCheckMessage(BaseModel):
+    revision: int
+    text: str
+    apply_corrections: bool = False
 
 
 class CorrectionResponse(BaseModel):
@@ -24,61 +70,430 @@ class CorrectionResponse(BaseModel):
     confidence: float
 
 
+class CorrectionStepResponse(CorrectionResponse):
+    # 何回目の適用か（位置はその回の適用前のテキスト上）
+    iteration: int
+
+
 class ProofreadingResponse(BaseModel):
     original_text: str
     corrected_text: str
     corrections: List[CorrectionResponse]
     ai_processing_recommended: bool
+    # apply_until_stable のときだけ設定
+    correction_chain: Optional[List[CorrectionStepResponse]] = None
+    iterations: Optional[int] = None
+    converged: Optional[bool] = None
 
 
-# ルールエンジンのインスタンスを作成
-rule_engine = RuleEngine()
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
 
 
-@router.post("/check", response_model=ProofreadingResponse)
-async def check_text(request: ProofreadingRequest):
-    """テキストの校正チェック"""
-    try:
-        # ルールベースチェック実行
-        corrections = rule_engine.check_text(request.text)
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    progress: float
+    processed_chars: int
+    total_chars: int
+    correction_count: int
+    truncated: bool
+    # offset 件目以降の校正結果（次回は next_offset から取得する）
+    corrections: List[CorrectionResponse]
+    next_offset: int
+    corrected_text: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _stream_response(
+    text: str,
+    corrected_text: str,
+    corrections: CorrectionStore,
+    ai_recommended: bool,
+    fixpoint: Optional[FixpointResult]
+) -> Iterator[bytes]:
+    """ProofreadingResponse と同じ JSON を、修正を少しずつ直列化して生成
+    
+    レスポンスのモデルと JSON 全体をメモリに持たない。
+    """
+    def dumps(value) -> str:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    
+    def array(records) -> Iterator[bytes]:
+        separator = ""
+        batch = []
+        for record in records:
+            batch.append(dumps(record))
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield (separator + ",".join(batch)).encode("utf-8")
+                separator, batch = ",", []
+        if batch:
+            yield (separator + ",".join(batch)).encode("utf-8")
+    
+    yield (
+        '{"original_text":%s,"corrected_text":%s,"corrections":['
+        % (dumps(text), dumps(corrected_text))
+    ).encode("utf-8")
+    yield from array(corrections.records())
+    yield ('],"ai_processing_recommended":%s' % dumps(ai_recommended)).encode("utf-8")
+    if fixpoint is None:
+        yield b',"correction_chain":null,"iterations":null,"converged":null}'
+        return
+    yield b',"correction_chain":['
+    yield from array(
+        {**vars(correction), "iteration": iteration}
+        for iteration, round_corrections in enumerate(fixpoint.rounds, 1)
+        for correction in round_corrections
+    )
+    yield (
+        '],"iterations":%d,"converged":%s}'
+        % (fixpoint.iterations, dumps(fixpoint.converged))
+    ).encode("utf-8")
+
+
+def _run_check(
+    rule_engine: RuleEngine,
+    request: ProofreadingRequest,
+    tenants: Optional[TenantRegistry] = None,
+    tenant_id: Optional[str] = None,
+    shadow: bool = False,
+    tracker: Optional[StageTracker] = None,
+    budget: int = 0
+) -> Tuple[Union[ProofreadingResponse, StreamingResponse], Optional[ShadowSample]]:
+    """校正処理本体（スケジューラーのワーカースレッドで実行）
+    
+    shadow のときは、候補ルールセットと比べるための結果と CPU 時間も返す。
+    tracker にはこのスレッドでの段階ごとのメモリ確保を記録する。
+    修正件数から見積もった使用量が budget を超える場合は、MEMORY_BUDGET_ACTION に
+    従って MemoryBudgetExceeded を送出するか、ストリーミングのレスポンスを返す。
+    """
+    with tracker.activate() if tracker is not None else nullcontext():
+        # ルールベースチェック実行（結果は列指向のまま保持）
+        cpu_started = time.thread_time()
+        if tenants is not None:
+            corrections = tenants.check_text_compact(tenant_id, request.text)
+        else:
+            corrections = rule_engine.check_text_compact(request.text)
+        sample = None
+        if shadow:
+            sample = ShadowSample(
+                request.text, corrections, time.thread_time() - cpu_started
+            )
+        
+        compact = False
+        if budget > 0:
+            projected = project_check_bytes(len(request.text), len(corrections))
+            if projected > budget:
+                if MEMORY_BUDGET_ACTION == "reject":
+                    raise MemoryBudgetExceeded(projected, budget)
+                compact = True
         
         # 修正を適用するかどうか
         corrected_text = request.text
-        if request.apply_corrections:
-            corrected_text = rule_engine.apply_corrections(request.text, corrections)
+        fixpoint = None
+        with memory_stage("apply"):
+            if request.apply_until_stable:
+                # 2回目以降の再チェックにも1回目と同じテナントの差分を重ねる
+                if tenants is not None:
+                    fixpoint = tenants.apply_until_stable(
+                        tenant_id, request.text, request.max_iterations, corrections
+                    )
+                else:
+                    fixpoint = rule_engine.apply_until_stable(
+                        request.text, request.max_iterations, initial=corrections
+                    )
+                corrected_text = fixpoint.text
+            elif request.apply_corrections:
+                corrected_text = corrections.apply()
         
         # AI処理が推奨されるかチェック
         ai_recommended = rule_engine.should_apply_ai_processing(request.text)
         
+        if compact:
+            # レスポンスのモデルを組み立てずに列指向の結果から直接返す
+            return StreamingResponse(
+                _stream_response(
+                    request.text, corrected_text, corrections, ai_recommended, fixpoint
+                ),
+                media_type="application/json",
+                headers={"X-Response-Mode": "compact"}
+            ), sample
+        
         # レスポンス形式に変換
-        correction_responses = [
-            CorrectionResponse(
-                original_text=c.original_text,
-                corrected_text=c.corrected_text,
-                start_pos=c.start_pos,
-                end_pos=c.end_pos,
-                rule_name=c.rule_name,
-                category=c.category,
-                description=c.description,
-                confidence=c.confidence
+        with memory_stage("serialize"):
+            correction_responses = [
+                CorrectionResponse(**record) for record in corrections.records()
+            ]
+            
+            response = ProofreadingResponse(
+                original_text=request.text,
+                corrected_text=corrected_text,
+                corrections=correction_responses,
+                ai_processing_recommended=ai_recommended
             )
-            for c in corrections
-        ]
-        
-        return ProofreadingResponse(
-            original_text=request.text,
-            corrected_text=corrected_text,
-            corrections=correction_responses,
-            ai_processing_recommended=ai_recommended
+            if fixpoint is not None:
+                response.correction_chain = [
+                    CorrectionStepResponse(iteration=iteration, **vars(correction))
+                    for iteration, round_corrections in enumerate(fixpoint.rounds, 1)
+                    for correction in round_corrections
+                ]
+                response.iterations = fixpoint.iterations
+                response.converged = fixpoint.converged
+        return response, sample
+
+
+def _matching_etag(connection: Request, etag: str) -> Optional[str]:
+    """If-None-Match のうち ETag に一致するもの（弱い比較、圧縮の接尾辞は無視）
+
+    304 にはクライアントが持っている表現の ETag（接尾辞付きならそのまま）を返す。
+    """
+    header = connection.headers.get("if-none-match")
+    if not header:
+        return None
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return etag
+        candidate = candidate.removeprefix("W/")
+        if strip_encoding_suffix(candidate) == etag:
+            return candidate
+    return None
+
+
+def _check_etag(
+    rule_engine: RuleEngine,
+    request: ProofreadingRequest,
+    tenants: Optional[TenantRegistry],
+    tenant_id: Optional[str]
+) -> str:
+    """校正結果の ETag
+    
+    結果は本文・オプション・ルールセット（と語彙表などの指紋）・テナントの差分で
+    決まるので、それらのハッシュを ETag にする。
+    """
+    overlay = tenants.get(tenant_id) if tenants is not None else None
+    key = {
+        "version": rule_engine.result_version,
+        "tenant": [overlay.tenant_id, overlay.mtime_ns] if overlay else None,
+        "options": request.model_dump(exclude={"text"}),
+        "text": hashlib.sha256(request.text.encode("utf-8")).hexdigest()
+    }
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8"))
+    return '"%s"' % digest.hexdigest()[:32]
+
+
+def _record_history(result: ProofreadingResponse, elapsed_ms: float) -> None:
+    """校正結果を履歴（とルールのプレビュー用の索引）に書き込む
+    
+    索引の行数は本文の長さに比例するので、レスポンスを返したあとに
+    バックグラウンドタスクとして専用のセッションで書き込む。
+    """
+    db = SessionLocal()
+    try:
+        record_history(
+            db,
+            result.original_text,
+            result.corrected_text,
+            [correction.model_dump() for correction in result.corrections],
+            int(elapsed_ms)
+        )
+    except Exception:
+        logger.exception("Failed to record proofreading history")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def _budget_rejected(
+    memory_stats: MemoryStats, error: MemoryBudgetExceeded
+) -> HTTPException:
+    """メモリ予算を超えるリクエストを断るときの 413"""
+    memory_stats.record_rejected()
+    return HTTPException(
+        status_code=413, detail=f"{error}（長い文書は POST /jobs を使ってください）"
+    )
+
+
+@router.post("/check", response_model=ProofreadingResponse)
+async def check_text(
+    request: ProofreadingRequest,
+    connection: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    rule_engine: RuleEngine = Depends(get_rule_engine),
+    scheduler: LaneScheduler = Depends(get_scheduler),
+    memory_stats: MemoryStats = Depends(get_memory_stats)
+):
+    """テキストの校正チェック
+    
+    X-Priority-Lane ヘッダー（interactive / standard / bulk）で優先度を、
+    X-Tenant-Id ヘッダーでテナントごとのルール差分を指定できる。
+    同じ本文・オプション・ルールセットのリクエストには同じ ETag を返すので、
+    If-None-Match を付けた再送にはチェックせずに 304 を返す。
+    
+    候補ルールセットのシャドー評価が有効なら、抽出したリクエストをレスポンスを
+    返したあとに評価待ちに入れる。
+    
+    修正件数から見積もったメモリ使用量が MEMORY_REQUEST_BUDGET を超える場合は
+    413 を返すか、同じ JSON をストリーミングで返す（X-Response-Mode: compact）。
+    413 を返す設定なら、チェックを始める前に文字数からも見積もる。
+    """
+    # 本文の解析はここまで（計測は app.core.memory のミドルウェアで開始）
+    tracker = getattr(connection.state, "memory_tracker", None)
+    if tracker is not None:
+        tracker.end_stage("parse")
+    if MEMORY_REQUEST_BUDGET > 0 and MEMORY_BUDGET_ACTION == "reject":
+        projected = project_text_bytes(len(request.text))
+        if projected > MEMORY_REQUEST_BUDGET:
+            raise _budget_rejected(
+                memory_stats, MemoryBudgetExceeded(projected, MEMORY_REQUEST_BUDGET)
+            )
+    lane = classify_lane(connection, Lane.STANDARD)
+    state = get_engine_state(connection)
+    tenants = state.tenants
+    tenant_id = connection.headers.get(TENANT_HEADER)
+    try:
+        etag = await run_in_threadpool(
+            _check_etag, rule_engine, request, tenants, tenant_id
         )
+    except TenantError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    matched = _matching_etag(connection, etag)
+    if matched is not None:
+        return Response(status_code=304, headers={"ETag": matched})
+    response.headers["ETag"] = etag
     
+    # テナントの差分を重ねた結果は候補ルールセットと比べられない
+    shadow = state.shadow if not tenant_id else None
+    started = time.perf_counter()
+    try:
+        result, sample = await scheduler.submit(
+            lane,
+            client_id(connection),
+            _run_check,
+            rule_engine,
+            request,
+            tenants,
+            tenant_id,
+            shadow is not None and shadow.should_sample(),
+            tracker,
+            MEMORY_REQUEST_BUDGET
+        )
+    
+    except MemoryBudgetExceeded as e:
+        raise _budget_rejected(memory_stats, e)
+    except SchedulerRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    except TenantError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"校正処理中にエラーが発生しました: {str(e)}")
+    
+    if sample is not None:
+        background_tasks.add_task(shadow.submit, sample)
+    if isinstance(result, StreamingResponse):
+        # 省メモリで返すレスポンスは履歴に書き込まない
+        memory_stats.record_compacted()
+        result.headers["ETag"] = etag
+        result.background = background_tasks
+        return result
+    
+    if HISTORY_RECORDING:
+        background_tasks.add_task(
+            _record_history, result, (time.perf_counter() - started) * 1000
+        )
+    if tracker is not None:
+        # FastAPI による直列化（レスポンスの送信開始でミドルウェアが閉じる）
+        tracker.begin("serialize")
+    return result
+
+
+@router.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(
+    request: ProofreadingRequest,
+    connection: Request,
+    broker: JobBroker = Depends(get_job_broker)
+):
+    """長い文書の校正ジョブを登録（結果は GET /jobs/{job_id} で取得）
+    
+    X-Tenant-Id ヘッダーを付けると、/check と同じくテナントの差分を重ねてチェックする。
+    """
+    tenant_id = connection.headers.get(TENANT_HEADER, "")
+    tenants = get_engine_state(connection).tenants
+    if tenant_id and tenants is not None:
+        try:
+            await run_in_threadpool(tenants.get, tenant_id)
+        except TenantError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        job = await run_in_threadpool(
+            broker.submit, request.text, request.apply_corrections, tenant_id
+        )
+    except JobError as e:
+        headers = {"Retry-After": "5"} if e.status_code == 503 else None
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+    return JobSubmitResponse(job_id=job.job_id, status=job.status.value)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(
+    job_id: str,
+    offset: int = 0,
+    limit: int = 1000,
+    broker: JobBroker = Depends(get_job_broker)
+):
+    """ジョブの状態・進捗と、offset 件目から最大 limit 件の校正結果"""
+    job = await run_in_threadpool(broker.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    
+    offset = max(0, offset)
+    records = await run_in_threadpool(
+        broker.corrections, job_id, offset, max(0, min(limit, 10000))
+    )
+    return JobStatusResponse(
+        job_id=job.job_id,
+        status=job.status.value,
+        progress=job.progress,
+        processed_chars=job.processed_chars,
+        total_chars=job.total_chars,
+        correction_count=job.correction_count,
+        truncated=job.truncated,
+        corrections=[CorrectionResponse(**record) for record in records],
+        next_offset=offset + len(records),
+        corrected_text=job.corrected_text,
+        error=job.error or None
+    )
 
 
 @router.get("/rules")
-async def get_rules():
-    """利用可能なルール一覧を取得"""
+async def get_rules(
+    connection: Request,
+    response: Response,
+    version: Optional[str] = None,
+    rule_engine: RuleEngine = Depends(get_rule_engine)
+):
+    """利用可能なルール一覧を取得
+    
+    ルールセットの指紋を ETag と X-Ruleset-Version ヘッダーで返す。
+    version にその指紋を付けた URL は内容が変わらないので長期間キャッシュできる。
+    """
+    etag = '"%s"' % rule_engine.fingerprint
+    headers = {"ETag": etag, "X-Ruleset-Version": rule_engine.fingerprint}
+    if version == rule_engine.fingerprint:
+        headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        headers["Cache-Control"] = "public, max-age=0, must-revalidate"
+    matched = _matching_etag(connection, etag)
+    if matched is not None:
+        return Response(status_code=304, headers={**headers, "ETag": matched})
+    response.headers.update(headers)
+    
     try:
         rules_info = []
         for rule in rule_engine.rules:
@@ -95,11 +510,77 @@ async def get_rules():
         raise HTTPException(status_code=500, detail=f"ルール取得中にエラーが発生しました: {str(e)}")
 
 
+@router.get("/shadow/report")
+async def get_shadow_report(
+    reset: bool = False,
+    state: EngineState = Depends(get_engine_state)
+):
+    """候補ルールセットのシャドー評価の集計（reset で集計をやり直す）"""
+    await state.wait_ready()
+    if state.shadow is None:
+        return {"enabled": False}
+    report = state.shadow.report()
+    if reset:
+        state.shadow.reset()
+    return report
+
+
+@router.get("/metrics")
+async def get_metrics(
+    scheduler: LaneScheduler = Depends(get_scheduler),
+    state: EngineState = Depends(get_engine_state),
+    broker: JobBroker = Depends(get_job_broker),
+    memory_stats: MemoryStats = Depends(get_memory_stats)
+):
+    """レーンごとの待ち行列・待ち時間、キャッシュ状況、ジョブの待ち行列、段階ごとのメモリ使用量"""
+    metrics = {"scheduler": scheduler.metrics()}
+    metrics["jobs"] = {"queue_depth": await run_in_threadpool(broker.queue_depth)}
+    if state.tenants is not None:
+        metrics["tenants"] = state.tenants.metrics()
+    if state.rule_engine is not None and state.rule_engine.paragraph_cache is not None:
+        metrics["paragraph_cache"] = state.rule_engine.paragraph_cache.metrics()
+    metrics["memory"] = memory_stats.snapshot()
+    return metrics
+
+
 @router.get("/health")
-async def health_check():
-    """ルールエンジンのヘルスチェック"""
+async def health_check(state: EngineState = Depends(get_engine_state)):
+    """ルールエンジンのヘルスチェック（準備完了までは待たずに 503 を返す）"""
+    if not state.ready:
+        return state.not_ready_response()
     return {
         "status": "healthy",
-        "rules_loaded": len(rule_engine.rules),
-        "engine_version": "1.0.0"
-    }
\ No newline at end of file
+        "rules_loaded": len(state.rule_engine.rules),
+        "engine_version": "1.0.0",
+        "startup_timings": state.startup_timings
+    }
+
+
+@router.websocket("/live")
+async def live_check(websocket: WebSocket):
+    """入力中テキストのライブ校正
+    
+    クライアントは {"revision", "text"} を送り続け、サーバーは入力が落ち着いた
+    時点の最新リビジョンの結果だけを返す。
+    """
+    await websocket.accept()
+    rule_engine = await get_engine_state(websocket).wait_ready()
+    session = LiveCheckSession(
+        rule_engine,
+        websocket.send_json,
+        scheduler=get_scheduler(websocket),
+        client_id=client_id(websocket)
+    )
+    
+    try:
+        while True:
+            try:
+                message = LiveCheckMessage(**await websocket.receive_json())
+            except (ValidationError, TypeError, ValueError) as e:
+                await websocket.send_json({"error": f"不正なメッセージです: {str(e)}"})
+                continue
+            session.submit(message.revision, message.text, message.apply_corrections)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
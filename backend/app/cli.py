@@ -0,0 +1,286 @@
+"""
+コマンドラインツール
+
+    python -m app.cli proofread corpus/ -o results.jsonl --workers 8
+    python -m app.cli build-bundle -o rules.bundle
+    python -m app.cli build-typo-index lexicon.txt -o lexicon.idx
+    python -m app.cli build-ngram-table corpus.txt -o misconversion.tbl
+    python -m app.cli job-worker --broker redis://localhost:6379/0 --processes 4
+    python -m app.cli index-history
+    python -m app.cli lint-rules --strict
+    python -m app.cli preview-rule new_rule.yml --samples 20
+    python -m app.cli loadtest --url http://127.0.0.1:8000 -o report.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import yaml
+
+from app.core.database import SessionLocal
+from app.services.bulk_proofreader import BulkProofreader
+from app.services.grammar_checker import GrammarChecker
+from app.services.history_index import backfill_index, preview_rule
+from app.services.jobs import JOB_BROKER_URL, run_worker_pool
+from app.services.misconversion import (
+    DEFAULT_CONFUSABLES,
+    DEFAULT_CONTEXT,
+    NgramTable,
+    build_ngram_table,
+)
+from app.services.rule_compiler import prune_ruleset
+from app.services.rule_engine import DEFAULT_RULES_DIR, RuleEngine, parse_rules
+from app.services.typo_checker import (
+    TypoIndex,
+    lexicon_fingerprint,
+    read_lexicon,
+    write_typo_index,
+)
+from app.utils.loadtest import LoadGenerator, compare_reports, local_server, parse_mix
+
+
+def _proofread(args: argparse.Namespace) -> int:
+    """一括校正コマンド"""
+    proofreader = BulkProofreader(
+        output_path=args.output,
+        workers=args.workers,
+        ordered=not args.unordered,
+        rules_dir=args.rules_dir,
+        bundle_path=args.bundle,
+        apply_corrections=args.apply_corrections,
+        checkpoint_interval=args.checkpoint_interval,
+        chunksize=args.chunksize,
+    )
+    stats = proofreader.run(args.inputs, resume=args.resume)
+    print(stats.summary(), file=sys.stderr)
+    return 0
+
+
+def _build_bundle(args: argparse.Namespace) -> int:
+    """ルールセットバンドルの作成コマンド"""
+    engine = RuleEngine(args.rules_dir, bundle_path=args.output)
+    pattern_count = sum(len(rule.patterns) for rule in engine.rules)
+    print(
+        f"{args.output}: {len(engine.rules)} rules, {pattern_count} patterns, "
+        f"fingerprint {engine.fingerprint}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def _build_typo_index(args: argparse.Namespace) -> int:
+    """誤字チェック用の削除索引の作成コマンド"""
+    write_typo_index(
+        args.output,
+        read_lexicon(args.lexicon),
+        lexicon_fingerprint(args.lexicon),
+        max_distance=args.max_distance,
+        prefix_length=args.prefix_length,
+    )
+    index = TypoIndex(args.output)
+    print(
+        f"{args.output}: {len(index)} words, max distance {index.max_distance}, "
+        f"prefix length {index.prefix_length}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def _build_ngram_table(args: argparse.Namespace) -> int:
+    """誤変換チェック用の n-gram 頻度表の作成コマンド"""
+    build_ngram_table(
+        args.output,
+        args.corpus,
+        confusables_path=args.confusables,
+        context=args.context,
+    )
+    table = NgramTable(args.output)
+    print(
+        f"{args.output}: {len(table.groups)} groups, {len(table)} n-grams, "
+        f"context {table.context}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def _job_worker(args: argparse.Namespace) -> int:
+    """非同期ジョブのワーカープロセス群"""
+    run_worker_pool(
+        args.broker, args.processes, rules_dir=args.rules_dir, bundle_path=args.bundle
+    )
+    return 0
+
+
+def _lint_rules(args: argparse.Namespace) -> int:
+    """ルールセットの冗長なパターンを解析するコマンド"""
+    rules = []
+    for rule_file in sorted(Path(args.rules_dir or DEFAULT_RULES_DIR).glob("*.yml")):
+        with open(rule_file, "r", encoding="utf-8") as f:
+            rules.extend(parse_rules(yaml.safe_load(f) or {}))
+    rules.sort(key=lambda rule: rule.priority)
+
+    _, report = prune_ruleset(rules, GrammarChecker.LOCAL_CHECKS)
+    print(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+    print(
+        f"{report.patterns_before} patterns -> {report.patterns_after} patterns",
+        file=sys.stderr,
+    )
+    return 1 if args.strict and report.findings else 0
+
+
+def _index_history(args: argparse.Namespace) -> int:
+    """校正履歴の3-gram 索引の作成コマンド（索引のない履歴だけを追加）"""
+    with SessionLocal() as db:
+        indexed = backfill_index(db, batch_size=args.batch_size)
+    print(f"indexed {indexed} documents", file=sys.stderr)
+    return 0
+
+
+def _preview_rule(args: argparse.Namespace) -> int:
+    """ルールを過去の校正履歴に当てた結果を表示するコマンド"""
+    with open(args.rule_file, "r", encoding="utf-8") as f:
+        rules = parse_rules(yaml.safe_load(f) or {})
+    engine = RuleEngine(args.rules_dir)
+    with SessionLocal() as db:
+        for rule in rules:
+            preview = preview_rule(db, engine, rule, sample_limit=args.samples)
+            print(json.dumps(preview.to_dict(), ensure_ascii=False, indent=2))
+    return 0
+
+
+def _loadtest(args: argparse.Namespace) -> int:
+    """負荷試験コマンド"""
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    def run(base_url: str) -> dict:
+        generator = LoadGenerator(base_url, parse_mix(args.mix), seed=args.seed)
+        return asyncio.run(generator.sweep(levels, args.requests))
+
+    if args.start_server:
+        with local_server(args.port, args.server_workers) as base_url:
+            report = run(base_url)
+    else:
+        report = run(args.url)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_reports(json.load(f), report, args.max_regression)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    proofread = subparsers.add_parser("proofread", help="ディレクトリ・JSONL コーパスを一括校正")
+    proofread.add_argument("inputs", nargs="+", help=".txt / .jsonl ファイルまたはディレクトリ")
+    proofread.add_argument("-o", "--output", required=True, help="出力 JSONL")
+    proofread.add_argument(
+        "--workers", type=int, default=None, help="ワーカープロセス数（0で単一プロセス）"
+    )
+    proofread.add_argument("--unordered", action="store_true", help="完了順に出力（入力順を保たない）")
+    proofread.add_argument("--rules-dir", default=None, help="ルールディレクトリ")
+    proofread.add_argument("--bundle", default=None, help="コンパイル済みルールセットバンドル")
+    proofread.add_argument(
+        "--apply-corrections", action="store_true", help="修正後テキストも出力"
+    )
+    proofread.add_argument("--resume", action="store_true", help="チェックポイントから再開")
+    proofread.add_argument(
+        "--checkpoint-interval", type=int, default=1000, help="チェックポイント間隔（文書数）"
+    )
+    proofread.add_argument("--chunksize", type=int, default=16, help="ワーカーへの一括送信数")
+    proofread.set_defaults(func=_proofread)
+
+    build_bundle = subparsers.add_parser("build-bundle", help="ルールセットをコンパイルしてバンドルを作成")
+    build_bundle.add_argument("-o", "--output", required=True, help="出力バンドル")
+    build_bundle.add_argument("--rules-dir", default=None, help="ルールディレクトリ")
+    build_bundle.set_defaults(func=_build_bundle)
+
+    typo_index = subparsers.add_parser("build-typo-index", help="語彙表から誤字チェック用の索引を作成")
+    typo_index.add_argument("lexicon", help="語彙表（1行1語、タブ区切りで頻度）")
+    typo_index.add_argument("-o", "--output", required=True, help="出力する索引")
+    typo_index.add_argument("--max-distance", type=int, default=2, help="最大編集距離")
+    typo_index.add_argument("--prefix-length", type=int, default=7, help="索引に使う先頭の文字数")
+    typo_index.set_defaults(func=_build_typo_index)
+
+    ngram_table = subparsers.add_parser(
+        "build-ngram-table", help="コーパスから誤変換チェック用の頻度表を作成"
+    )
+    ngram_table.add_argument("corpus", nargs="+", help="コーパス（UTF-8 テキスト）")
+    ngram_table.add_argument("-o", "--output", required=True, help="出力する頻度表")
+    ngram_table.add_argument(
+        "--confusables", default=str(DEFAULT_CONFUSABLES), help="取り違えやすい語の組の定義"
+    )
+    ngram_table.add_argument(
+        "--context", type=int, default=DEFAULT_CONTEXT, help="語の前後に見る文脈の文字数"
+    )
+    ngram_table.set_defaults(func=_build_ngram_table)
+
+    job_worker = subparsers.add_parser("job-worker", help="非同期校正ジョブのワーカーを起動")
+    job_worker.add_argument("--broker", default=JOB_BROKER_URL, help="ブローカーの URL")
+    job_worker.add_argument("--processes", type=int, default=2, help="ワーカープロセス数")
+    job_worker.add_argument("--rules-dir", default=None, help="ルールディレクトリ")
+    job_worker.add_argument("--bundle", default=None, help="コンパイル済みルールセットバンドル")
+    job_worker.set_defaults(func=_job_worker)
+
+    lint_rules = subparsers.add_parser("lint-rules", help="重複・包含・自己置換・到達しないパターンを報告")
+    lint_rules.add_argument("--rules-dir", default=None, help="ルールディレクトリ")
+    lint_rules.add_argument("--strict", action="store_true", help="冗長なパターンがあれば終了コード 1")
+    lint_rules.set_defaults(func=_lint_rules)
+
+    index_history = subparsers.add_parser(
+        "index-history", help="校正履歴の3-gram 索引を作成（索引のない履歴を追加）"
+    )
+    index_history.add_argument(
+        "--batch-size", type=int, default=500, help="一度に処理する履歴の件数"
+    )
+    index_history.set_defaults(func=_index_history)
+
+    preview = subparsers.add_parser("preview-rule", help="ルールを過去の校正履歴に当てた結果を表示")
+    preview.add_argument("rule_file", help="ルールファイル（ルール定義と同じ YAML 形式）")
+    preview.add_argument("--samples", type=int, default=10, help="表示する修正例の件数")
+    preview.add_argument("--rules-dir", default=None, help="ルールディレクトリ")
+    preview.set_defaults(func=_preview_rule)
+
+    loadtest = subparsers.add_parser("loadtest", help="/check の負荷試験")
+    loadtest.add_argument("--url", default="http://127.0.0.1:8000", help="対象サーバー")
+    loadtest.add_argument("--start-server", action="store_true", help="uvicorn を起動して計測")
+    loadtest.add_argument("--port", type=int, default=8765, help="起動するサーバーのポート")
+    loadtest.add_argument(
+        "--server-workers", type=int, default=1, help="起動するサーバーのワーカー数"
+    )
+    loadtest.add_argument(
+        "--mix", default="chat=0.8,article=0.19,manuscript=0.01", help="トラフィック構成"
+    )
+    loadtest.add_argument("--concurrency", default="1,4,16,64", help="同時接続数の一覧")
+    loadtest.add_argument("--requests", type=int, default=200, help="同時接続数ごとのリクエスト数")
+    loadtest.add_argument("--seed", type=int, default=0, help="乱数シード")
+    loadtest.add_argument("-o", "--output", default=None, help="レポートの出力先 JSON")
+    loadtest.add_argument("--baseline", default=None, help="比較する基準レポート")
+    loadtest.add_argument("--max-regression", type=float, default=0.2, help="許容する悪化の割合")
+    loadtest.set_defaults(func=_loadtest)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
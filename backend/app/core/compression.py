@@ -0,0 +1,137 @@
+"""
+レスポンスの圧縮
+
+Accept-Encoding で br（brotli がインストールされている場合）か gzip を受け付ける
+クライアントに、COMPRESSION_MIN_SIZE バイト以上のレスポンスを圧縮して返す。
+校正結果は長い日本語の文字列と繰り返しの多い説明文なので、よく縮む。
+ストリーミングのレスポンス（本文が複数回に分かれるもの）はそのまま流す。
+
+圧縮した表現は圧縮していない表現とバイト列が違うので、ETag に符号化の接尾辞
+（"<etag>-gzip" / "<etag>-br"）を付けて区別する。If-None-Match の照合では
+接尾辞を外して比べる（strip_encoding_suffix）。
+"""
+
+import gzip
+import os
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # br は任意の依存関係
+    brotli = None
+
+# この大きさ（バイト）以上のレスポンスを圧縮する
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """Accept-Encoding を {符号化: q 値} に変換"""
+    accepted: Dict[str, float] = {}
+    for item in value.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, number = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """使う符号化（br を優先、q=0 は拒否）"""
+    accepted = parse_accept_encoding(accept_encoding)
+    candidates: List[Tuple[float, int, str]] = []
+    for priority, name in enumerate(("br", "gzip")):
+        if name == "br" and brotli is None:
+            continue
+        quality = accepted.get(name, accepted.get("*", 0.0))
+        if quality > 0:
+            candidates.append((quality, -priority, name))
+    return max(candidates)[2] if candidates else None
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """圧縮した表現の ETag（引用符の内側に接尾辞を付ける）"""
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return f"{etag}-{encoding}"
+
+
+def strip_encoding_suffix(etag: str) -> str:
+    """ETag から符号化の接尾辞を外す"""
+    for encoding in ("br", "gzip"):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """大きなレスポンスを br / gzip で圧縮する ASGI ミドルウェア"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        streaming = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, streaming
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+
+            assert start is not None
+            headers = MutableHeaders(scope=start)
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # ストリーミングは圧縮しない
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= self.minimum_size and "content-encoding" not in headers:
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                message = {**message, "body": body}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,205 @@
+"""
+アプリケーションの起動・終了処理
+
+ルールエンジンの構築とウォームアップは lifespan 内のバックグラウンドタスクで
+行う。その間も liveness には応答し、readiness（/health/ready と
+/api/v1/proofreading/health）はウォームアップ完了まで 503 を返す。
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection
+
+from app.services.jobs import InlineWorkers, JobBroker, create_broker
+from app.services.memory_accounting import MemoryStats, start_tracking
+from app.services.paragraph_cache import PARAGRAPH_CACHE_BYTES, ParagraphCache
+from app.services.parallel import PARALLEL_CHECK_WORKERS, ParallelChecker
+from app.services.rule_engine import RuleEngine
+from app.services.scheduler import LaneScheduler
+from app.services.shadow import ShadowEvaluator, create_shadow_evaluator
+from app.services.tenants import TenantRegistry
+
+logger = logging.getLogger(__name__)
+
+# ウォームアップ用の代表的なテキスト（全ルール種別・文法チェックを通す）
+WARMUP_TEXTS = [
+    "こんにちは。",
+    "このケーキは食べれる。頭痛が痛いので後で後悔する（笑）。",
+    "私はは学校は行く。本をを読みます。すいません、させて頂きます。",
+    "これは例文である。これは例文です。大きい犬がいます。１２３。",
+    "これは長い文章のテストです。" * 20,
+]
+
+
+@dataclass
+class EngineState:
+    """ルールエンジンの起動状態"""
+
+    rule_engine: Optional[RuleEngine] = None
+    # テナントごとのルール差分（共有のルールエンジンに重ねる）
+    tenants: Optional[TenantRegistry] = None
+    # 候補ルールセットのシャドー評価（SHADOW_RULES_DIR を設定した場合）
+    shadow: Optional[ShadowEvaluator] = None
+    ready: bool = False
+    error: Optional[str] = None
+    # 起動段階ごとの所要時間（秒）
+    startup_timings: Dict[str, float] = field(default_factory=dict)
+    ready_event: asyncio.Event = field(default_factory=asyncio.Event)
+
+    async def wait_ready(self) -> RuleEngine:
+        """ウォームアップ完了を待ってルールエンジンを返す"""
+        await self.ready_event.wait()
+        if self.rule_engine is None:
+            raise HTTPException(
+                status_code=503, detail=f"ルールエンジンの初期化に失敗しました: {self.error}"
+            )
+        return self.rule_engine
+
+    def not_ready_response(self) -> JSONResponse:
+        """ウォームアップ完了前・初期化失敗時の 503 レスポンス"""
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "failed" if self.error else "starting",
+                "error": self.error,
+                "startup_timings": self.startup_timings,
+            },
+        )
+
+
+def warmup(engine: RuleEngine) -> None:
+    """代表的なテキストで全段階を一度実行し、初回呼び出しのコストを払っておく"""
+    for text in WARMUP_TEXTS:
+        corrections = engine.check_text_compact(text)
+        corrections.apply()
+        list(corrections.records())
+        engine.apply_corrections(text, engine.check_text(text))
+        engine.should_apply_ai_processing(text)
+        engine.grammar_checker.analyze_morphemes(text)
+
+
+def initialize_engine(
+    state: EngineState, busy: Optional[Callable[[], bool]] = None
+) -> RuleEngine:
+    """ルールエンジンを構築してウォームアップ
+
+    busy はシャドー評価を見送るかの判定（スケジューラーに処理待ちがあるか）。
+    """
+    started = time.perf_counter()
+    engine = RuleEngine()
+    state.startup_timings.update(engine.load_timings)
+    state.startup_timings["engine"] = time.perf_counter() - started
+    if PARALLEL_CHECK_WORKERS > 1:
+        engine.parallel = ParallelChecker(engine)
+    if PARAGRAPH_CACHE_BYTES > 0:
+        engine.paragraph_cache = ParagraphCache(engine, max_bytes=PARAGRAPH_CACHE_BYTES)
+    state.tenants = TenantRegistry(engine)
+
+    warmup_started = time.perf_counter()
+    warmup(engine)
+    state.startup_timings["warmup"] = time.perf_counter() - warmup_started
+
+    shadow_started = time.perf_counter()
+    state.shadow = create_shadow_evaluator(engine, busy=busy)
+    if state.shadow is not None:
+        warmup(state.shadow.candidate)
+        state.startup_timings["shadow"] = time.perf_counter() - shadow_started
+    return engine
+
+
+async def _start_engine(
+    state: EngineState, busy: Optional[Callable[[], bool]] = None
+) -> None:
+    started = time.perf_counter()
+    try:
+        state.rule_engine = await run_in_threadpool(initialize_engine, state, busy)
+        state.ready = True
+    except Exception as e:
+        state.error = str(e)
+        logger.exception("Rule engine initialization failed")
+    finally:
+        state.startup_timings["total"] = time.perf_counter() - started
+        state.ready_event.set()
+
+    logger.info("Rule engine startup timings: %s", state.startup_timings)
+
+
+async def _start_inline_workers(app: FastAPI, state: EngineState) -> None:
+    """プロセス内のブローカーならウォームアップ後にジョブ処理スレッドを起動"""
+    await state.ready_event.wait()
+    if state.rule_engine is not None:
+        app.state.job_workers = InlineWorkers(
+            app.state.job_broker, state.rule_engine, tenants=state.tenants
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """起動時にルールエンジンを非同期で初期化"""
+    state = EngineState()
+    app.state.engine_state = state
+    # /check の段階ごとのメモリ計測（MEMORY_TRACKING）とメモリ予算による制限の集計
+    start_tracking()
+    app.state.memory_stats = MemoryStats()
+    scheduler = LaneScheduler()
+    scheduler.start()
+    app.state.scheduler = scheduler
+    task = asyncio.create_task(
+        _start_engine(state, busy=lambda: scheduler.queue_depth > 0)
+    )
+
+    broker = create_broker()
+    app.state.job_broker = broker
+    app.state.job_workers = None
+    workers_task = None
+    if broker.in_process:
+        workers_task = asyncio.create_task(_start_inline_workers(app, state))
+
+    yield
+
+    state.ready = False
+    if not task.done():
+        task.cancel()
+    if workers_task is not None and not workers_task.done():
+        workers_task.cancel()
+    if app.state.job_workers is not None:
+        await run_in_threadpool(app.state.job_workers.stop)
+    broker.close()
+    await scheduler.stop()
+    if state.shadow is not None:
+        await run_in_threadpool(state.shadow.stop)
+    if state.rule_engine is not None and state.rule_engine.parallel is not None:
+        state.rule_engine.parallel.close()
+
+
+def get_engine_state(connection: HTTPConnection) -> EngineState:
+    """起動状態の依存関係"""
+    return connection.app.state.engine_state
+
+
+def get_scheduler(connection: HTTPConnection) -> LaneScheduler:
+    """校正処理のスケジューラーの依存関係"""
+    return connection.app.state.scheduler
+
+
+def get_memory_stats(connection: HTTPConnection) -> MemoryStats:
+    """メモリ計測の集計の依存関係"""
+    return connection.app.state.memory_stats
+
+
+def get_job_broker(connection: HTTPConnection) -> JobBroker:
+    """非同期ジョブのブローカーの依存関係"""
+    return connection.app.state.job_broker
+
+
+async def get_rule_engine(request: Request) -> RuleEngine:
+    """ルールエンジンの依存関係（ウォームアップ完了まで待機）"""
+    return await get_engine_state(request).wait_ready()
@@ -0,0 +1,129 @@
+"""
+/check のメモリ計測と本文の大きさによるメモリ予算の判定
+
+本文の解析（JSON の文字列化・リクエストのモデル）は FastAPI がエンドポイントを
+呼ぶ前に行うので、その段階の計測と本文の大きさによる予算の判定は
+ASGI ミドルウェアで行う。計測はエンドポイントに渡し（request.state.memory_tracker）、
+レスポンスの送信開始で終える。
+
+Content-Length のない（chunked の）本文や Content-Length と違う本文もあるので、
+予算があるときは本文を受け取りながらバイト数を数え、超えた時点で 413 を返す。
+"""
+
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.memory_accounting import (
+    MEMORY_REQUEST_BUDGET,
+    MemoryBudgetExceeded,
+    StageTracker,
+    project_body_bytes,
+)
+
+# 計測・予算の対象にするパス
+MEMORY_BUDGET_PATHS = ("/api/v1/proofreading/check",)
+
+
+class MemoryMiddleware:
+    """/check の段階ごとのメモリ計測と、大きすぎる本文の拒否"""
+
+    def __init__(self, app: ASGIApp, budget: int = MEMORY_REQUEST_BUDGET):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in MEMORY_BUDGET_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        stats = getattr(scope["app"].state, "memory_stats", None)
+        tracker = StageTracker.try_start() if stats is not None else None
+        if tracker is not None:
+            scope.setdefault("state", {})["memory_tracker"] = tracker
+            tracker.begin("parse")
+
+        if self.budget > 0:
+            content_length = Headers(scope=scope).get("content-length", "")
+            projected = project_body_bytes(
+                int(content_length) if content_length.isdigit() else 0
+            )
+            body = None
+            if projected <= self.budget:
+                try:
+                    projected, body = await self._receive_body(receive)
+                except BaseException:
+                    if tracker is not None:
+                        tracker.finish()
+                    raise
+            if body is None:
+                if tracker is not None:
+                    # 断ったリクエストは計測に入れない
+                    tracker.finish()
+                if stats is not None:
+                    stats.record_rejected()
+                error = MemoryBudgetExceeded(projected, self.budget)
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"{error}（長い文書は POST /jobs を使ってください）"},
+                )
+                await response(scope, receive, send)
+                return
+            receive = _replay(body, receive)
+
+        if tracker is None:
+            await self.app(scope, receive, send)
+            return
+
+        finished = False
+
+        def finish() -> None:
+            nonlocal finished
+            if not finished:
+                finished = True
+                stats.record(tracker.finish())
+
+        async def send_tracked(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # 直列化はレスポンスの送信開始まで
+                finish()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_tracked)
+        finally:
+            finish()
+
+    async def _receive_body(self, receive: Receive) -> Tuple[int, Optional[bytes]]:
+        """本文を受け取りながら数え、予算を超えたら (見積もり, None) を返す"""
+        chunks: List[bytes] = []
+        received = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # 切断されたらアプリにそのまま伝える
+                return project_body_bytes(received), b"".join(chunks)
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            projected = project_body_bytes(received)
+            if projected > self.budget:
+                return projected, None
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                return projected, b"".join(chunks)
+
+
+def _replay(body: bytes, receive: Receive) -> Receive:
+    """受け取り済みの本文を1つのメッセージで渡し、その後は元の receive に任せる"""
+    sent = False
+
+    async def replayed() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replayed
@@ -1,13 +1,17 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
 from app.api.proofreading import router as proofreading_router
+from app.core.compression import CompressionMiddleware
+from app.core.lifecycle import EngineState, get_engine_state, lifespan
+from app.core.memory import MemoryMiddleware
 
 app = FastAPI(
     title="Proofreading API",
     description="Japanese Text Proofreading System API",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -17,8 +21,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Ruleset-Version", "X-Response-Mode"],
 )
 
+# /check のメモリ計測とメモリ予算（圧縮より内側で、直列化の終わりを見る）
+app.add_middleware(MemoryMiddleware)
+
+# 大きなレスポンスの圧縮（br / gzip）
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(proofreading_router)
 
@@ -36,4 +47,18 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe (process is up and serving requests)"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check(state: EngineState = Depends(get_engine_state)):
+    """Readiness probe (rule engine is loaded and warmed up)"""
+    if not state.ready:
+        return state.not_ready_response()
+    return {"status": "ready", "startup_timings": state.startup_timings}
@@ -0,0 +1,3 @@
+from app.models.history import HistoryTrigram, ProofreadingHistory
+
+__all__ = ["HistoryTrigram", "ProofreadingHistory"]
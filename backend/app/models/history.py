@@ -0,0 +1,43 @@
+"""
+校正履歴のテーブル
+
+proofreading_history は scripts/init-db.sql で作成するテーブルと同じ定義。
+proofreading_history_trigrams は履歴本文の文字3-gram の転置索引で、
+ルールのプレビュー（app.services.history_index）が候補の文書を絞り込むのに使う。
+"""
+
+import uuid
+
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text, Uuid
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class ProofreadingHistory(Base):
+    """校正履歴"""
+
+    __tablename__ = "proofreading_history"
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = Column(Uuid, nullable=True, index=True)
+    original_text = Column(Text, nullable=False)
+    corrected_text = Column(Text)
+    corrections_applied = Column(JSON().with_variant(JSONB(), "postgresql"))
+    processing_time_ms = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class HistoryTrigram(Base):
+    """履歴本文の文字3-gram の転置索引（3-gram → 履歴ID）"""
+
+    __tablename__ = "proofreading_history_trigrams"
+
+    trigram = Column(String(3), primary_key=True)
+    history_id = Column(
+        Uuid,
+        ForeignKey("proofreading_history.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
@@ -0,0 +1,287 @@
+"""
+大量文書の一括校正
+
+HTTP を経由せずに RuleEngine を直接使い、ディレクトリ配下の .txt ファイルや
+JSONL コーパスをプロセスプールで校正して JSONL で書き出す。
+"""
+
+import json
+import mmap
+import os
+import time
+from dataclasses import dataclass
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from app.services.rule_engine import RuleEngine
+
+# この大きさ以上のファイルは mmap で読み込む
+MMAP_THRESHOLD = 1 << 20
+
+# (文書ID, .txt のパス, JSONL から読んだ本文, 読み込みエラー)
+# パス・本文・エラーのどれか1つを持つ
+Document = Tuple[str, Optional[str], Optional[str], Optional[str]]
+
+
+def read_text_file(path: Path) -> str:
+    """テキストファイルを読み込み（大きなファイルは mmap）"""
+    size = path.stat().st_size
+    if size == 0:
+        return ""
+    if size < MMAP_THRESHOLD:
+        return path.read_text(encoding="utf-8")
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # mm[:] のように bytes へ複製せず、mmap から直接デコードする
+            with memoryview(mm) as view:
+                return str(view, "utf-8")
+
+
+def iter_jsonl(path: Path) -> Iterator[Document]:
+    """JSONL コーパスから文書を列挙（読めない行は文書ごとのエラーにする）"""
+    if path.stat().st_size == 0:
+        return
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            line_no = 0
+            for line in iter(mm.readline, b""):
+                line_no += 1
+                if not line.strip():
+                    continue
+                doc_id = f"{path}:{line_no}"
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield doc_id, None, None, f"invalid JSON: {e}"
+                    continue
+                if not isinstance(record, dict):
+                    yield doc_id, None, None, "record is not an object"
+                    continue
+                doc_id = str(record.get("id", doc_id))
+                text = record.get("text")
+                if not isinstance(text, str):
+                    yield doc_id, None, None, "missing text"
+                    continue
+                yield doc_id, None, text, None
+
+
+def iter_documents(inputs: Iterable[str]) -> Iterator[Document]:
+    """入力パス（ファイル・ディレクトリ）から文書を列挙"""
+    for entry in inputs:
+        path = Path(entry)
+        if path.is_dir():
+            files: List[Path] = sorted(
+                p for p in path.rglob("*") if p.suffix in (".txt", ".jsonl")
+            )
+        else:
+            files = [path]
+
+        for file in files:
+            if file.suffix == ".jsonl":
+                yield from iter_jsonl(file)
+            else:
+                yield str(file), str(file), None, None
+
+
+# ワーカープロセスごとのルールエンジン
+_worker_engine: Optional[RuleEngine] = None
+_worker_apply = False
+
+
+def _init_worker(
+    rules_dir: Optional[str], bundle_path: Optional[str], apply_corrections: bool
+) -> None:
+    """ワーカープロセスの初期化"""
+    global _worker_engine, _worker_apply
+    _worker_engine = RuleEngine(rules_dir, bundle_path=bundle_path)
+    _worker_apply = apply_corrections
+
+
+def _process_document(document: Document) -> Dict[str, Any]:
+    """ワーカー内で1文書を校正"""
+    doc_id, path, text, error = document
+    if text is None and error is None:
+        try:
+            text = read_text_file(Path(path))
+        except (OSError, UnicodeDecodeError) as e:
+            error = str(e)
+    if error is not None:
+        return {"id": doc_id, "error": error}
+
+    assert _worker_engine is not None
+    corrections = _worker_engine.check_text_compact(text)
+    result: Dict[str, Any] = {
+        "id": doc_id,
+        "characters": len(text),
+        "corrections": list(corrections.records()),
+    }
+    if _worker_apply:
+        result["corrected_text"] = corrections.apply()
+    return result
+
+
+class Checkpoint:
+    """再開用のチェックポイント
+
+    出力ファイルの fsync 済みバイト数を記録する。再開時は出力をその位置まで
+    切り詰め、書き出し済みの文書IDを出力から復元する。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        if not self.path.exists():
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, output_bytes: int, documents: int) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"output_bytes": output_bytes, "documents": documents}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class BulkStats:
+    """一括校正の処理統計"""
+
+    documents: int = 0
+    skipped: int = 0
+    errors: int = 0
+    characters: int = 0
+    corrections: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def characters_per_second(self) -> float:
+        return self.characters / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"documents: {self.documents} "
+            f"(skipped {self.skipped}, errors {self.errors})\n"
+            f"characters: {self.characters}\n"
+            f"corrections: {self.corrections}\n"
+            f"elapsed: {self.elapsed:.2f}s\n"
+            f"throughput: {self.documents_per_second:.1f} docs/s, "
+            f"{self.characters_per_second:.0f} chars/s"
+        )
+
+
+class BulkProofreader:
+    """ディレクトリ・JSONL コーパスの一括校正"""
+
+    def __init__(
+        self,
+        output_path: str,
+        workers: Optional[int] = None,
+        ordered: bool = True,
+        rules_dir: Optional[str] = None,
+        bundle_path: Optional[str] = None,
+        apply_corrections: bool = False,
+        checkpoint_interval: int = 1000,
+        chunksize: int = 16,
+    ):
+        self.output_path = Path(output_path)
+        self.checkpoint = Checkpoint(
+            self.output_path.with_name(self.output_path.name + ".ckpt")
+        )
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.ordered = ordered
+        self.rules_dir = rules_dir
+        self.bundle_path = bundle_path
+        self.apply_corrections = apply_corrections
+        self.checkpoint_interval = checkpoint_interval
+        self.chunksize = chunksize
+
+    def _restore(self) -> Tuple[Set[str], int]:
+        """チェックポイントから書き出し済みの文書IDを復元"""
+        state = self.checkpoint.load()
+        if state is None or not self.output_path.exists():
+            return set(), 0
+
+        done: Set[str] = set()
+        with open(self.output_path, "r+b") as f:
+            f.truncate(state["output_bytes"])
+            f.seek(0)
+            for line in f:
+                done.add(json.loads(line)["id"])
+        return done, state["documents"]
+
+    def _write_results(
+        self,
+        results: Iterable[Dict[str, Any]],
+        out: TextIO,
+        stats: BulkStats,
+        written: int,
+    ) -> int:
+        for result in results:
+            out.write(json.dumps(result, ensure_ascii=False))
+            out.write("\n")
+            written += 1
+            stats.documents += 1
+            if "error" in result:
+                stats.errors += 1
+            else:
+                stats.characters += result["characters"]
+                stats.corrections += len(result["corrections"])
+
+            if written % self.checkpoint_interval == 0:
+                out.flush()
+                os.fsync(out.fileno())
+                self.checkpoint.save(out.buffer.tell(), written)
+        return written
+
+    def run(self, inputs: Iterable[str], resume: bool = False) -> BulkStats:
+        """一括校正を実行"""
+        stats = BulkStats()
+        started = time.perf_counter()
+
+        done, written = self._restore() if resume else (set(), 0)
+
+        def pending() -> Iterator[Document]:
+            for document in iter_documents(inputs):
+                if document[0] in done:
+                    stats.skipped += 1
+                    continue
+                yield document
+
+        mode = "a" if resume and self.checkpoint.path.exists() else "w"
+        with open(self.output_path, mode, encoding="utf-8") as out:
+            if self.workers <= 0:
+                # プロセスプールを使わずに処理（デバッグ用）
+                _init_worker(self.rules_dir, self.bundle_path, self.apply_corrections)
+                written = self._write_results(
+                    (_process_document(d) for d in pending()), out, stats, written
+                )
+            else:
+                with Pool(
+                    self.workers,
+                    initializer=_init_worker,
+                    initargs=(self.rules_dir, self.bundle_path, self.apply_corrections),
+                ) as pool:
+                    imap = pool.imap if self.ordered else pool.imap_unordered
+                    written = self._write_results(
+                        imap(_process_document, pending(), self.chunksize),
+                        out,
+                        stats,
+                        written,
+                    )
+
+            out.flush()
+            os.fsync(out.fileno())
+            self.checkpoint.save(out.buffer.tell(), written)
+
+        stats.elapsed = time.perf_counter() - started
+        return stats
@@ -0,0 +1,257 @@
+"""
+省メモリな校正結果コンテナ
+
+大量のヒットが出る文書でも CorrectionResult をヒット数ぶん生成しないよう、
+位置を array で列指向に持ち、ルール名・カテゴリ・説明などのメタデータは
+共有テーブルの ID で参照する。CorrectionResult は必要になったときにだけ生成する。
+"""
+
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+
+@dataclass
+class CorrectionResult:
+    """校正結果"""
+
+    original_text: str
+    corrected_text: str
+    start_pos: int
+    end_pos: int
+    rule_name: str
+    category: str
+    description: str
+    confidence: float = 1.0
+
+
+# (rule_name, category, description, corrected_text, confidence)
+CorrectionMeta = Tuple[str, str, str, str, float]
+
+
+class CorrectionMetaTable:
+    """校正メタデータの共有テーブル"""
+
+    def __init__(self) -> None:
+        self._entries: List[CorrectionMeta] = []
+        self._index: Dict[CorrectionMeta, int] = {}
+
+    def lookup(self, key: CorrectionMeta) -> Optional[int]:
+        """登録済みのメタデータのID（未登録なら None）"""
+        return self._index.get(key)
+
+    def intern(
+        self,
+        rule_name: str,
+        category: str,
+        description: str,
+        corrected_text: str,
+        confidence: float = 1.0,
+    ) -> int:
+        """メタデータを登録してIDを返す（登録済みなら既存のID）"""
+        key = (rule_name, category, description, corrected_text, confidence)
+        meta_id = self._index.get(key)
+        if meta_id is None:
+            meta_id = len(self._entries)
+            entry = (
+                sys.intern(rule_name),
+                sys.intern(category),
+                sys.intern(description),
+                sys.intern(corrected_text),
+                confidence,
+            )
+            self._entries.append(entry)
+            self._index[entry] = meta_id
+        return meta_id
+
+    def __getitem__(self, meta_id: int) -> CorrectionMeta:
+        return self._entries[meta_id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class OverlayMetaTable(CorrectionMetaTable):
+    """共有テーブルに重ねる差分テーブル
+
+    共有テーブルにあるメタデータは共有テーブルのIDを返し、ないものだけを
+    共有テーブルのIDより ID_OFFSET 以上大きいIDで自分に登録する。共有テーブルは
+    変更しない。差分テーブルにさらに重ねることもできる（テナントの差分に
+    リクエストごとの差分を重ねるなど）。
+    """
+
+    ID_OFFSET = 1 << 30
+
+    def __init__(self, base: CorrectionMetaTable) -> None:
+        super().__init__()
+        self.base = base
+        self.id_offset = getattr(base, "id_offset", 0) + self.ID_OFFSET
+
+    def lookup(self, key: CorrectionMeta) -> Optional[int]:
+        meta_id = self.base.lookup(key)
+        if meta_id is not None:
+            return meta_id
+        meta_id = self._index.get(key)
+        return None if meta_id is None else self.id_offset + meta_id
+
+    def intern(
+        self,
+        rule_name: str,
+        category: str,
+        description: str,
+        corrected_text: str,
+        confidence: float = 1.0,
+    ) -> int:
+        key = (rule_name, category, description, corrected_text, confidence)
+        meta_id = self.base.lookup(key)
+        if meta_id is not None:
+            return meta_id
+        return self.id_offset + super().intern(*key)
+
+    def __getitem__(self, meta_id: int) -> CorrectionMeta:
+        if meta_id >= self.id_offset:
+            return self._entries[meta_id - self.id_offset]
+        return self.base[meta_id]
+
+
+def resolve_overlaps(starts: Sequence[int], ends: Sequence[int]) -> List[int]:
+    """重ならない修正を選んで位置順のインデックスを返す
+
+    開始位置が早いもの、同じ開始位置なら長いもの、さらに同じなら先に
+    登録されたもの（優先度の高いルール）を採用する。
+    """
+    order = sorted(
+        range(len(starts)), key=lambda i: (starts[i], starts[i] - ends[i], i)
+    )
+
+    selected = []
+    last_end = -1
+    for i in order:
+        if starts[i] < last_end:
+            continue
+        selected.append(i)
+        last_end = ends[i]
+    return selected
+
+
+class CorrectionStore:
+    """列指向の校正結果コンテナ
+
+    original_text は常に text[start_pos:end_pos] なので保持しない。
+    """
+
+    __slots__ = ("text", "meta", "starts", "ends", "meta_ids")
+
+    def __init__(self, text: str, meta: Optional[CorrectionMetaTable] = None):
+        self.text = text
+        self.meta = meta if meta is not None else CorrectionMetaTable()
+        self.starts = array("q")
+        self.ends = array("q")
+        self.meta_ids = array("q")
+
+    def add(self, start: int, end: int, meta_id: int) -> None:
+        self.starts.append(start)
+        self.ends.append(end)
+        self.meta_ids.append(meta_id)
+
+    def add_result(self, correction: CorrectionResult) -> None:
+        """CorrectionResult を取り込み"""
+        meta_id = self.meta.intern(
+            correction.rule_name,
+            correction.category,
+            correction.description,
+            correction.corrected_text,
+            correction.confidence,
+        )
+        self.add(correction.start_pos, correction.end_pos, meta_id)
+
+    def extend_results(self, corrections: Iterable[CorrectionResult]) -> None:
+        for correction in corrections:
+            self.add_result(correction)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: int) -> CorrectionResult:
+        start = self.starts[index]
+        end = self.ends[index]
+        rule_name, category, description, corrected_text, confidence = self.meta[
+            self.meta_ids[index]
+        ]
+        return CorrectionResult(
+            original_text=self.text[start:end],
+            corrected_text=corrected_text,
+            start_pos=start,
+            end_pos=end,
+            rule_name=rule_name,
+            category=category,
+            description=description,
+            confidence=confidence,
+        )
+
+    def __iter__(self) -> Iterator[CorrectionResult]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """CorrectionResult を経由せずに辞書形式で列挙"""
+        text = self.text
+        meta = self.meta
+        for start, end, meta_id in zip(self.starts, self.ends, self.meta_ids):
+            rule_name, category, description, corrected_text, confidence = meta[meta_id]
+            yield {
+                "original_text": text[start:end],
+                "corrected_text": corrected_text,
+                "start_pos": start,
+                "end_pos": end,
+                "rule_name": rule_name,
+                "category": category,
+                "description": description,
+                "confidence": confidence,
+            }
+
+    def take(self, indices: Iterable[int]) -> "CorrectionStore":
+        """指定したインデックスの修正だけを持つストアを作成"""
+        store = CorrectionStore(self.text, self.meta)
+        for i in indices:
+            store.add(self.starts[i], self.ends[i], self.meta_ids[i])
+        return store
+
+    def sorted(self) -> "CorrectionStore":
+        """位置順に並べたストアを作成"""
+        starts = self.starts
+        ends = self.ends
+        return self.take(sorted(range(len(self)), key=lambda i: (starts[i], ends[i])))
+
+    def filter(
+        self,
+        categories: Optional[Set[str]] = None,
+        rule_names: Optional[Set[str]] = None,
+        min_confidence: Optional[float] = None,
+    ) -> "CorrectionStore":
+        """メタデータの条件で絞り込んだストアを作成"""
+        # 判定はメタデータ単位で一度だけ行う
+        accepted: Dict[int, bool] = {}
+        for meta_id in set(self.meta_ids):
+            rule_name, category, _, _, confidence = self.meta[meta_id]
+            accepted[meta_id] = (
+                (categories is None or category in categories)
+                and (rule_names is None or rule_name in rule_names)
+                and (min_confidence is None or confidence >= min_confidence)
+            )
+
+        meta_ids = self.meta_ids
+        return self.take(i for i in range(len(self)) if accepted[meta_ids[i]])
+
+    def apply(self) -> str:
+        """修正を適用したテキストを生成"""
+        text = self.text
+        pieces = []
+        position = 0
+        for i in resolve_overlaps(self.starts, self.ends):
+            pieces.append(text[position : self.starts[i]])
+            pieces.append(self.meta[self.meta_ids[i]][3])
+            position = self.ends[i]
+        pieces.append(text[position:])
+        return "".join(pieces)
@@ -1,10 +1,14 @@
 import re
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Iterable, Tuple, Optional
 from dataclasses import dataclass
 from enum import Enum
 import MeCab
 
-from app.services.rule_engine import CorrectionResult
+from app.services.corrections import CorrectionResult
+from app.services.memory_accounting import memory_stage
+from app.services.misconversion import MisconversionChecker
+from app.services.notation_checker import NotationChecker
+from app.services.typo_checker import TypoChecker
 
 
 class ParticleType(str, Enum):
@@ -35,6 +39,12 @@ class GrammarChecker:
             # MeCabが利用できない場合のフォールバック
             self.mecab = None
             print("Warning: MeCab not available, using simplified grammar check")
+        
+        # 語彙表による誤字チェック（TYPO_LEXICON / TYPO_INDEX が未設定なら無効）
+        self.typo_checker = TypoChecker.from_env()
+        # n-gram 頻度表による誤変換チェック（MISCONVERSION_TABLE が未設定なら無効）
+        self.misconversion_checker = MisconversionChecker.from_env()
+        self.notation_checker = NotationChecker()
     
     def analyze_morphemes(self, text: str) -> List[MorphemeInfo]:
         """形態素解析"""
@@ -67,35 +77,99 @@ class GrammarChecker:
         
         return result
     
-    def check_particle_usage(self, text: str) -> List[CorrectionResult]:
-        """助詞の誤用をチェック"""
+    # 局所的な誤用パターン（正規表現, 正しい表現, 説明）
+    # いずれも文書の一部だけを見れば判定できるので、分割して並列に実行できる
+    PARTICLE_PATTERNS = [
+        (r'学校は行く', '学校に行く', '「〜は行く」→「〜に行く」'),
+        (r'本は読む', '本を読む', '「〜は読む」→「〜を読む」'),
+        (r'友達は会う', '友達に会う', '「〜は会う」→「〜に会う」'),
+        (r'テレビは見る', 'テレビを見る', '「〜は見る」→「〜を見る」'),
+    ]
+    
+    DUPLICATE_PARTICLE_PATTERNS = [
+        (r'はは', 'は', '助詞「は」の重複'),
+        (r'をを', 'を', '助詞「を」の重複'),
+        (r'でで', 'で', '助詞「で」の重複'),
+        (r'にに', 'に', '助詞「に」の重複'),
+        (r'のの', 'の', '助詞「の」の重複'),
+    ]
+    
+    KEIGO_PATTERNS = [
+        (r'すいません', 'すみません', '正しい謝罪表現'),
+        (r'させて頂く', 'させていただく', '敬語表現の修正'),
+        (r'させて頂き', 'させていただき', '敬語表現の修正'),
+        (r'させて頂いて', 'させていただいて', '敬語表現の修正'),
+    ]
+    
+    # 「大きい」+名詞のパターンチェック
+    MODIFIER_PATTERNS = [
+        (r'大きい犬', '大きな犬', '「大きい」→「大きな」（連体修飾）'),
+        (r'小さい家', '小さな家', '「小さい」→「小さな」（連体修飾）'),
+        (r'新しい町', '新しい町', '正しい修飾関係'),  # チェックのみ
+    ]
+    
+    # check_grammar での実行順（番号は結果の並び順のキー）
+    # (番号, 規則名, 確信度, パターン表)
+    LOCAL_CHECKS = [
+        (0, "助詞誤用修正", 0.8, PARTICLE_PATTERNS),
+        (2, "重複助詞修正", 0.9, DUPLICATE_PARTICLE_PATTERNS),
+        (3, "敬語修正", 0.8, KEIGO_PATTERNS),
+        (4, "修飾語修正", 0.7, MODIFIER_PATTERNS),
+    ]
+    # 文体統一・表記統一は文書全体の出現数で判定するので分割できない
+    STYLE_CHECK_ORDER = 1
+    TYPO_CHECK_ORDER = 5
+    MISCONVERSION_CHECK_ORDER = 6
+    NOTATION_CHECK_ORDER = 7
+    
+    @classmethod
+    def max_pattern_length(cls) -> int:
+        """局所パターンの最大長（分割時の重なり幅の下限）"""
+        return max(
+            len(pattern)
+            for _, _, _, patterns in cls.LOCAL_CHECKS
+            for pattern, _, _ in patterns
+        )
+    
+    def _match_patterns(
+        self,
+        text: str,
+        order: int,
+        rule_name: str,
+        confidence: float,
+        patterns: List[Tuple[str, str, str]]
+    ) -> List[Tuple[Tuple[int, int], CorrectionResult]]:
+        """パターン表を照合し、(並び順のキー, 結果) を返す"""
         corrections = []
-        morphemes = self.analyze_morphemes(text)
         
-        # 簡単な助詞誤用パターンをチェック
-        particle_patterns = [
-            # (誤用パターン, 正しい表現, 説明)
-            (r'学校は行く', '学校に行く', '「〜は行く」→「〜に行く」'),
-            (r'本は読む', '本を読む', '「〜は読む」→「〜を読む」'),
-            (r'友達は会う', '友達に会う', '「〜は会う」→「〜に会う」'),
-            (r'テレビは見る', 'テレビを見る', '「〜は見る」→「〜を見る」'),
-        ]
-        
-        for pattern, replacement, description in particle_patterns:
+        for index, (pattern, replacement, description) in enumerate(patterns):
+            if pattern == replacement:  # 修正が必要な場合のみ
+                continue
             for match in re.finditer(pattern, text):
-                corrections.append(CorrectionResult(
+                corrections.append(((order, index), CorrectionResult(
                     original_text=match.group(),
                     corrected_text=replacement,
                     start_pos=match.start(),
                     end_pos=match.end(),
-                    rule_name="助詞誤用修正",
+                    rule_name=rule_name,
                     category="grammar",
                     description=description,
-                    confidence=0.8
-                ))
+                    confidence=confidence
+                )))
         
         return corrections
     
+    def _check_table(self, text: str, index: int) -> List[CorrectionResult]:
+        """LOCAL_CHECKS の1項目を実行"""
+        return [
+            correction for _, correction in
+            self._match_patterns(text, *self.LOCAL_CHECKS[index])
+        ]
+    
+    def check_particle_usage(self, text: str) -> List[CorrectionResult]:
+        """助詞の誤用をチェック"""
+        return self._check_table(text, 0)
+    
     def check_style_consistency(self, text: str) -> List[CorrectionResult]:
         """文体の統一をチェック"""
         corrections = []
@@ -145,103 +219,91 @@ class GrammarChecker:
     
     def check_duplicate_particles(self, text: str) -> List[CorrectionResult]:
         """重複助詞をチェック"""
-        corrections = []
-        
-        duplicate_patterns = [
-            (r'はは', 'は', '助詞「は」の重複'),
-            (r'をを', 'を', '助詞「を」の重複'),
-            (r'でで', 'で', '助詞「で」の重複'),
-            (r'にに', 'に', '助詞「に」の重複'),
-            (r'のの', 'の', '助詞「の」の重複'),
-        ]
-        
-        for pattern, replacement, description in duplicate_patterns:
-            for match in re.finditer(pattern, text):
-                corrections.append(CorrectionResult(
-                    original_text=match.group(),
-                    corrected_text=replacement,
-                    start_pos=match.start(),
-                    end_pos=match.end(),
-                    rule_name="重複助詞修正",
-                    category="grammar",
-                    description=description,
-                    confidence=0.9
-                ))
-        
-        return corrections
+        return self._check_table(text, 1)
     
     def check_keigo_usage(self, text: str) -> List[CorrectionResult]:
         """敬語の誤用をチェック"""
-        corrections = []
-        
-        keigo_patterns = [
-            (r'すいません', 'すみません', '正しい謝罪表現'),
-            (r'させて頂く', 'させていただく', '敬語表現の修正'),
-            (r'させて頂き', 'させていただき', '敬語表現の修正'),
-            (r'させて頂いて', 'させていただいて', '敬語表現の修正'),
-        ]
-        
-        for pattern, replacement, description in keigo_patterns:
-            for match in re.finditer(pattern, text):
-                corrections.append(CorrectionResult(
-                    original_text=match.group(),
-                    corrected_text=replacement,
-                    start_pos=match.start(),
-                    end_pos=match.end(),
-                    rule_name="敬語修正",
-                    category="grammar",
-                    description=description,
-                    confidence=0.8
-                ))
-        
-        return corrections
+        return self._check_table(text, 2)
     
     def check_modifier_relations(self, text: str) -> List[CorrectionResult]:
         """修飾語関係をチェック"""
+        return self._check_table(text, 3)
+    
+    def check_typos(self, text: str) -> List[CorrectionResult]:
+        """語彙表に近いが一致しない語をチェック"""
+        if self.typo_checker is None:
+            return []
+        surfaces = None
+        if self.mecab:
+            with memory_stage("morphology"):
+                surfaces = [m.surface for m in self.analyze_morphemes(text)]
+        return self.typo_checker.check(text, surfaces)
+    
+    def check_misconversions(self, text: str) -> List[CorrectionResult]:
+        """同音異義語の誤変換をチェック"""
+        if self.misconversion_checker is None:
+            return []
+        return self.misconversion_checker.check(text)
+    
+    def check_local(
+        self, text: str
+    ) -> List[Tuple[Tuple[int, int], CorrectionResult]]:
+        """文書の一部だけで判定できるチェック（(並び順のキー, 結果) を返す）"""
         corrections = []
+        for order, rule_name, confidence, patterns in self.LOCAL_CHECKS:
+            corrections.extend(
+                self._match_patterns(text, order, rule_name, confidence, patterns)
+            )
+        corrections.extend(
+            ((self.TYPO_CHECK_ORDER, 0), correction)
+            for correction in self.check_typos(text)
+        )
+        corrections.extend(
+            ((self.MISCONVERSION_CHECK_ORDER, 0), correction)
+            for correction in self.check_misconversions(text)
+        )
+        return corrections
+    
+    def check_document(
+        self, text: str, notation: bool = True
+    ) -> List[Tuple[Tuple[int, int], CorrectionResult]]:
+        """文書全体を見る必要があるチェック（(並び順のキー, 結果) を返す）
         
-        # 「大きい」+名詞のパターンチェック
-        modifier_patterns = [
-            (r'大きい犬', '大きな犬', '「大きい」→「大きな」（連体修飾）'),
-            (r'小さい家', '小さな家', '「小さい」→「小さな」（連体修飾）'),
-            (r'新しい町', '新しい町', '正しい修飾関係'),  # チェックのみ
+        notation が False なら表記統一のチェックをしない（呼び出し側で元の
+        テキストに対して行うとき）。
+        """
+        corrections = [
+            ((self.STYLE_CHECK_ORDER, 0), correction)
+            for correction in self.check_style_consistency(text)
         ]
-        
-        for pattern, replacement, description in modifier_patterns:
-            if pattern != replacement:  # 修正が必要な場合のみ
-                for match in re.finditer(pattern, text):
-                    corrections.append(CorrectionResult(
-                        original_text=match.group(),
-                        corrected_text=replacement,
-                        start_pos=match.start(),
-                        end_pos=match.end(),
-                        rule_name="修飾語修正",
-                        category="grammar",
-                        description=description,
-                        confidence=0.7
-                    ))
-        
+        if notation:
+            corrections.extend(
+                ((self.NOTATION_CHECK_ORDER, 0), correction)
+                for correction in self.notation_checker.check(text)
+            )
         return corrections
     
-    def check_grammar(self, text: str) -> List[CorrectionResult]:
-        """包括的な文法チェック"""
-        all_corrections = []
-        
-        # 各種チェックを実行
-        all_corrections.extend(self.check_particle_usage(text))
-        all_corrections.extend(self.check_style_consistency(text))
-        all_corrections.extend(self.check_duplicate_particles(text))
-        all_corrections.extend(self.check_keigo_usage(text))
-        all_corrections.extend(self.check_modifier_relations(text))
-        
-        # 重複を除去（同じ位置の修正）
+    @staticmethod
+    def merge_results(
+        keyed: Iterable[Tuple[Tuple[int, int], CorrectionResult]]
+    ) -> List[CorrectionResult]:
+        """チェック順・位置順に並べ、同じ位置の修正を除去"""
         unique_corrections = []
         seen_positions = set()
         
-        for correction in all_corrections:
+        for _, correction in sorted(
+            keyed, key=lambda item: (item[0], item[1].start_pos)
+        ):
             pos_key = (correction.start_pos, correction.end_pos)
             if pos_key not in seen_positions:
                 unique_corrections.append(correction)
                 seen_positions.add(pos_key)
         
-        return unique_corrections
\ No newline at end of file
+        return unique_corrections
+    
+    def check_grammar(self, text: str, notation: bool = True) -> List[CorrectionResult]:
+        """包括的な文法チェック（notation が False なら表記統一を除く）"""
+        # 各種チェックを実行し、重複（同じ位置の修正）を除去
+        return self.merge_results(
+            self.check_local(text) + self.check_document(text, notation)
+        )
@@ -0,0 +1,295 @@
+"""
+校正履歴の3-gram 索引とルールのプレビュー
+
+新しいルールを入れる前に、過去の文書のどれにどう効くかを確かめたい。
+履歴の全文書に候補のパターンを当てると時間がかかりすぎるので、履歴を書き込む
+ときに本文の文字3-gram の転置索引（proofreading_history_trigrams）も書き込み、
+プレビューではパターンが必ず含む文字列の3-gram をすべて持つ文書だけに
+RuleEngine._apply_rule を実行する。
+
+照合は正規化後のテキストに対して行うので、索引には元の本文と正規化後の本文の
+両方の3-gram を入れる。3文字以上の必須の文字列を取り出せないパターン
+（短いリテラル・大文字小文字を区別しない正規表現など）があるルールは全件を調べる。
+
+    HISTORY_RECORDING=true uvicorn app.main:app
+    python -m app.cli index-history
+    python -m app.cli preview-rule new_rule.yml
+"""
+
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import exists, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import HistoryTrigram, ProofreadingHistory
+from app.services.corrections import CorrectionResult
+from app.services.normalizer import normalize_text
+from app.services.rule_engine import Rule, RuleEngine, RulePattern
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python 3.10 以前
+    import sre_parse
+
+# /check の結果を履歴に書き込むか
+HISTORY_RECORDING = os.getenv("HISTORY_RECORDING", "false").lower() == "true"
+# 本文を読み込む単位（文書数）
+HISTORY_BATCH_SIZE = 500
+
+_LITERAL = sre_parse.LITERAL
+_SUBPATTERN = sre_parse.SUBPATTERN
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+_ZERO_WIDTH = (sre_parse.AT, sre_parse.ASSERT_NOT)
+
+
+def trigrams(text: str) -> Set[str]:
+    """文字3-gram の集合"""
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def text_trigrams(text: str) -> Set[str]:
+    """索引に入れる3-gram（元の本文と正規化後の本文）"""
+    grams = trigrams(text)
+    normalized = normalize_text(text)
+    if normalized is not None:
+        grams |= trigrams(normalized.text)
+    return grams
+
+
+def _literal_runs(parsed: Any) -> List[str]:
+    """正規表現の一致が必ず含む文字列の一覧"""
+    runs: List[str] = []
+    current: List[str] = []
+
+    def flush() -> None:
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    for op, av in parsed:
+        if op is _LITERAL:
+            current.append(chr(av))
+        elif op in _ZERO_WIDTH:
+            # 文字を消費しないので前後の文字は隣り合う
+            continue
+        elif op is _SUBPATTERN:
+            _group, add_flags, _del_flags, body = av
+            inner = [] if add_flags & re.IGNORECASE else _literal_runs(body)
+            if not inner:
+                flush()
+            elif len(inner) == 1 and len(body) == len(inner[0]):
+                # リテラルだけのグループは前後とつながる
+                current.append(inner[0])
+            else:
+                flush()
+                runs.extend(inner)
+        elif op in _REPEATS and av[0] >= 1:
+            flush()
+            runs.extend(_literal_runs(av[2]))
+        elif op is sre_parse.ASSERT:
+            flush()
+            runs.extend(_literal_runs(av[1]))
+        else:
+            flush()
+    flush()
+    return runs
+
+
+def required_trigrams(pattern: RulePattern) -> Optional[Set[str]]:
+    """パターンに一致する文書が必ず含む3-gram（絞り込めなければ None）"""
+    if pattern.type == "literal":
+        runs = [pattern.pattern]
+    else:
+        try:
+            parsed = sre_parse.parse(pattern.regex or pattern.pattern)
+        except re.error:
+            return None
+        if parsed.state.flags & re.IGNORECASE:
+            return None
+        runs = _literal_runs(parsed)
+
+    grams: Set[str] = set()
+    for run in runs:
+        grams |= trigrams(run)
+    return grams or None
+
+
+def index_history(db: Session, history: ProofreadingHistory) -> int:
+    """履歴1件の3-gram を索引に追加（コミットしない）"""
+    grams = text_trigrams(history.original_text)
+    if grams:
+        db.execute(
+            insert(HistoryTrigram),
+            [{"trigram": gram, "history_id": history.id} for gram in grams],
+        )
+    return len(grams)
+
+
+def record_history(
+    db: Session,
+    original_text: str,
+    corrected_text: Optional[str],
+    corrections: List[Dict[str, Any]],
+    processing_time_ms: int,
+    user_id: Optional[uuid.UUID] = None,
+) -> ProofreadingHistory:
+    """校正結果を履歴に書き込み、索引も更新"""
+    history = ProofreadingHistory(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        original_text=original_text,
+        corrected_text=corrected_text,
+        corrections_applied=corrections,
+        processing_time_ms=processing_time_ms,
+    )
+    db.add(history)
+    db.flush()
+    index_history(db, history)
+    db.commit()
+    return history
+
+
+def backfill_index(db: Session, batch_size: int = HISTORY_BATCH_SIZE) -> int:
+    """索引のない履歴（索引を入れる前の履歴）を索引に追加し、件数を返す"""
+    unindexed = (
+        select(ProofreadingHistory)
+        .where(func.length(ProofreadingHistory.original_text) >= 3)
+        .where(~exists().where(HistoryTrigram.history_id == ProofreadingHistory.id))
+        .limit(batch_size)
+    )
+    indexed = 0
+    while True:
+        batch = db.scalars(unindexed).all()
+        for history in batch:
+            index_history(db, history)
+        db.commit()
+        indexed += len(batch)
+        if len(batch) < batch_size:
+            return indexed
+
+
+def candidate_ids(db: Session, rule: Rule) -> Optional[Set[uuid.UUID]]:
+    """ルールが一致しうる履歴のID（絞り込めなければ None）"""
+    candidates: Set[uuid.UUID] = set()
+    for pattern in rule.patterns:
+        grams = required_trigrams(pattern)
+        if grams is None:
+            return None
+        query = (
+            select(HistoryTrigram.history_id)
+            .where(HistoryTrigram.trigram.in_(sorted(grams)))
+            .group_by(HistoryTrigram.history_id)
+            .having(func.count() == len(grams))
+        )
+        candidates.update(db.scalars(query))
+    return candidates
+
+
+def _iter_texts(
+    db: Session, ids: Optional[Set[uuid.UUID]], batch_size: int
+) -> Iterator[Tuple[uuid.UUID, str]]:
+    """履歴の (ID, 本文) を順に読み込む（ids が None なら全件）"""
+    columns = select(ProofreadingHistory.id, ProofreadingHistory.original_text)
+    if ids is None:
+        yield from db.execute(columns.execution_options(yield_per=batch_size))
+        return
+    ordered = sorted(ids)
+    for i in range(0, len(ordered), batch_size):
+        chunk = ordered[i : i + batch_size]
+        yield from db.execute(columns.where(ProofreadingHistory.id.in_(chunk)))
+
+
+@dataclass
+class RulePreview:
+    """ルールのプレビュー結果"""
+
+    rule_name: str
+    total_documents: int
+    # 3-gram で絞り込んだ候補の件数（絞り込めなかった場合は全件）
+    candidate_documents: int
+    narrowed: bool
+    matched_documents: int = 0
+    hit_count: int = 0
+    samples: List[Dict[str, Any]] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rule_name": self.rule_name,
+            "total_documents": self.total_documents,
+            "candidate_documents": self.candidate_documents,
+            "narrowed": self.narrowed,
+            "matched_documents": self.matched_documents,
+            "hit_count": self.hit_count,
+            "samples": self.samples,
+            "elapsed_ms": round(self.elapsed_ms, 1),
+        }
+
+
+def _apply_to_original(
+    engine: RuleEngine, rule: Rule, text: str
+) -> List[CorrectionResult]:
+    """ルールを /check と同じく正規化後のテキストに適用し、元の本文の位置で返す"""
+    normalized = normalize_text(text) if engine.normalize_input else None
+    if normalized is None:
+        return engine._apply_rule(text, rule)
+
+    results = engine._apply_rule(normalized.text, rule)
+    for result in results:
+        start, end = normalized.original_span(result.start_pos, result.end_pos)
+        result.start_pos, result.end_pos = start, end
+        result.original_text = text[start:end]
+    return results
+
+
+def _sample(
+    history_id: uuid.UUID, text: str, correction: CorrectionResult, context: int
+) -> Dict[str, Any]:
+    """一致箇所の前後を含めた修正前後の抜粋"""
+    start, end = correction.start_pos, correction.end_pos
+    before = text[max(0, start - context) : start]
+    after = text[end : end + context]
+    return {
+        "history_id": str(history_id),
+        "start_pos": start,
+        "end_pos": end,
+        "before": before + text[start:end] + after,
+        "after": before + correction.corrected_text + after,
+    }
+
+
+def preview_rule(
+    db: Session,
+    engine: RuleEngine,
+    rule: Rule,
+    sample_limit: int = 10,
+    context: int = 20,
+    batch_size: int = HISTORY_BATCH_SIZE,
+) -> RulePreview:
+    """ルールを過去の履歴に当てたときの一致件数と修正例"""
+    started = time.perf_counter()
+    total = db.scalar(select(func.count()).select_from(ProofreadingHistory)) or 0
+    ids = candidate_ids(db, rule)
+    preview = RulePreview(
+        rule_name=rule.name,
+        total_documents=total,
+        candidate_documents=total if ids is None else len(ids),
+        narrowed=ids is not None,
+    )
+
+    for history_id, text in _iter_texts(db, ids, batch_size):
+        results = _apply_to_original(engine, rule, text)
+        if not results:
+            continue
+        preview.matched_documents += 1
+        preview.hit_count += len(results)
+        for result in results[: sample_limit - len(preview.samples)]:
+            preview.samples.append(_sample(history_id, text, result, context))
+
+    preview.elapsed_ms = (time.perf_counter() - started) * 1000
+    return preview
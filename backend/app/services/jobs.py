@@ -0,0 +1,996 @@
+"""
+長い文書の非同期校正ジョブ
+
+POST /jobs で文書を待ち行列に入れてすぐにジョブIDを返し、GET /jobs/{id} で
+状態・進捗と、チェックの済んだ断片の校正結果を少しずつ受け取る。ジョブは
+別プロセスのワーカーが待ち行列から取り出し、文書を parallel と同じ断片に分けて
+断片ごとに結果を書き足していく。断片も /check と同じく正規化して照合し、
+X-Tenant-Id で指定したテナントの差分を重ねる。文書全体を見る必要がある
+チェック（文体統一・表記統一）は最後にまとめて実行する。
+
+取り出したジョブは処理中の一覧に移し、終わったら外す。処理中のワーカーは
+JOB_VISIBILITY_TIMEOUT の 1/4 ごとに生存を知らせ、JOB_VISIBILITY_TIMEOUT 秒の
+あいだ知らせのないジョブ（ワーカーが落ちたもの）は待ち行列に戻し、
+JOB_MAX_ATTEMPTS 回試しても終わらなければ失敗にする。
+
+処理を始めるたびに attempts を増やし、それを処理の担当の印にする。状態・結果の
+書き込みと処理中の一覧から外す操作は、保存されている attempts と状態が担当の
+ものと一致するときだけ行うので、止まったとみなされたあとで動き出したワーカーが
+やり直し中のジョブの結果を書き換えることはない。
+
+待ち行列と結果は Redis に置く（JOB_BROKER_URL=redis://...）。memory:// の
+場合はプロセス内の代替実装を使い、API サーバーのスレッドでジョブを処理する。
+
+    python -m app.cli job-worker --broker redis://localhost:6379/0 --processes 4
+
+ジョブの記録と結果は JOB_TTL 秒で期限切れになり、結果の修正件数は
+JOB_MAX_CORRECTIONS で打ち切る。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import Enum
+from multiprocessing import get_context
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.services.corrections import CorrectionStore, resolve_overlaps
+from app.services.grammar_checker import GrammarChecker
+from app.services.parallel import shard_margin, split_shards
+from app.services.rule_engine import RuleEngine
+from app.services.tenants import TenantRegistry
+
+logger = logging.getLogger(__name__)
+
+# redis://... なら Redis、memory:// ならプロセス内の待ち行列
+JOB_BROKER_URL = os.getenv("JOB_BROKER_URL", "memory://")
+# ジョブの記録と結果の保持期間（秒）
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
+# 受け付けるテキストの最大文字数
+JOB_MAX_TEXT_CHARS = int(os.getenv("JOB_MAX_TEXT_CHARS", "5000000"))
+# 保存する修正の最大件数（超えた分は truncated として捨てる）
+JOB_MAX_CORRECTIONS = int(os.getenv("JOB_MAX_CORRECTIONS", "50000"))
+# 待ち行列に入れられるジョブ数
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "1000"))
+# 1回に処理する断片の目安の文字数（進捗・途中結果の粒度）
+JOB_CHUNK_CHARS = int(os.getenv("JOB_CHUNK_CHARS", "20000"))
+# memory:// のときに API サーバー内でジョブを処理するスレッド数
+JOB_INLINE_WORKERS = int(os.getenv("JOB_INLINE_WORKERS", "1"))
+# 処理中のジョブの進捗がこの秒数更新されなければワーカーが落ちたとみなす
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+# 1件のジョブを試す回数（超えたら失敗にする）
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# ワーカーが待ち行列を確認する間隔（秒、停止要求に応じる間隔でもある）
+_POLL_TIMEOUT = 1.0
+
+
+class JobError(Exception):
+    """ジョブを受け付けられない"""
+
+    status_code = 400
+
+
+class JobTooLarge(JobError):
+    status_code = 413
+
+
+class QueueFull(JobError):
+    status_code = 503
+
+
+class JobLost(Exception):
+    """ジョブの担当が別のワーカー（やり直し）に移った"""
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """ジョブの状態（ブローカーには文字列の辞書として保存する）"""
+
+    job_id: str
+    status: JobStatus = JobStatus.QUEUED
+    total_chars: int = 0
+    processed_chars: int = 0
+    correction_count: int = 0
+    truncated: bool = False
+    apply_corrections: bool = False
+    tenant_id: str = ""
+    # ワーカーが処理を始めた回数
+    attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    error: str = ""
+    corrected_text: Optional[str] = None
+
+    @property
+    def progress(self) -> float:
+        if self.status == JobStatus.COMPLETED or not self.total_chars:
+            return 1.0 if self.status == JobStatus.COMPLETED else 0.0
+        return min(1.0, self.processed_chars / self.total_chars)
+
+    def to_mapping(self) -> Dict[str, str]:
+        mapping = {
+            "status": self.status.value,
+            "total_chars": str(self.total_chars),
+            "processed_chars": str(self.processed_chars),
+            "correction_count": str(self.correction_count),
+            "truncated": "1" if self.truncated else "0",
+            "apply_corrections": "1" if self.apply_corrections else "0",
+            "tenant_id": self.tenant_id,
+            "attempts": str(self.attempts),
+            "created_at": repr(self.created_at),
+            "updated_at": repr(self.updated_at),
+            "error": self.error,
+        }
+        if self.corrected_text is not None:
+            mapping["corrected_text"] = self.corrected_text
+        return mapping
+
+    @classmethod
+    def from_mapping(cls, job_id: str, mapping: Dict[str, str]) -> "Job":
+        return cls(
+            job_id=job_id,
+            status=JobStatus(mapping["status"]),
+            total_chars=int(mapping["total_chars"]),
+            processed_chars=int(mapping["processed_chars"]),
+            correction_count=int(mapping["correction_count"]),
+            truncated=mapping["truncated"] == "1",
+            apply_corrections=mapping["apply_corrections"] == "1",
+            tenant_id=mapping.get("tenant_id", ""),
+            attempts=int(mapping.get("attempts", "0")),
+            created_at=float(mapping["created_at"]),
+            updated_at=float(mapping["updated_at"]),
+            error=mapping.get("error", ""),
+            corrected_text=mapping.get("corrected_text"),
+        )
+
+
+class JobBroker(ABC):
+    """ジョブの待ち行列と結果の保存先"""
+
+    # ジョブを API サーバーのプロセス内で処理する必要があるか
+    in_process = False
+
+    def __init__(self, ttl: int = JOB_TTL, max_queue: int = JOB_MAX_QUEUE):
+        self.ttl = ttl
+        self.max_queue = max_queue
+        self.max_text_chars = JOB_MAX_TEXT_CHARS
+
+    def submit(
+        self, text: str, apply_corrections: bool = False, tenant_id: str = ""
+    ) -> Job:
+        """ジョブを作成して待ち行列に入れる"""
+        if len(text) > self.max_text_chars:
+            raise JobTooLarge(
+                f"text too large: {len(text)} > {self.max_text_chars} characters"
+            )
+        job = Job(
+            job_id=uuid.uuid4().hex,
+            total_chars=len(text),
+            apply_corrections=apply_corrections,
+            tenant_id=tenant_id,
+        )
+        self.enqueue(job, text)
+        return job
+
+    @abstractmethod
+    def enqueue(self, job: Job, text: str) -> None:
+        """ジョブと本文を保存して待ち行列に入れる（満杯なら QueueFull）"""
+
+    @abstractmethod
+    def dequeue(self, timeout: float) -> Optional[str]:
+        """待ち行列からジョブIDを取り出して処理中の一覧に移す（timeout 秒待ってなければ None）"""
+
+    @abstractmethod
+    def start(self, job_id: str) -> Optional[Job]:
+        """待機中のジョブの attempts を増やして処理中にする（待機中でなければ None）"""
+
+    @abstractmethod
+    def touch(self, job_id: str, attempt: int) -> bool:
+        """担当のワーカーの生存を知らせる（担当でなくなっていれば False）"""
+
+    @abstractmethod
+    def ack(self, job_id: str, attempt: Optional[int] = None) -> bool:
+        """処理中の一覧から外す（外したら True）
+
+        attempt を指定したら、その回の処理が担当のまま（やり直しに移っていない）
+        ときだけ外す。
+        """
+
+    @abstractmethod
+    def processing(self) -> List[str]:
+        """処理中の一覧のジョブID"""
+
+    @abstractmethod
+    def requeue(self, job_id: str) -> bool:
+        """処理中の一覧から待ち行列の先頭に戻す（戻したら True）"""
+
+    def requeue_stale(
+        self,
+        timeout: float = JOB_VISIBILITY_TIMEOUT,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ) -> int:
+        """進捗が timeout 秒更新されていない処理中のジョブを待ち行列に戻す
+
+        max_attempts 回試したジョブは戻さずに失敗にする。戻した件数を返す。
+        """
+        now = time.time()
+        requeued = 0
+        for job_id in self.processing():
+            job = self.get(job_id)
+            if job is None or job.status in (JobStatus.COMPLETED, JobStatus.FAILED):
+                # 期限切れ・終わったあと一覧から外す前に落ちたワーカー
+                self.ack(job_id)
+                continue
+            if now - job.updated_at < timeout:
+                continue
+            expected = job.status
+            if job.attempts >= max_attempts:
+                job.status = JobStatus.FAILED
+                job.error = f"worker did not finish after {job.attempts} attempts"
+                job.updated_at = now
+                if self.update(
+                    job, drop_text=True, attempt=job.attempts, expected=expected
+                ):
+                    self.ack(job_id)
+                continue
+            # 先に待機中に戻して、遅れて動き出したワーカーの書き込みを止める
+            job.status = JobStatus.QUEUED
+            job.updated_at = now
+            if self.update(
+                job, attempt=job.attempts, expected=expected
+            ) and self.requeue(job_id):
+                logger.warning("Requeued stale job %s", job_id)
+                requeued += 1
+        return requeued
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """ジョブの状態（期限切れ・存在しなければ None）"""
+
+    @abstractmethod
+    def text(self, job_id: str) -> Optional[str]:
+        """ジョブの本文"""
+
+    @abstractmethod
+    def update(
+        self,
+        job: Job,
+        drop_text: bool = False,
+        attempt: Optional[int] = None,
+        expected: JobStatus = JobStatus.RUNNING,
+    ) -> bool:
+        """ジョブの状態を保存（drop_text なら本文を削除）
+
+        attempt を指定したら、保存されている attempts と状態が attempt・expected と
+        一致するときだけ保存する（保存したら True）。
+        """
+
+    @abstractmethod
+    def append_corrections(
+        self,
+        job_id: str,
+        records: List[Dict[str, Any]],
+        attempt: Optional[int] = None,
+    ) -> bool:
+        """校正結果を書き足す（attempt を指定したらその回の処理が担当のときだけ）"""
+
+    @abstractmethod
+    def clear_corrections(self, job_id: str) -> None:
+        """校正結果を消す（途中で落ちたジョブをやり直すとき）"""
+
+    @abstractmethod
+    def corrections(
+        self, job_id: str, offset: int = 0, limit: int = -1
+    ) -> List[Dict[str, Any]]:
+        """offset 件目以降の校正結果（limit が負なら最後まで）"""
+
+    @abstractmethod
+    def queue_depth(self) -> int:
+        """待ち行列の長さ"""
+
+    def close(self) -> None:
+        pass
+
+
+_MemoryEntry = Tuple[float, Dict[str, str], Optional[str], List[str]]
+
+
+class InMemoryBroker(JobBroker):
+    """プロセス内の代替ブローカー（テスト・単一プロセス用）"""
+
+    in_process = True
+
+    def __init__(self, ttl: int = JOB_TTL, max_queue: int = JOB_MAX_QUEUE):
+        super().__init__(ttl, max_queue)
+        self._condition = threading.Condition()
+        self._queue: Deque[str] = deque()
+        self._processing: List[str] = []
+        # ジョブID → (期限, 状態の辞書, 本文, 校正結果の JSON)
+        self._jobs: Dict[str, _MemoryEntry] = {}
+
+    def _purge(self, now: float) -> None:
+        expired = [job_id for job_id, entry in self._jobs.items() if entry[0] <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def enqueue(self, job: Job, text: str) -> None:
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                raise QueueFull("job queue is full")
+            now = time.time()
+            self._purge(now)
+            self._jobs[job.job_id] = (now + self.ttl, job.to_mapping(), text, [])
+            self._queue.append(job.job_id)
+            self._condition.notify()
+
+    def dequeue(self, timeout: float) -> Optional[str]:
+        with self._condition:
+            if not self._queue:
+                self._condition.wait(timeout)
+            if not self._queue:
+                return None
+            job_id = self._queue.popleft()
+            self._processing.append(job_id)
+            entry = self._entry(job_id)
+            if entry is not None:
+                # 待ち行列で待った時間を処理の停滞とみなさないように時刻を更新
+                entry[1]["updated_at"] = repr(time.time())
+            return job_id
+
+    def _owns(
+        self, job_id: str, attempt: int, expected: JobStatus = JobStatus.RUNNING
+    ) -> bool:
+        entry = self._entry(job_id)
+        return (
+            entry is not None
+            and entry[1]["attempts"] == str(attempt)
+            and entry[1]["status"] == expected.value
+        )
+
+    def start(self, job_id: str) -> Optional[Job]:
+        with self._condition:
+            entry = self._entry(job_id)
+            if entry is None or entry[1]["status"] != JobStatus.QUEUED.value:
+                return None
+            job = Job.from_mapping(job_id, entry[1])
+            job.attempts += 1
+            job.status = JobStatus.RUNNING
+            job.updated_at = time.time()
+            entry[1].update(job.to_mapping())
+            return job
+
+    def touch(self, job_id: str, attempt: int) -> bool:
+        with self._condition:
+            if not self._owns(job_id, attempt):
+                return False
+            self._jobs[job_id][1]["updated_at"] = repr(time.time())
+            return True
+
+    def ack(self, job_id: str, attempt: Optional[int] = None) -> bool:
+        with self._condition:
+            if job_id not in self._processing:
+                return False
+            if attempt is not None:
+                entry = self._entry(job_id)
+                if (
+                    entry is None
+                    or entry[1]["attempts"] != str(attempt)
+                    or entry[1]["status"] == JobStatus.QUEUED.value
+                ):
+                    return False
+            self._processing.remove(job_id)
+            return True
+
+    def processing(self) -> List[str]:
+        with self._condition:
+            return list(self._processing)
+
+    def requeue(self, job_id: str) -> bool:
+        with self._condition:
+            if job_id not in self._processing:
+                return False
+            self._processing.remove(job_id)
+            self._queue.appendleft(job_id)
+            self._condition.notify()
+            return True
+
+    def _entry(self, job_id: str) -> Optional[_MemoryEntry]:
+        entry = self._jobs.get(job_id)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._condition:
+            entry = self._entry(job_id)
+            return Job.from_mapping(job_id, entry[1]) if entry else None
+
+    def text(self, job_id: str) -> Optional[str]:
+        with self._condition:
+            entry = self._entry(job_id)
+            return entry[2] if entry else None
+
+    def update(
+        self,
+        job: Job,
+        drop_text: bool = False,
+        attempt: Optional[int] = None,
+        expected: JobStatus = JobStatus.RUNNING,
+    ) -> bool:
+        with self._condition:
+            entry = self._entry(job.job_id)
+            if entry is None:
+                return False
+            if attempt is not None and not self._owns(job.job_id, attempt, expected):
+                return False
+            text = None if drop_text else entry[2]
+            self._jobs[job.job_id] = (
+                time.time() + self.ttl,
+                job.to_mapping(),
+                text,
+                entry[3],
+            )
+            return True
+
+    def append_corrections(
+        self,
+        job_id: str,
+        records: List[Dict[str, Any]],
+        attempt: Optional[int] = None,
+    ) -> bool:
+        with self._condition:
+            entry = self._entry(job_id)
+            if entry is None:
+                return False
+            if attempt is not None and not self._owns(job_id, attempt):
+                return False
+            entry[3].extend(
+                json.dumps(record, ensure_ascii=False) for record in records
+            )
+            return True
+
+    def clear_corrections(self, job_id: str) -> None:
+        with self._condition:
+            entry = self._entry(job_id)
+            if entry is not None:
+                entry[3].clear()
+
+    def corrections(
+        self, job_id: str, offset: int = 0, limit: int = -1
+    ) -> List[Dict[str, Any]]:
+        with self._condition:
+            entry = self._entry(job_id)
+            if entry is None:
+                return []
+            end = None if limit < 0 else offset + limit
+            return [json.loads(record) for record in entry[3][offset:end]]
+
+    def queue_depth(self) -> int:
+        with self._condition:
+            return len(self._queue)
+
+    def close(self) -> None:
+        with self._condition:
+            self._condition.notify_all()
+
+
+class RedisBroker(JobBroker):
+    """Redis の待ち行列（リスト）とハッシュによるブローカー
+
+    proofreading:jobs:queue にジョブIDを積み、proofreading:job:<ID> に状態と本文、
+    proofreading:job:<ID>:corrections に校正結果の JSON を置く。取り出したジョブIDは
+    BLMOVE で proofreading:jobs:processing に移し、処理を終えたら外す。
+    """
+
+    QUEUE_KEY = "proofreading:jobs:queue"
+    PROCESSING_KEY = "proofreading:jobs:processing"
+
+    def __init__(self, url: str, ttl: int = JOB_TTL, max_queue: int = JOB_MAX_QUEUE):
+        import redis
+
+        super().__init__(ttl, max_queue)
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        # 担当の確認と書き込みを不可分に行うスクリプト
+        self._start = self.redis.register_script(_REDIS_START)
+        self._touch = self.redis.register_script(_REDIS_TOUCH)
+        self._ack = self.redis.register_script(_REDIS_ACK)
+        self._update = self.redis.register_script(_REDIS_UPDATE)
+        self._append = self.redis.register_script(_REDIS_APPEND)
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"proofreading:job:{job_id}"
+
+    def enqueue(self, job: Job, text: str) -> None:
+        if self.redis.llen(self.QUEUE_KEY) >= self.max_queue:
+            raise QueueFull("job queue is full")
+        key = self._key(job.job_id)
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping={**job.to_mapping(), "text": text})
+        pipe.expire(key, self.ttl)
+        pipe.lpush(self.QUEUE_KEY, job.job_id)
+        pipe.execute()
+
+    def dequeue(self, timeout: float) -> Optional[str]:
+        job_id = self.redis.blmove(
+            self.QUEUE_KEY,
+            self.PROCESSING_KEY,
+            max(1, int(timeout)),
+            src="RIGHT",
+            dest="LEFT",
+        )
+        if job_id is not None:
+            # 待ち行列で待った時間を処理の停滞とみなさないように進捗の時刻を更新
+            self.redis.hset(self._key(job_id), "updated_at", repr(time.time()))
+        return job_id
+
+    def start(self, job_id: str) -> Optional[Job]:
+        if not self._start(keys=[self._key(job_id)], args=[repr(time.time())]):
+            return None
+        return self.get(job_id)
+
+    def touch(self, job_id: str, attempt: int) -> bool:
+        return bool(
+            self._touch(keys=[self._key(job_id)], args=[attempt, repr(time.time())])
+        )
+
+    def ack(self, job_id: str, attempt: Optional[int] = None) -> bool:
+        if attempt is None:
+            return self.redis.lrem(self.PROCESSING_KEY, 1, job_id) > 0
+        return bool(
+            self._ack(
+                keys=[self.PROCESSING_KEY, self._key(job_id)], args=[job_id, attempt]
+            )
+        )
+
+    def processing(self) -> List[str]:
+        return self.redis.lrange(self.PROCESSING_KEY, 0, -1)
+
+    def requeue(self, job_id: str) -> bool:
+        # 一覧から外せたワーカーだけが戻す（同時に調べても二重に戻さない）
+        if not self.ack(job_id):
+            return False
+        self.redis.rpush(self.QUEUE_KEY, job_id)
+        return True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        fields = list(Job(job_id).to_mapping()) + ["corrected_text"]
+        values = self.redis.hmget(self._key(job_id), fields)
+        if values[0] is None:
+            return None
+        mapping = {k: v for k, v in zip(fields, values) if v is not None}
+        return Job.from_mapping(job_id, mapping)
+
+    def text(self, job_id: str) -> Optional[str]:
+        return self.redis.hget(self._key(job_id), "text")
+
+    def update(
+        self,
+        job: Job,
+        drop_text: bool = False,
+        attempt: Optional[int] = None,
+        expected: JobStatus = JobStatus.RUNNING,
+    ) -> bool:
+        key = self._key(job.job_id)
+        fields = [item for pair in job.to_mapping().items() for item in pair]
+        return bool(
+            self._update(
+                keys=[key, key + ":corrections"],
+                args=[
+                    "" if attempt is None else attempt,
+                    expected.value,
+                    "1" if drop_text else "0",
+                    self.ttl,
+                    *fields,
+                ],
+            )
+        )
+
+    def append_corrections(
+        self,
+        job_id: str,
+        records: List[Dict[str, Any]],
+        attempt: Optional[int] = None,
+    ) -> bool:
+        key = self._key(job_id)
+        return bool(
+            self._append(
+                keys=[key, key + ":corrections"],
+                args=[
+                    "" if attempt is None else attempt,
+                    self.ttl,
+                    *(json.dumps(r, ensure_ascii=False) for r in records),
+                ],
+            )
+        )
+
+    def clear_corrections(self, job_id: str) -> None:
+        self.redis.delete(self._key(job_id) + ":corrections")
+
+    def corrections(
+        self, job_id: str, offset: int = 0, limit: int = -1
+    ) -> List[Dict[str, Any]]:
+        if limit == 0:
+            return []
+        end = -1 if limit < 0 else offset + limit - 1
+        records = self.redis.lrange(self._key(job_id) + ":corrections", offset, end)
+        return [json.loads(record) for record in records]
+
+    def queue_depth(self) -> int:
+        return self.redis.llen(self.QUEUE_KEY)
+
+    def close(self) -> None:
+        self.redis.close()
+
+
+# KEYS[1]: ジョブ / ARGV[1]: 現在時刻
+_REDIS_START = """
+if redis.call('hget', KEYS[1], 'status') ~= 'queued' then
+    return 0
+end
+redis.call('hincrby', KEYS[1], 'attempts', 1)
+redis.call('hset', KEYS[1], 'status', 'running', 'updated_at', ARGV[1])
+return 1
+"""
+
+# KEYS[1]: ジョブ / ARGV[1]: attempt, ARGV[2]: 現在時刻
+_REDIS_TOUCH = """
+if redis.call('hget', KEYS[1], 'attempts') ~= ARGV[1]
+        or redis.call('hget', KEYS[1], 'status') ~= 'running' then
+    return 0
+end
+redis.call('hset', KEYS[1], 'updated_at', ARGV[2])
+return 1
+"""
+
+# KEYS[1]: 処理中の一覧, KEYS[2]: ジョブ / ARGV[1]: ジョブID, ARGV[2]: attempt
+_REDIS_ACK = """
+if redis.call('hget', KEYS[2], 'attempts') ~= ARGV[2]
+        or redis.call('hget', KEYS[2], 'status') == 'queued' then
+    return 0
+end
+return redis.call('lrem', KEYS[1], 1, ARGV[1])
+"""
+
+# KEYS[1]: ジョブ, KEYS[2]: 校正結果 / ARGV[1]: attempt（空なら確認しない）,
+# ARGV[2]: 期待する状態, ARGV[3]: 本文を消すか, ARGV[4]: TTL, ARGV[5..]: フィールドと値
+_REDIS_UPDATE = """
+if ARGV[1] ~= '' and (redis.call('hget', KEYS[1], 'attempts') ~= ARGV[1]
+        or redis.call('hget', KEYS[1], 'status') ~= ARGV[2]) then
+    return 0
+end
+redis.call('hset', KEYS[1], unpack(ARGV, 5))
+if ARGV[3] == '1' then
+    redis.call('hdel', KEYS[1], 'text')
+end
+redis.call('expire', KEYS[1], ARGV[4])
+redis.call('expire', KEYS[2], ARGV[4])
+return 1
+"""
+
+# KEYS[1]: ジョブ, KEYS[2]: 校正結果 / ARGV[1]: attempt（空なら確認しない）,
+# ARGV[2]: TTL, ARGV[3..]: 校正結果の JSON
+_REDIS_APPEND = """
+if ARGV[1] ~= '' and (redis.call('hget', KEYS[1], 'attempts') ~= ARGV[1]
+        or redis.call('hget', KEYS[1], 'status') ~= 'running') then
+    return 0
+end
+-- unpack できる値の数に上限があるので分けて積む
+for i = 3, #ARGV, 1000 do
+    redis.call('rpush', KEYS[2], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('expire', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+def create_broker(url: str = JOB_BROKER_URL) -> JobBroker:
+    """URL からブローカーを作成"""
+    if not url or url.startswith("memory://"):
+        return InMemoryBroker()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url)
+    raise ValueError(f"unsupported job broker: {url}")
+
+
+class JobWorker:
+    """待ち行列からジョブを取り出して校正"""
+
+    def __init__(
+        self,
+        broker: JobBroker,
+        rule_engine: RuleEngine,
+        chunk_chars: int = JOB_CHUNK_CHARS,
+        max_corrections: int = JOB_MAX_CORRECTIONS,
+        tenants: Optional[TenantRegistry] = None,
+        visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ):
+        self.broker = broker
+        self.rule_engine = rule_engine
+        self.chunk_chars = chunk_chars
+        self.max_corrections = max_corrections
+        self.tenants = tenants
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.margin = shard_margin(rule_engine)
+        self._stopped = threading.Event()
+
+    def _save(self, job: Job, drop_text: bool = False) -> None:
+        """ジョブの状態を保存（担当でなくなっていれば JobLost）"""
+        if not self.broker.update(job, drop_text=drop_text, attempt=job.attempts):
+            raise JobLost(job.job_id)
+
+    @contextmanager
+    def _heartbeat(self, job: Job) -> Iterator[threading.Event]:
+        """処理のあいだ生存を知らせ続ける（担当でなくなったらイベントを立てる）"""
+        lost = threading.Event()
+        stopped = threading.Event()
+
+        def beat() -> None:
+            while not stopped.wait(self.visibility_timeout / 4):
+                if not self.broker.touch(job.job_id, job.attempts):
+                    lost.set()
+                    return
+
+        thread = threading.Thread(
+            target=beat, name=f"job-heartbeat-{job.job_id}", daemon=True
+        )
+        thread.start()
+        try:
+            yield lost
+        finally:
+            stopped.set()
+            thread.join()
+
+    def _store(self, job: Job, store: CorrectionStore, offset: int) -> None:
+        """校正結果を上限まで書き足す"""
+        records = []
+        for record in store.records():
+            if job.correction_count + len(records) >= self.max_corrections:
+                job.truncated = True
+                break
+            record["start_pos"] += offset
+            record["end_pos"] += offset
+            records.append(record)
+        if not self.broker.append_corrections(job.job_id, records, job.attempts):
+            raise JobLost(job.job_id)
+        job.correction_count += len(records)
+
+    def run_job(self, job_id: str) -> Optional[Job]:
+        """ジョブを1件処理
+
+        待機中でない・期限切れのジョブと、処理中に担当が別のワーカーに移った
+        ジョブは None を返す（状態・結果は書き換えない）。
+        """
+        job = self.broker.start(job_id)
+        if job is None:
+            return None
+        text = self.broker.text(job_id)
+        if text is None:
+            return None
+
+        if job.attempts > 1:
+            # 途中で落ちたジョブは最初からやり直す
+            self.broker.clear_corrections(job_id)
+            job.processed_chars = 0
+            job.correction_count = 0
+            job.truncated = False
+        try:
+            with self._heartbeat(job) as lost:
+                self._run(job, text, lost)
+        except JobLost:
+            logger.warning(
+                "Job %s attempt %d was taken over by another worker",
+                job_id,
+                job.attempts,
+            )
+            return None
+        return job
+
+    def _run(self, job: Job, text: str, lost: threading.Event) -> None:
+        engine = self.rule_engine
+        self._save(job)
+
+        # 修正を適用した本文を作るための (開始位置, 終了位置, 修正後)
+        edits: List[Tuple[int, int, str]] = []
+        try:
+            overlay = self.tenants.get(job.tenant_id) if self.tenants else None
+            margin = overlay.match_margin(engine) if overlay else self.margin
+            for shard in split_shards(text, self.chunk_chars, margin):
+                shard_text = text[shard.start : shard.end]
+                # /check と同じく正規化して照合（文書全体を見るチェックは除く）
+                if overlay is not None:
+                    store = overlay.check_window(engine, shard_text)
+                else:
+                    store = engine.check_window(shard_text)
+                # 担当範囲に始まる修正だけを使う
+                lo = shard.core_start - shard.start
+                hi = shard.core_end - shard.start
+                store = store.take(
+                    i for i, start in enumerate(store.starts) if lo <= start < hi
+                )
+                if lost.is_set():
+                    raise JobLost(job.job_id)
+                self._collect(job, store, shard.start, edits)
+
+                job.processed_chars = shard.core_end
+                job.updated_at = time.time()
+                self._save(job)
+
+            # 文書全体を見るチェックは最後にまとめて実行
+            disabled = overlay.disabled if overlay else frozenset()
+            store = engine.check_normalized(
+                text,
+                lambda target, notation: self._check_document(
+                    target, disabled, notation
+                ),
+                disabled=disabled,
+            )
+            if lost.is_set():
+                raise JobLost(job.job_id)
+            self._collect(job, store, 0, edits)
+
+            if job.apply_corrections:
+                job.corrected_text = _apply_edits(text, edits)
+            job.status = JobStatus.COMPLETED
+        except JobLost:
+            raise
+        except Exception as e:
+            logger.exception("Job %s failed", job.job_id)
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+
+        job.updated_at = time.time()
+        self._save(job, drop_text=True)
+
+    def _check_document(
+        self, text: str, disabled: Set[str], notation: bool = True
+    ) -> CorrectionStore:
+        """文書全体を見る必要があるチェック（文体統一・表記統一）"""
+        engine = self.rule_engine
+        store = engine.new_store(text)
+        store.extend_results(
+            correction
+            for correction in GrammarChecker.merge_results(
+                engine.grammar_checker.check_document(text, notation)
+            )
+            if correction.rule_name not in disabled
+        )
+        return store
+
+    def _collect(
+        self,
+        job: Job,
+        store: CorrectionStore,
+        offset: int,
+        edits: List[Tuple[int, int, str]],
+    ) -> None:
+        if job.apply_corrections:
+            edits.extend(
+                (c.start_pos + offset, c.end_pos + offset, c.corrected_text)
+                for c in store
+            )
+        self._store(job, store, offset)
+
+    def run_forever(self) -> None:
+        """停止されるまでジョブを処理（ときどき止まったジョブを待ち行列に戻す）"""
+        next_sweep = 0.0
+        while not self._stopped.is_set():
+            if time.monotonic() >= next_sweep:
+                self.broker.requeue_stale(self.visibility_timeout, self.max_attempts)
+                next_sweep = time.monotonic() + self.visibility_timeout / 4
+            job_id = self.broker.dequeue(_POLL_TIMEOUT)
+            if job_id is None:
+                continue
+            # 処理できなかった・担当が移ったジョブは一覧に残し、見回りに任せる
+            job = self.run_job(job_id)
+            if job is not None:
+                self.broker.ack(job_id, job.attempts)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def _apply_edits(text: str, edits: List[Tuple[int, int, str]]) -> str:
+    """CorrectionStore.apply と同じ規則で重ならない修正を適用"""
+    selected = resolve_overlaps([e[0] for e in edits], [e[1] for e in edits])
+    pieces = []
+    position = 0
+    for i in selected:
+        start, end, replacement = edits[i]
+        pieces.append(text[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+class InlineWorkers:
+    """API サーバー内でジョブを処理するスレッド（memory:// 用）"""
+
+    def __init__(
+        self,
+        broker: JobBroker,
+        rule_engine: RuleEngine,
+        threads: int = JOB_INLINE_WORKERS,
+        tenants: Optional[TenantRegistry] = None,
+    ):
+        self.workers = [
+            JobWorker(broker, rule_engine, tenants=tenants) for _ in range(threads)
+        ]
+        self._threads = [
+            threading.Thread(
+                target=worker.run_forever, name=f"job-worker-{i}", daemon=True
+            )
+            for i, worker in enumerate(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        for worker in self.workers:
+            worker.stop()
+        for thread in self._threads:
+            thread.join(_POLL_TIMEOUT * 2)
+
+
+def _worker_main(
+    broker_url: str, rules_dir: Optional[str], bundle_path: Optional[str]
+) -> None:
+    """ワーカープロセスの本体"""
+    broker = create_broker(broker_url)
+    engine = RuleEngine(rules_dir, bundle_path=bundle_path)
+    worker = JobWorker(broker, engine, tenants=TenantRegistry(engine))
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.close()
+
+
+def run_worker_pool(
+    broker_url: str,
+    processes: int,
+    rules_dir: Optional[str] = None,
+    bundle_path: Optional[str] = None,
+) -> None:
+    """待ち行列を処理するワーカープロセスを起動して終了まで待つ"""
+    if broker_url.startswith("memory://"):
+        raise ValueError("worker processes need a shared broker (redis://...)")
+
+    context = get_context("spawn")
+    workers = [
+        context.Process(
+            target=_worker_main,
+            args=(broker_url, rules_dir, bundle_path),
+            name=f"job-worker-{i}",
+        )
+        for i in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
@@ -0,0 +1,155 @@
+"""
+入力中テキストのライブ校正
+
+エディタから WebSocket で送られてくる文書のリビジョンを受け取り、一定時間
+入力が止まるのを待ってから校正する。新しいリビジョンが届いた時点で、古い
+リビジョンの待機中・実行中のチェックは取り消し、最新リビジョンの結果だけを返す。
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from app.services.rule_engine import CheckCancelled, RuleEngine
+from app.services.scheduler import Lane, LaneScheduler, SchedulerRejected
+
+logger = logging.getLogger(__name__)
+
+# 最後の入力からチェック開始までの待ち時間（ミリ秒）
+DEBOUNCE_MS = int(os.getenv("LIVE_CHECK_DEBOUNCE_MS", "150"))
+# 1接続あたりの同時実行数
+MAX_CONCURRENCY = int(os.getenv("LIVE_CHECK_MAX_CONCURRENCY", "1"))
+
+
+class LiveCheckSession:
+    """1接続ぶんのライブ校正"""
+
+    def __init__(
+        self,
+        rule_engine: RuleEngine,
+        send: Callable[[Dict[str, Any]], Awaitable[None]],
+        debounce_ms: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        scheduler: Optional[LaneScheduler] = None,
+        client_id: str = "live",
+    ):
+        self.rule_engine = rule_engine
+        self.send = send
+        self.debounce = (DEBOUNCE_MS if debounce_ms is None else debounce_ms) / 1000
+        # 指定があれば interactive レーンで実行する
+        self.scheduler = scheduler
+        self.client_id = client_id
+        self.latest_revision = -1
+        self.stats = {
+            "received": 0,
+            "checked": 0,
+            "cancelled": 0,
+            "sent": 0,
+            "failed": 0,
+        }
+        self._semaphore = asyncio.Semaphore(max_concurrency or MAX_CONCURRENCY)
+        self._tasks: Set[asyncio.Task] = set()
+        # 実行中のチェックの中断フラグ（リビジョンごと）
+        self._running: Dict[int, threading.Event] = {}
+
+    def submit(self, revision: int, text: str, apply_corrections: bool = False) -> None:
+        """新しいリビジョンを受け付け、古いリビジョンのチェックを取り消し"""
+        self.stats["received"] += 1
+        if revision <= self.latest_revision:
+            # 追い越された古いメッセージ
+            return
+        self.latest_revision = revision
+
+        self.stats["cancelled"] += len(self._tasks)
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        for cancel_event in self._running.values():
+            cancel_event.set()
+
+        task = asyncio.ensure_future(self._run(revision, text, apply_corrections))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _is_stale(self, revision: int) -> bool:
+        return revision != self.latest_revision
+
+    def _check(
+        self, text: str, apply_corrections: bool, cancel_event: threading.Event
+    ) -> Dict[str, Any]:
+        corrections = self.rule_engine.check_text_compact(text, cancel_event)
+        return {
+            "corrected_text": corrections.apply() if apply_corrections else text,
+            "corrections": list(corrections.records()),
+            "ai_processing_recommended": self.rule_engine.should_apply_ai_processing(
+                text
+            ),
+        }
+
+    async def _execute(
+        self, text: str, apply_corrections: bool, cancel_event: threading.Event
+    ) -> Dict[str, Any]:
+        if self.scheduler is None:
+            return await run_in_threadpool(
+                self._check, text, apply_corrections, cancel_event
+            )
+        return await self.scheduler.submit(
+            Lane.INTERACTIVE,
+            self.client_id,
+            self._check,
+            text,
+            apply_corrections,
+            cancel_event,
+        )
+
+    async def _run(self, revision: int, text: str, apply_corrections: bool) -> None:
+        try:
+            await asyncio.sleep(self.debounce)
+            async with self._semaphore:
+                if self._is_stale(revision):
+                    raise asyncio.CancelledError()
+
+                cancel_event = threading.Event()
+                self._running[revision] = cancel_event
+                try:
+                    result = await self._execute(text, apply_corrections, cancel_event)
+                finally:
+                    self._running.pop(revision, None)
+                self.stats["checked"] += 1
+        except (asyncio.CancelledError, CheckCancelled):
+            return
+        except SchedulerRejected as e:
+            await self._send_error(revision, str(e))
+            return
+        except Exception:
+            # 想定外の失敗でもクライアントがリビジョンの結果を待ち続けないようにする
+            logger.exception("Live check failed for revision %s", revision)
+            self.stats["failed"] += 1
+            await self._send_error(revision, "チェックに失敗しました")
+            return
+
+        if self._is_stale(revision):
+            return
+
+        await self.send({"revision": revision, "original_text": text, **result})
+        self.stats["sent"] += 1
+
+    async def _send_error(self, revision: int, error: str) -> None:
+        """エラーを通知（接続が切れていれば諦める）"""
+        try:
+            await self.send({"revision": revision, "error": error})
+        except Exception:
+            logger.debug("Could not send live check error", exc_info=True)
+
+    async def close(self) -> None:
+        """接続終了時に残っているチェックを取り消し"""
+        for cancel_event in self._running.values():
+            cancel_event.set()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,128 @@
+"""
+リテラルパターンの一括照合（Aho-Corasick）
+
+オートマトンは int32 のフラットな表（CSR 形式の遷移・失敗遷移・出力）だけで
+表現する。表は array でも mmap 上の memoryview でもよく、ルールセットバンドルから
+読み込んだ場合はコピーせずにそのまま照合に使う。
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Iterator, List, Mapping, Sequence, Tuple
+
+# 表の名前（バンドルのセクション名にもなる）
+TABLE_NAMES = (
+    "edge_start",  # 状態ごとの遷移の開始位置（状態数 + 1）
+    "edge_chars",  # 遷移文字のコードポイント（状態ごとに昇順）
+    "edge_targets",  # 遷移先の状態
+    "fail",  # 失敗遷移
+    "out_start",  # 状態ごとの出力の開始位置（状態数 + 1）
+    "out_ids",  # 出力するパターンID
+    "lengths",  # パターンの文字数
+)
+
+
+class LiteralMatcher:
+    """複数リテラルパターンの同時照合"""
+
+    def __init__(self, tables: Mapping[str, Sequence[int]]):
+        self.edge_start = tables["edge_start"]
+        self.edge_chars = tables["edge_chars"]
+        self.edge_targets = tables["edge_targets"]
+        self.fail = tables["fail"]
+        self.out_start = tables["out_start"]
+        self.out_ids = tables["out_ids"]
+        self.lengths = tables["lengths"]
+
+    @property
+    def pattern_count(self) -> int:
+        return len(self.lengths)
+
+    @property
+    def max_length(self) -> int:
+        return max(self.lengths, default=0)
+
+    @classmethod
+    def build(cls, patterns: Sequence[str]) -> "LiteralMatcher":
+        """パターン一覧からオートマトンを構築
+
+        パターンIDは patterns のインデックス。空文字列は照合しない。
+        """
+        goto: List[Dict[int, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+
+        for pattern_id, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                code = ord(ch)
+                next_state = goto[state].get(code)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][code] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(pattern_id)
+
+        # 幅優先で失敗遷移を計算し、失敗先の出力を引き継ぐ
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for code, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and code not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(code, 0) if state else 0
+                outputs[next_state].extend(outputs[fail[next_state]])
+
+        tables: Dict[str, array] = {name: array("i") for name in TABLE_NAMES}
+        for state, edges in enumerate(goto):
+            tables["edge_start"].append(len(tables["edge_chars"]))
+            for code in sorted(edges):
+                tables["edge_chars"].append(code)
+                tables["edge_targets"].append(edges[code])
+            tables["out_start"].append(len(tables["out_ids"]))
+            tables["out_ids"].extend(outputs[state])
+        tables["edge_start"].append(len(tables["edge_chars"]))
+        tables["out_start"].append(len(tables["out_ids"]))
+        tables["fail"].extend(fail)
+        tables["lengths"].extend(len(p) for p in patterns)
+
+        return cls(tables)
+
+    def tables(self) -> Dict[str, Sequence[int]]:
+        """シリアライズ用に表を返す"""
+        return {name: getattr(self, name) for name in TABLE_NAMES}
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """(パターンID, 開始位置, 終了位置) を終了位置順に列挙"""
+        edge_start = self.edge_start
+        edge_chars = self.edge_chars
+        edge_targets = self.edge_targets
+        fail = self.fail
+        out_start = self.out_start
+        out_ids = self.out_ids
+        lengths = self.lengths
+
+        state = 0
+        for position, ch in enumerate(text, 1):
+            code = ord(ch)
+            while True:
+                lo = edge_start[state]
+                hi = edge_start[state + 1]
+                index = bisect_left(edge_chars, code, lo, hi)
+                if index < hi and edge_chars[index] == code:
+                    state = edge_targets[index]
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+
+            for k in range(out_start[state], out_start[state + 1]):
+                pattern_id = out_ids[k]
+                yield pattern_id, position - lengths[pattern_id], position
@@ -0,0 +1,266 @@
+"""
+校正処理の段階ごとのメモリ計測とリクエストごとのメモリ予算
+
+大きな入力の /check では、リクエストの解析（本文の複製）・ルールの照合・
+形態素解析・文法チェック・修正の適用・レスポンスの組み立てと直列化の各段階で
+メモリが積み上がり、ワーカーの RSS が数倍に跳ねることがある。
+
+MEMORY_TRACKING=true にすると tracemalloc で段階ごとの確保量を計測する。
+段階ごとに、その段階の間の最大の増加量（peak）と、段階を抜けた時点で残っている
+増加量（retained）を記録し、/metrics で参照できる。tracemalloc はプロセス全体で
+1つなので、計測は同時に1リクエストだけ行う（ほかのリクエストは計測しない）。
+同時に処理しているリクエストの確保も数値に入り、並列チェックのワーカー
+プロセスでの確保は入らない。
+
+MEMORY_REQUEST_BUDGET（バイト）を設定すると、入力の大きさと修正件数から
+見積もった使用量が予算を超えるリクエストを次のように扱う。
+
+- 本文を読み込む前・読み込みながら（Content-Length と受け取ったバイト数から
+  見積もる）: 413 を返す（長い文書は /jobs へ）
+- チェックを始める前（文字数から修正件数を多めに見積もる）:
+  MEMORY_BUDGET_ACTION=reject なら 413 を返す
+- 照合のあと（実際の修正件数から見積もる）: MEMORY_BUDGET_ACTION=compact なら
+  レスポンスのモデルを組み立てずに列指向の結果から直接ストリーミングで返し、
+  reject なら 413 を返す
+
+    MEMORY_TRACKING=true MEMORY_REQUEST_BUDGET=268435456 uvicorn app.main:app
+"""
+
+import math
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+# tracemalloc で段階ごとの確保量を計測するか
+MEMORY_TRACKING = os.getenv("MEMORY_TRACKING", "false").lower() == "true"
+# 確保元として記録するスタックの深さ（深いほど遅い）
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "1"))
+# リクエストごとのメモリ予算（バイト、0 なら制限しない）
+MEMORY_REQUEST_BUDGET = int(os.getenv("MEMORY_REQUEST_BUDGET", "0"))
+# 照合のあとに予算を超えると見積もったとき（compact / reject）
+MEMORY_BUDGET_ACTION = os.getenv("MEMORY_BUDGET_ACTION", "compact").lower()
+
+STAGES = ("parse", "rules", "morphology", "grammar", "apply", "serialize")
+
+# 見積もりの係数（同梱のルールセットで tracemalloc により計測した値に余裕を見たもの）
+# リクエスト本文1バイトあたり（本文・解析後の文字列・正規化後の文字列・照合の作業領域）
+BYTES_PER_BODY_BYTE = 8
+# 本文1文字あたり（上記に加えて修正後の文字列とレスポンスの本文）
+BYTES_PER_CHAR = 24
+# 修正1件あたり（CorrectionResponse と直列化した JSON）
+BYTES_PER_CORRECTION = 1500
+# チェックの前に見積もるときの修正1件あたりの文字数（誤りの多い文書で計測した値に余裕を見たもの）
+CHARS_PER_CORRECTION = 4
+
+_current: ContextVar[Optional["StageTracker"]] = ContextVar(
+    "memory_stage_tracker", default=None
+)
+_tracking_lock = threading.Lock()
+_NULL_STAGE = nullcontext()
+
+
+class MemoryBudgetExceeded(Exception):
+    """見積もった使用量がメモリ予算を超える"""
+
+    def __init__(self, projected: int, budget: int):
+        super().__init__(f"見積もりのメモリ使用量 {projected} バイトが予算 {budget} バイトを超えます")
+        self.projected = projected
+        self.budget = budget
+
+
+def project_body_bytes(content_length: int) -> int:
+    """リクエスト本文を読み込んで照合するまでの見積もりの使用量"""
+    return content_length * BYTES_PER_BODY_BYTE
+
+
+def project_check_bytes(chars: int, corrections: int) -> int:
+    """照合のあと、レスポンスを返すまでの見積もりの使用量"""
+    return chars * BYTES_PER_CHAR + corrections * BYTES_PER_CORRECTION
+
+
+def project_text_bytes(chars: int) -> int:
+    """チェックを始める前の見積もりの使用量（修正件数は文字数から多めに見積もる）"""
+    return project_check_bytes(chars, math.ceil(chars / CHARS_PER_CORRECTION))
+
+
+def start_tracking() -> None:
+    """計測が有効なら tracemalloc を開始"""
+    if MEMORY_TRACKING and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+
+
+@dataclass
+class _Frame:
+    name: str
+    start: int
+    peak: int
+
+
+class StageTracker:
+    """1リクエストの段階ごとの確保量（同時に1つだけ）
+
+    段階は入れ子にでき（文法チェック中の形態素解析など）、外側の段階の peak には
+    内側の段階の確保も含まれる。同じ段階に複数回入ったときは peak は最大、
+    retained は合計を記録する。
+    """
+
+    def __init__(self) -> None:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self._total = _Frame("total", current, current)
+        self._open: List[_Frame] = []
+        self.stages: Dict[str, Dict[str, int]] = {}
+        self.retained = 0
+        self._finished = False
+
+    @classmethod
+    def try_start(cls) -> Optional["StageTracker"]:
+        """計測中のリクエストがなく tracemalloc が動いていれば計測を開始"""
+        if not tracemalloc.is_tracing():
+            return None
+        if not _tracking_lock.acquire(blocking=False):
+            return None
+        try:
+            return cls()
+        except BaseException:
+            _tracking_lock.release()
+            raise
+
+    def _fold(self) -> int:
+        """ここまでの最大値を開いている段階に反映して最大値をリセット"""
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self._open:
+            frame.peak = max(frame.peak, peak)
+        self._total.peak = max(self._total.peak, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def begin(self, name: str) -> None:
+        current = self._fold()
+        self._open.append(_Frame(name, current, current))
+
+    def end(self) -> None:
+        current = self._fold()
+        frame = self._open.pop()
+        stage = self.stages.setdefault(frame.name, {"peak": 0, "retained": 0})
+        stage["peak"] = max(stage["peak"], frame.peak - frame.start)
+        stage["retained"] += current - frame.start
+
+    def end_stage(self, name: str) -> None:
+        """name の段階が開いていれば（内側の段階も含めて）閉じる"""
+        if any(frame.name == name for frame in self._open):
+            while self._open[-1].name != name:
+                self.end()
+            self.end()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end()
+
+    @contextmanager
+    def activate(self) -> Iterator[None]:
+        """このスレッド（コンテキスト）の memory_stage をこの計測に記録"""
+        token = _current.set(self)
+        try:
+            yield
+        finally:
+            _current.reset(token)
+
+    def finish(self) -> Dict[str, Any]:
+        """開いている段階を閉じて計測を終え、結果を返す"""
+        if self._finished:
+            return self.report()
+        try:
+            while self._open:
+                self.end()
+            current = self._fold()
+            self.retained = current - self._total.start
+        finally:
+            self._finished = True
+            _tracking_lock.release()
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "peak": self._total.peak - self._total.start,
+            "retained": self.retained,
+            "stages": {name: dict(stage) for name, stage in self.stages.items()},
+        }
+
+
+def memory_stage(name: str) -> ContextManager[None]:
+    """計測中のリクエストなら name の段階として記録（計測していなければ何もしない）"""
+    tracker = _current.get()
+    if tracker is None:
+        return _NULL_STAGE
+    return tracker.stage(name)
+
+
+class MemoryStats:
+    """計測結果と予算による制限の集計"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.tracked = 0
+        self.rejected = 0
+        self.compacted = 0
+        self.peak_max = 0
+        self.stages: Dict[str, Dict[str, int]] = {}
+
+    def record(self, report: Dict[str, Any]) -> None:
+        with self._lock:
+            self.tracked += 1
+            self.peak_max = max(self.peak_max, report["peak"])
+            for name, stage in report["stages"].items():
+                totals = self.stages.setdefault(
+                    name,
+                    {"count": 0, "peak_max": 0, "peak_total": 0, "retained_max": 0},
+                )
+                totals["count"] += 1
+                totals["peak_max"] = max(totals["peak_max"], stage["peak"])
+                totals["peak_total"] += stage["peak"]
+                totals["retained_max"] = max(totals["retained_max"], stage["retained"])
+
+    def record_rejected(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def record_compacted(self) -> None:
+        with self._lock:
+            self.compacted += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                name: {
+                    "count": totals["count"],
+                    "peak_max": totals["peak_max"],
+                    "peak_mean": totals["peak_total"] // totals["count"],
+                    "retained_max": totals["retained_max"],
+                }
+                for name, totals in sorted(
+                    self.stages.items(), key=lambda item: _stage_order(item[0])
+                )
+            }
+            return {
+                "tracking": tracemalloc.is_tracing(),
+                "budget": MEMORY_REQUEST_BUDGET,
+                "budget_action": MEMORY_BUDGET_ACTION,
+                "tracked_requests": self.tracked,
+                "peak_max": self.peak_max,
+                "stages": stages,
+                "rejected": self.rejected,
+                "compacted": self.compacted,
+            }
+
+
+def _stage_order(name: str) -> int:
+    return STAGES.index(name) if name in STAGES else len(STAGES)
@@ -0,0 +1,302 @@
+"""
+n-gram 頻度表による漢字の誤変換チェック
+
+「以外／意外」「保証／保障」のような同音異義語の取り違えは、リテラルのルールでは
+書けない。そこで取り違えやすい語の組（confusables）を決めておき、コーパスで
+各語の直前・直後の文字 n-gram（例: 「の対象」「対象者」）の出現数を集計した表を
+作っておく。チェック時は出現した語と同じ組の別の語を同じ文脈に置いた n-gram の
+出現数を比べ、別の語の方が明らかに自然な場合だけ誤変換候補として指摘する。
+
+頻度表は n-gram の64ビットハッシュの昇順配列と出現数の配列だけからなり、
+typo_checker の索引と同じセクション形式のファイルを mmap して使う。テキスト中の
+全出現・全候補の n-gram をまとめてハッシュし、numpy の二分探索1回で引くので、
+1KB あたりの処理時間は語の出現数に比例する小さな値に収まる。
+
+    python -m app.cli build-ngram-table corpus.txt -o misconversion.tbl
+    MISCONVERSION_TABLE=misconversion.tbl uvicorn app.main:app
+
+コーパスは UTF-8 テキスト（1行1文程度）。組の定義は rules/confusables/ にある。
+"""
+
+import hashlib
+import os
+import struct
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import yaml
+
+from app.services.corrections import CorrectionResult
+from app.services.matcher import LiteralMatcher
+from app.services.ruleset_bundle import SectionFile, write_sections
+from app.services.typo_checker import string_hash
+
+MAGIC = b"PRNGRAMT"
+FORMAT_VERSION = 1
+
+DEFAULT_CONFUSABLES = (
+    Path(__file__).parent.parent / "rules" / "confusables" / "homophones.yml"
+)
+# 語の前後それぞれに見る文脈の最大文字数
+DEFAULT_CONTEXT = 2
+
+# スコア（文脈 n-gram ごとの log(出現数 + SMOOTHING) の和）の差がこれ以上なら指摘
+MISCONVERSION_MARGIN = float(os.getenv("MISCONVERSION_MARGIN", "3.0"))
+# 提案する語の文脈 n-gram の出現数の最大値がこれ未満なら根拠不足として指摘しない
+MISCONVERSION_MIN_COUNT = int(os.getenv("MISCONVERSION_MIN_COUNT", "3"))
+
+SMOOTHING = 0.5
+# 一度にハッシュ・検索する出現数（巨大なテキストでも一時配列を小さく保つ）
+_BATCH_OCCURRENCES = 4096
+
+_PARAMS = struct.Struct("<I")
+
+
+def read_confusables(path: Union[str, Path] = DEFAULT_CONFUSABLES) -> List[List[str]]:
+    """取り違えやすい語の組を読み込み"""
+    with open(path, encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    groups = []
+    for group in data.get("groups") or []:
+        words = list(dict.fromkeys(str(word) for word in group if word))
+        if len(words) >= 2:
+            groups.append(words)
+    return groups
+
+
+def _contexts(text: str, start: int, end: int, context: int) -> Tuple[str, str]:
+    """語の直前・直後の文脈（改行はまたがない）"""
+    left = text[max(0, start - context) : start].rpartition("\n")[2]
+    right = text[end : end + context].partition("\n")[0]
+    return left, right
+
+
+def context_ngrams(word: str, left: str, right: str) -> List[str]:
+    """語を含む文脈 n-gram（左に1〜len(left)文字、右に1〜len(right)文字）"""
+    return [left[-k:] + word for k in range(1, len(left) + 1)] + [
+        word + right[:k] for k in range(1, len(right) + 1)
+    ]
+
+
+class _GroupIndex:
+    """語 → 組の対応と、全語を一括で探すオートマトン"""
+
+    def __init__(self, groups: Sequence[Sequence[str]]):
+        self.groups = [list(group) for group in groups]
+        self.words: List[str] = []
+        self.word_group: List[int] = []
+        for group_id, group in enumerate(self.groups):
+            for word in group:
+                self.words.append(word)
+                self.word_group.append(group_id)
+        self.matcher = LiteralMatcher.build(self.words)
+
+    def occurrences(self, text: str) -> List[Tuple[int, int, int]]:
+        """(語ID, 開始位置, 終了位置)（重なる場合は左から最長の語）"""
+        matches = sorted(
+            self.matcher.finditer(text), key=lambda m: (m[1], -(m[2] - m[1]))
+        )
+        results = []
+        position = 0
+        for word_id, start, end in matches:
+            if start >= position:
+                results.append((word_id, start, end))
+                position = end
+        return results
+
+
+def corpus_fingerprint(
+    corpus_paths: Sequence[Union[str, Path]], groups: Sequence[Sequence[str]]
+) -> str:
+    """コーパスと組の定義から指紋（SHA-256）を計算"""
+    digest = hashlib.sha256(b"%s:%d" % (MAGIC, FORMAT_VERSION))
+    digest.update(repr(groups).encode("utf-8"))
+    for path in corpus_paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def count_ngrams(
+    lines: Iterable[str], groups: Sequence[Sequence[str]], context: int
+) -> Counter:
+    """コーパスに出現した語と、その文脈 n-gram の出現数を集計"""
+    index = _GroupIndex(groups)
+    counts: Counter = Counter()
+    for line in lines:
+        line = line.rstrip("\n")
+        for word_id, start, end in index.occurrences(line):
+            word = index.words[word_id]
+            left, right = _contexts(line, start, end, context)
+            counts[word] += 1
+            counts.update(context_ngrams(word, left, right))
+    return counts
+
+
+def write_ngram_table(
+    path: Union[str, Path],
+    counts: Dict[str, int],
+    groups: Sequence[Sequence[str]],
+    fingerprint: str,
+    context: int = DEFAULT_CONTEXT,
+) -> None:
+    """n-gram 頻度表を書き出し"""
+    hashes = np.fromiter(
+        (string_hash(ngram) for ngram in counts), dtype=np.uint64, count=len(counts)
+    )
+    values = np.fromiter(
+        (min(count, 0xFFFFFFFF) for count in counts.values()),
+        dtype=np.uint32,
+        count=len(counts),
+    )
+    order = np.argsort(hashes, kind="stable")
+    groups_text = "\n".join("\t".join(group) for group in groups)
+
+    write_sections(
+        path,
+        MAGIC,
+        FORMAT_VERSION,
+        fingerprint,
+        [
+            ("params", _PARAMS.pack(context)),
+            ("groups", groups_text.encode("utf-8")),
+            ("keys", hashes[order].tobytes()),
+            ("counts", values[order].tobytes()),
+        ],
+    )
+
+
+def build_ngram_table(
+    path: Union[str, Path],
+    corpus_paths: Sequence[Union[str, Path]],
+    confusables_path: Union[str, Path] = DEFAULT_CONFUSABLES,
+    context: int = DEFAULT_CONTEXT,
+) -> None:
+    """コーパスを集計して頻度表を作成"""
+    groups = read_confusables(confusables_path)
+    counts: Counter = Counter()
+    for corpus_path in corpus_paths:
+        with open(corpus_path, encoding="utf-8") as f:
+            counts.update(count_ngrams(f, groups, context))
+    write_ngram_table(
+        path, counts, groups, corpus_fingerprint(corpus_paths, groups), context
+    )
+
+
+class NgramTable(SectionFile):
+    """mmap した n-gram 頻度表"""
+
+    def __init__(self, path: Union[str, Path]):
+        super().__init__(path, MAGIC, FORMAT_VERSION)
+        (self.context,) = _PARAMS.unpack(self.section("params"))
+        groups_text = str(self.section("groups"), "utf-8")
+        self.groups = [line.split("\t") for line in groups_text.split("\n") if line]
+        self._keys = np.frombuffer(self.section("keys"), np.uint64)
+        self._counts = np.frombuffer(self.section("counts"), np.uint32)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def counts(self, ngrams: Sequence[str]) -> np.ndarray:
+        """n-gram の出現数（表になければ0）をまとめて引く"""
+        if not len(self._keys):
+            return np.zeros(len(ngrams), dtype=np.uint32)
+        hashes = np.fromiter(
+            (string_hash(ngram) for ngram in ngrams),
+            dtype=np.uint64,
+            count=len(ngrams),
+        )
+        positions = np.searchsorted(self._keys, hashes)
+        positions[positions == len(self._keys)] = 0
+        found = self._keys[positions] == hashes
+        return np.where(found, self._counts[positions], 0)
+
+    def count(self, ngram: str) -> int:
+        return int(self.counts([ngram])[0])
+
+
+class MisconversionChecker:
+    """同じ組の別の語の方が文脈に合う語を誤変換候補として指摘"""
+
+    def __init__(
+        self,
+        table: NgramTable,
+        margin: float = MISCONVERSION_MARGIN,
+        min_count: int = MISCONVERSION_MIN_COUNT,
+    ):
+        self.table = table
+        self.margin = margin
+        self.min_count = min_count
+        self._index = _GroupIndex(table.groups)
+
+    @classmethod
+    def from_env(cls) -> Optional["MisconversionChecker"]:
+        """環境変数 MISCONVERSION_TABLE から作成（未設定なら None）"""
+        path = os.getenv("MISCONVERSION_TABLE")
+        return cls(NgramTable(path)) if path else None
+
+    def check(self, text: str) -> List[CorrectionResult]:
+        """誤変換候補をチェック"""
+        occurrences = self._index.occurrences(text)
+        corrections = []
+        for i in range(0, len(occurrences), _BATCH_OCCURRENCES):
+            corrections.extend(
+                self._score_batch(text, occurrences[i : i + _BATCH_OCCURRENCES])
+            )
+        return corrections
+
+    def _score_batch(
+        self, text: str, occurrences: Sequence[Tuple[int, int, int]]
+    ) -> List[CorrectionResult]:
+        """出現ごとに組の各語を同じ文脈に置いたスコアを比較"""
+        ngrams: List[str] = []
+        # 候補ごとの n-gram の範囲 ngrams[segments[i]:segments[i + 1]]
+        segments: List[int] = []
+        # 出現ごとの (語ID, 開始位置, 終了位置, 候補の先頭番号, 組)
+        entries = []
+        for word_id, start, end in occurrences:
+            left, right = _contexts(text, start, end, self.table.context)
+            if not left and not right:
+                continue
+            group = self._index.groups[self._index.word_group[word_id]]
+            entries.append((word_id, start, end, len(segments), group))
+            for candidate in group:
+                segments.append(len(ngrams))
+                ngrams.extend(context_ngrams(candidate, left, right))
+        if not entries:
+            return []
+
+        counts = self.table.counts(ngrams)
+        starts = np.array(segments)
+        scores = np.add.reduceat(np.log(counts + SMOOTHING), starts)
+        evidence = np.maximum.reduceat(counts, starts)
+
+        corrections = []
+        for word_id, start, end, first, group in entries:
+            word = self._index.words[word_id]
+            current = first + group.index(word)
+            best = first + int(np.argmax(scores[first : first + len(group)]))
+            if best == current or evidence[best] < self.min_count:
+                continue
+            difference = float(scores[best] - scores[current])
+            if difference < self.margin:
+                continue
+
+            replacement = group[best - first]
+            corrections.append(
+                CorrectionResult(
+                    original_text=word,
+                    corrected_text=replacement,
+                    start_pos=start,
+                    end_pos=end,
+                    rule_name="誤変換候補",
+                    category="spelling",
+                    description=f"文脈から「{replacement}」の誤変換の可能性",
+                    confidence=0.8 if difference >= 2 * self.margin else 0.6,
+                )
+            )
+
+        return corrections
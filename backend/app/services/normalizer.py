@@ -0,0 +1,141 @@
+"""
+照合前のテキスト正規化
+
+半角カタカナ・互換文字（㈱、①など）・ゼロ幅空白のような入力の揺れごとに
+ルールのパターンを増やさずに済むよう、照合の前にテキストを NFKC で正規化し、
+無視してよい文字（ゼロ幅空白・結合子・異体字セレクタなど）を取り除く。
+ルールと文法チェックは正規化後のテキストに対して1回だけ実行し、結果の位置は
+オフセット表で元のテキストの位置に戻す。
+
+全角英数字・全角記号（U+FF01〜U+FF5E）と全角空白は表記統一のチェック対象
+なので NFKC でも変換しない。
+
+オフセット表は正規化後の各文字について「元のテキストでの位置 − 正規化後の位置」を
+並べた array('i')（末尾に番兵）。1文字が複数文字に展開された場合（㈱ → (株)）は
+展開後の各文字が展開元の文字の位置を指す。
+"""
+
+import re
+import unicodedata
+from array import array
+from typing import Collection, Optional, Tuple
+
+from app.services.corrections import CorrectionStore
+
+# 取り除く文字（ソフトハイフン・ゼロ幅空白・ゼロ幅（非）接合子・単語結合子・BOM・
+# 異体字セレクタ）
+_IGNORABLE = frozenset(
+    [0x00AD, 0x200B, 0x200C, 0x200D, 0x2060, 0xFEFF] + list(range(0xFE00, 0xFE10))
+)
+_IGNORABLE_PATTERN = re.compile("[%s]" % "".join(map(chr, sorted(_IGNORABLE))))
+
+# NFKC でも変換しない文字（全角英数字・全角記号・全角空白）
+_PRESERVED = frozenset(list(range(0xFF01, 0xFF5F)) + [0x3000])
+# 正規化が必要かを判定するとき、変換しない文字を NFKC で変わらない文字に置き換える
+_PRESERVED_MASK = {code: "a" for code in _PRESERVED}
+
+# 直前の文字と合成される文字（半角の濁点・半濁点、ハングルの中声・終声）
+_COMPOSING = frozenset([0xFF9E, 0xFF9F] + list(range(0x1160, 0x1200)))
+
+
+def _is_stable(text: str) -> bool:
+    """正規化しても変わらないか"""
+    return not _IGNORABLE_PATTERN.search(text) and unicodedata.is_normalized(
+        "NFKC", text.translate(_PRESERVED_MASK)
+    )
+
+
+class NormalizedText:
+    """正規化後のテキストと、元のテキストへのオフセット表"""
+
+    __slots__ = ("text", "original", "deltas")
+
+    def __init__(self, text: str, original: str, deltas: array):
+        self.text = text
+        self.original = original
+        self.deltas = deltas
+
+    def original_position(self, position: int) -> int:
+        """正規化後の位置に対応する元のテキストの位置"""
+        return position + self.deltas[position]
+
+    def original_span(self, start: int, end: int) -> Tuple[int, int]:
+        """正規化後の範囲 [start, end) に対応する元のテキストの範囲
+
+        展開された文字の途中で終わる範囲は、展開元の文字全体を含むように広げる。
+        """
+        original_start = self.original_position(start)
+        if end <= start:
+            return original_start, original_start
+        last = self.original_position(end - 1)
+        length = len(self.text)
+        while end < length and self.original_position(end) == last:
+            end += 1
+        return original_start, self.original_position(end)
+
+    def restore(
+        self, store: CorrectionStore, exclude_rules: Collection[str] = ()
+    ) -> CorrectionStore:
+        """正規化後のテキストの結果を元のテキストの位置に戻す"""
+        restored = CorrectionStore(self.original, store.meta)
+        meta = store.meta
+        for start, end, meta_id in zip(store.starts, store.ends, store.meta_ids):
+            if exclude_rules and meta[meta_id][0] in exclude_rules:
+                continue
+            original_start, original_end = self.original_span(start, end)
+            restored.add(original_start, original_end, meta_id)
+        return restored
+
+
+def _normalize_line(line: str, offset: int, pieces: list, deltas: array) -> None:
+    """1行を文字のまとまり（基底文字 + 結合文字）ごとに正規化
+
+    offset は行の元のテキストでの位置。
+    """
+    length = len(line)
+    i = 0
+    while i < length:
+        j = i + 1
+        while j < length and (
+            ord(line[j]) in _COMPOSING or unicodedata.combining(line[j])
+        ):
+            j += 1
+
+        code = ord(line[i])
+        if code in _IGNORABLE:
+            i += 1
+            continue
+        if code in _PRESERVED:
+            rest = "".join(c for c in line[i + 1 : j] if ord(c) not in _IGNORABLE)
+            out = line[i] + unicodedata.normalize("NFKC", rest)
+        else:
+            cluster = "".join(c for c in line[i:j] if ord(c) not in _IGNORABLE)
+            out = unicodedata.normalize("NFKC", cluster)
+
+        pieces.append(out)
+        delta = offset + i - len(deltas)
+        deltas.extend([delta - k for k in range(len(out))])
+        i = j
+
+
+def normalize_text(text: str) -> Optional[NormalizedText]:
+    """テキストを正規化（変わらない場合は None）"""
+    if text.isascii() or _is_stable(text):
+        return None
+
+    pieces: list = []
+    deltas = array("i")
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        if _is_stable(line):
+            # 変わらない行はオフセットの差も一定
+            delta = offset - len(deltas)
+            pieces.append(line)
+            deltas.extend([delta] * len(line))
+        else:
+            _normalize_line(line, offset, pieces, deltas)
+        offset += len(line)
+
+    # 番兵（テキスト末尾の位置）
+    deltas.append(len(text) - len(deltas))
+    return NormalizedText("".join(pieces), text, deltas)
@@ -0,0 +1,248 @@
+"""
+文字種の一括分類による表記統一チェック
+
+全角・半角英数字の混在、「、」と「，」・「。」と「．」の混在、半角カタカナ、
+英単語の前後の空白の有無の揺れを、テキスト全体のコードポイント配列に対する
+numpy の表引きと差分だけで検出する。1文字ごとのルールを増やすのではなく、
+文字種の配列を1回作り、そこから連続区間と境界を数回の配列演算で取り出すので、
+コストはチェックの数ではなくテキストの長さに比例する。
+
+どちらの表記が正しいかは文書内の多数派で決め、少数派の表記を連続区間ごとに
+1件の修正としてまとめて返す（同数なら揺れとして判定しない）。半角カタカナは
+常に全角に直す。
+"""
+
+import unicodedata
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from app.services.corrections import CorrectionResult
+
+# 文字種
+OTHER = 0
+HALF_ALNUM = 1  # 半角英数字
+FULL_ALNUM = 2  # 全角英数字
+ASCII_SYMBOL = 3  # 半角英数字以外の ASCII 記号
+SPACE = 4  # 半角空白
+JAPANESE = 5  # ひらがな・カタカナ・漢字
+HALF_KANA = 6  # 半角カタカナ・半角の句読点
+TOUTEN = 7  # 、
+FULL_COMMA = 8  # ，
+KUTEN = 9  # 。
+FULL_PERIOD = 10  # ．
+
+# 全角英数字と半角英数字のコードポイントの差
+_WIDTH_OFFSET = 0xFEE0
+
+
+def _build_class_table() -> np.ndarray:
+    """BMP のコードポイント → 文字種の表（末尾は BMP 外の文字用）"""
+    table = np.full(0x10001, OTHER, dtype=np.uint8)
+    table[0x21:0x7F] = ASCII_SYMBOL
+    for lo, hi in ((0x30, 0x39), (0x41, 0x5A), (0x61, 0x7A)):
+        table[lo : hi + 1] = HALF_ALNUM
+        table[lo + _WIDTH_OFFSET : hi + _WIDTH_OFFSET + 1] = FULL_ALNUM
+    table[0x20] = SPACE
+    table[0x3041:0x3097] = JAPANESE  # ひらがな
+    table[0x30A1:0x30FB] = JAPANESE  # カタカナ
+    table[0x30FC] = JAPANESE  # 長音
+    table[0x3005] = JAPANESE  # 々
+    table[0x3400:0x4DC0] = JAPANESE  # 漢字（拡張A）
+    table[0x4E00:0xA000] = JAPANESE  # 漢字
+    table[0xFF61:0xFFA0] = HALF_KANA
+    table[ord("、")] = TOUTEN
+    table[ord("，")] = FULL_COMMA
+    table[ord("。")] = KUTEN
+    table[ord("．")] = FULL_PERIOD
+    return table
+
+
+_CLASS_TABLE = _build_class_table()
+
+_TO_FULL_WIDTH = {
+    code: code + _WIDTH_OFFSET
+    for lo, hi in ((0x30, 0x39), (0x41, 0x5A), (0x61, 0x7A))
+    for code in range(lo, hi + 1)
+}
+_TO_HALF_WIDTH = {full: half for half, full in _TO_FULL_WIDTH.items()}
+
+
+def classify(text: str) -> np.ndarray:
+    """テキストの各文字の文字種の配列"""
+    codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    return _CLASS_TABLE[np.minimum(codepoints, 0x10000)]
+
+
+def runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """mask が真の連続区間の (開始位置の配列, 終了位置の配列)"""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _majority(first: int, second: int) -> int:
+    """多数派（0 か 1、どちらも使われていない・同数なら -1）"""
+    if first == second or not (first and second):
+        return -1
+    return 0 if first > second else 1
+
+
+class NotationChecker:
+    """文書内の多数派の表記に合わせる表記統一チェック"""
+
+    RULE_NAMES = frozenset(["英数字全角半角統一", "句読点統一", "半角カナ修正", "英単語前後の空白統一"])
+
+    def check(self, text: str) -> List[CorrectionResult]:
+        """表記の揺れをチェック（位置順）"""
+        if not text:
+            return []
+        classes = classify(text)
+        corrections: List[CorrectionResult] = []
+        corrections.extend(self._check_alnum_width(text, classes))
+        corrections.extend(self._check_punctuation(text, classes))
+        corrections.extend(self._check_half_kana(text, classes))
+        corrections.extend(self._check_word_spacing(text, classes))
+        corrections.sort(key=lambda c: (c.start_pos, c.end_pos))
+        return corrections
+
+    @staticmethod
+    def _result(
+        text: str,
+        start: int,
+        end: int,
+        replacement: str,
+        rule_name: str,
+        description: str,
+        confidence: float = 0.7,
+    ) -> CorrectionResult:
+        return CorrectionResult(
+            original_text=text[start:end],
+            corrected_text=replacement,
+            start_pos=start,
+            end_pos=end,
+            rule_name=rule_name,
+            category="formatting",
+            description=description,
+            confidence=confidence,
+        )
+
+    def _check_alnum_width(
+        self, text: str, classes: np.ndarray
+    ) -> Iterable[CorrectionResult]:
+        """全角・半角英数字の混在（連続区間の数で多数派を決める）"""
+        half_runs = runs(classes == HALF_ALNUM)
+        full_runs = runs(classes == FULL_ALNUM)
+        majority = _majority(len(half_runs[0]), len(full_runs[0]))
+        if majority == 0:
+            minority, table, description = full_runs, _TO_HALF_WIDTH, "半角英数字に統一"
+        elif majority == 1:
+            minority, table, description = half_runs, _TO_FULL_WIDTH, "全角英数字に統一"
+        else:
+            return
+
+        for start, end in zip(*minority):
+            start, end = int(start), int(end)
+            yield self._result(
+                text,
+                start,
+                end,
+                text[start:end].translate(table),
+                "英数字全角半角統一",
+                description,
+            )
+
+    def _check_punctuation(
+        self, text: str, classes: np.ndarray
+    ) -> Iterable[CorrectionResult]:
+        """「、」と「，」・「。」と「．」の混在"""
+        counts = np.bincount(classes, minlength=len(_CLASS_TABLE))
+        for ja, full, ja_char, full_char in (
+            (TOUTEN, FULL_COMMA, "、", "，"),
+            (KUTEN, FULL_PERIOD, "。", "．"),
+        ):
+            majority = _majority(int(counts[ja]), int(counts[full]))
+            if majority == -1:
+                continue
+            minority = full if majority == 0 else ja
+            replacement = ja_char if majority == 0 else full_char
+            for start, end in zip(*runs(classes == minority)):
+                start, end = int(start), int(end)
+                yield self._result(
+                    text,
+                    start,
+                    end,
+                    replacement * (end - start),
+                    "句読点統一",
+                    f"句読点を「{replacement}」に統一",
+                )
+
+    def _check_half_kana(
+        self, text: str, classes: np.ndarray
+    ) -> Iterable[CorrectionResult]:
+        """半角カタカナ（濁点・半濁点を合成して全角に直す）"""
+        for start, end in zip(*runs(classes == HALF_KANA)):
+            start, end = int(start), int(end)
+            yield self._result(
+                text,
+                start,
+                end,
+                unicodedata.normalize("NFKC", text[start:end]),
+                "半角カナ修正",
+                "半角カタカナを全角に",
+                confidence=0.9,
+            )
+
+    def _check_word_spacing(
+        self, text: str, classes: np.ndarray
+    ) -> Iterable[CorrectionResult]:
+        """日本語に挟まれた英単語の前後の空白の有無の揺れ
+
+        英字を含む ASCII の並びだけを対象にする（「第2回」のような数字は除く）。
+        """
+        starts, ends = runs((classes == HALF_ALNUM) | (classes == ASCII_SYMBOL))
+        if not len(starts):
+            return
+        lowered = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32) | 0x20
+        letters = (lowered >= ord("a")) & (lowered <= ord("z"))
+        letter_counts = np.concatenate(([0], np.cumsum(letters)))
+        has_letter = letter_counts[ends] > letter_counts[starts]
+        starts, ends = starts[has_letter], ends[has_letter]
+
+        # 前後の1文字・2文字先の文字種（テキストの外は OTHER）
+        padded = np.concatenate(([OTHER, OTHER], classes, [OTHER, OTHER]))
+        before1 = padded[starts + 1]
+        before2 = padded[starts]
+        after1 = padded[ends + 2]
+        after2 = padded[ends + 3]
+
+        left_tight = before1 == JAPANESE
+        left_spaced = (before1 == SPACE) & (before2 == JAPANESE)
+        right_tight = after1 == JAPANESE
+        right_spaced = (after1 == SPACE) & (after2 == JAPANESE)
+
+        spaced = int(left_spaced.sum() + right_spaced.sum())
+        tight = int(left_tight.sum() + right_tight.sum())
+        majority = _majority(spaced, tight)
+        if majority == -1:
+            return
+
+        for i in range(len(starts)):
+            start, end = int(starts[i]), int(ends[i])
+            word = text[start:end]
+            if majority == 0:
+                if not (left_tight[i] or right_tight[i]):
+                    continue
+                replacement = (
+                    (" " if left_tight[i] else "")
+                    + word
+                    + (" " if right_tight[i] else "")
+                )
+                description = "英単語の前後に空白を入れる"
+            else:
+                if not (left_spaced[i] or right_spaced[i]):
+                    continue
+                start -= int(left_spaced[i])
+                end += int(right_spaced[i])
+                replacement = word
+                description = "英単語の前後の空白を削除"
+            yield self._result(text, start, end, replacement, "英単語前後の空白統一", description)
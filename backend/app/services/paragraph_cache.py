@@ -0,0 +1,239 @@
+"""
+段落単位の校正結果キャッシュ
+
+メールの署名・免責事項・定型の製品説明のように、文書をまたいで同じ段落が
+繰り返し現れる。文書全体をキーにしたキャッシュは周りの本文が違うと当たらない
+ので、段落（改行で区切った行）ごとに本文のハッシュとルールセットの指紋を
+キーにして、段落内の相対位置で結果を保持する。
+
+チェックではキャッシュにない段落だけを改行でつないで1回でチェックし、
+キャッシュにある段落は位置をずらして結果を使う。parallel と同じく、ルール・
+文法チェックの一致は改行をまたがない前提で、文体統一・表記統一のように文書全体を
+見るチェックは毎回全文に対して実行する。
+
+キャッシュの大きさは結果の推定バイト数で制限し（PARAGRAPH_CACHE_BYTES）、
+超えたら使われていない段落から捨てる。
+"""
+
+import hashlib
+import os
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.corrections import CorrectionResult, CorrectionStore
+from app.services.grammar_checker import GrammarChecker
+from app.services.memory_accounting import memory_stage
+from app.services.rule_engine import CheckCancelled, RuleEngine
+
+# キャッシュの上限（推定バイト数、0 なら使わない）
+# 負荷試験やシャドー評価の計測が温まったキャッシュで歪むので、既定では使わない
+PARAGRAPH_CACHE_BYTES = int(os.getenv("PARAGRAPH_CACHE_BYTES", "0"))
+# ParagraphCache を直接作るときの既定の上限
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+# この文字数未満の段落はキャッシュしない（短い段落はハッシュの計算の方が高くつく）
+PARAGRAPH_CACHE_MIN_CHARS = int(os.getenv("PARAGRAPH_CACHE_MIN_CHARS", "32"))
+
+# 結果の推定バイト数（キー・ルールの一致1件・文法チェックの結果1件）
+_ENTRY_OVERHEAD = 200
+_HIT_SIZE = 80
+_RESULT_SIZE = 400
+
+RuleHit = Tuple[int, int, int]
+KeyedResult = Tuple[Tuple[int, int], CorrectionResult]
+
+
+class _Entry:
+    """段落1件ぶんの結果（位置は段落の先頭からの相対位置）"""
+
+    __slots__ = ("hits", "grammar", "size")
+
+    def __init__(self, hits: List[RuleHit], grammar: List[KeyedResult]):
+        self.hits = hits
+        self.grammar = grammar
+        self.size = (
+            _ENTRY_OVERHEAD
+            + _HIT_SIZE * len(hits)
+            + sum(
+                _RESULT_SIZE + 2 * len(c.corrected_text) + 2 * len(c.description)
+                for _, c in grammar
+            )
+        )
+
+
+def _shift(keyed: List[KeyedResult], offset: int) -> List[KeyedResult]:
+    """文法チェックの結果の位置を offset だけずらした複製"""
+    return [
+        (
+            key,
+            replace(
+                correction,
+                start_pos=correction.start_pos + offset,
+                end_pos=correction.end_pos + offset,
+            ),
+        )
+        for key, correction in keyed
+    ]
+
+
+def split_paragraphs(text: str) -> List[Tuple[int, int]]:
+    """段落（改行を含まない行）の (開始, 終了) の一覧"""
+    spans = []
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end == -1:
+            spans.append((start, len(text)))
+            return spans
+        spans.append((start, end))
+        start = end + 1
+
+
+class ParagraphCache:
+    """段落単位の校正結果キャッシュ"""
+
+    def __init__(
+        self,
+        engine: RuleEngine,
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+        min_chars: int = PARAGRAPH_CACHE_MIN_CHARS,
+    ):
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.min_chars = min_chars
+        # キーはルールセット（と語彙表など）の指紋と段落の本文のハッシュ
+        self._key_prefix = hashlib.blake2b(
+            engine.result_version.encode("ascii"), digest_size=16
+        )
+        self._entries: "OrderedDict[bytes, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _key(self, paragraph: str) -> bytes:
+        hasher = self._key_prefix.copy()
+        hasher.update(paragraph.encode("utf-8"))
+        return hasher.digest()
+
+    def _get(self, key: bytes) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def _put(self, key: bytes, entry: _Entry) -> None:
+        if entry.size > self.max_bytes // 8:
+            # 大きすぎる段落はほかの段落を追い出してまで保持しない
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+                self.stats["evictions"] += 1
+
+    def _check_missing(
+        self, text: str, spans: List[Tuple[int, int]]
+    ) -> List[Tuple[List[RuleHit], List[KeyedResult]]]:
+        """キャッシュにない段落をつないで1回でチェックし、段落ごとの結果に分ける"""
+        joined = "\n".join(text[start:end] for start, end in spans)
+        offsets = []
+        position = 0
+        for start, end in spans:
+            offsets.append(position)
+            position += end - start + 1
+
+        results: List[Tuple[List[RuleHit], List[KeyedResult]]] = [
+            ([], []) for _ in spans
+        ]
+        with memory_stage("rules"):
+            rule_hits = self.engine.find_rule_hits(joined)
+        for order, start, end in rule_hits:
+            i = bisect_right(offsets, start) - 1
+            results[i][0].append((order, start - offsets[i], end - offsets[i]))
+        with memory_stage("grammar"):
+            local = self.engine.grammar_checker.check_local(joined)
+        for key, correction in local:
+            i = bisect_right(offsets, correction.start_pos) - 1
+            correction.start_pos -= offsets[i]
+            correction.end_pos -= offsets[i]
+            results[i][1].append((key, correction))
+        return results
+
+    def check(
+        self,
+        text: str,
+        cancel_event: Optional[threading.Event] = None,
+        notation: bool = True,
+    ) -> CorrectionStore:
+        """RuleEngine._check_text_compact と同じ結果を段落のキャッシュを使って計算"""
+        spans = split_paragraphs(text)
+        hits: List[RuleHit] = []
+        grammar: List[KeyedResult] = []
+        missing: List[Tuple[int, int]] = []
+        missing_keys: List[Optional[bytes]] = []
+
+        for start, end in spans:
+            key = None
+            if end - start >= self.min_chars:
+                key = self._key(text[start:end])
+                entry = self._get(key)
+                if entry is not None:
+                    hits.extend(
+                        (order, hit_start + start, hit_end + start)
+                        for order, hit_start, hit_end in entry.hits
+                    )
+                    grammar.extend(_shift(entry.grammar, start))
+                    continue
+            missing.append((start, end))
+            missing_keys.append(key)
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise CheckCancelled()
+        if missing:
+            checked = self._check_missing(text, missing)
+            for (start, _), key, (para_hits, para_grammar) in zip(
+                missing, missing_keys, checked
+            ):
+                if key is not None:
+                    self._put(key, _Entry(para_hits, para_grammar))
+                hits.extend(
+                    (order, hit_start + start, hit_end + start)
+                    for order, hit_start, hit_end in para_hits
+                )
+                grammar.extend(_shift(para_grammar, start))
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise CheckCancelled()
+        with memory_stage("grammar"):
+            grammar.extend(self.engine.grammar_checker.check_document(text, notation))
+        hits.sort()
+
+        store = self.engine.new_store(text)
+        self.engine.add_rule_hits(store, hits)
+        store.extend_results(GrammarChecker.merge_results(grammar))
+        return store
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                **self.stats,
+            }
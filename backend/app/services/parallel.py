@@ -0,0 +1,234 @@
+"""
+大きなテキストの文書内並列チェック
+
+テキストを段落・文の境界で断片に分け、前後に最長パターン以上の重なりを付けて
+ワーカープロセスで並列にチェックする。断片ごとに担当範囲を決め、開始位置が
+担当範囲にある一致だけを採用するので、重なり部分の一致は重複しない。
+文体統一のように文書全体の出現数で判定するチェックは、親プロセスで全文に対して
+実行する。
+
+    PARALLEL_CHECK_WORKERS=8 uvicorn app.main:app
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import FIRST_EXCEPTION, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from multiprocessing import get_context
+from typing import List, Optional, Tuple
+
+from app.services.corrections import CorrectionResult, CorrectionStore
+from app.services.grammar_checker import GrammarChecker
+from app.services.rule_engine import CheckCancelled, RuleEngine
+
+# ワーカープロセス数（0 なら分割しない）
+PARALLEL_CHECK_WORKERS = int(os.getenv("PARALLEL_CHECK_WORKERS", "0"))
+# この文字数以上のテキストを分割する
+PARALLEL_CHECK_MIN_CHARS = int(os.getenv("PARALLEL_CHECK_MIN_CHARS", "200000"))
+# 断片の目安の文字数
+PARALLEL_CHECK_SHARD_CHARS = int(os.getenv("PARALLEL_CHECK_SHARD_CHARS", "100000"))
+# 正規表現パターンは一致の長さが決まらないので、この幅を重なりとして確保する
+PARALLEL_CHECK_REGEX_MARGIN = int(os.getenv("PARALLEL_CHECK_REGEX_MARGIN", "256"))
+
+# 段落・文の区切り（どのパターンもこれをまたいで一致しない前提）
+_SENTENCE_ENDS = "。．！？!?"
+_BOUNDARY = re.compile("[\n%s]" % _SENTENCE_ENDS)
+
+# 中断フラグを確認する間隔（秒）
+_POLL_INTERVAL = 0.05
+
+
+@dataclass
+class Shard:
+    """断片（start〜end をチェックし、core_start〜core_end に始まる一致を採用）"""
+
+    start: int
+    end: int
+    core_start: int
+    core_end: int
+
+
+def _last_boundary(text: str, lo: int, hi: int) -> Optional[int]:
+    """text[lo:hi] 内の最後の段落・文の区切りの直後の位置"""
+    pos = text.rfind("\n", lo, hi)
+    if pos == -1:
+        pos = max(text.rfind(ch, lo, hi) for ch in _SENTENCE_ENDS)
+    return pos + 1 if pos != -1 else None
+
+
+def _first_boundary(text: str, lo: int, hi: int) -> Optional[int]:
+    """text[lo:hi] 内の最初の段落・文の区切りの直後の位置"""
+    match = _BOUNDARY.search(text, lo, hi)
+    return match.end() if match else None
+
+
+def split_shards(text: str, shard_chars: int, margin: int) -> List[Shard]:
+    """テキストを段落・文の境界で断片に分割
+
+    担当範囲は隙間なく並び、重なりは margin 以上取って外側の文境界まで広げる。
+    """
+    length = len(text)
+    shards = []
+    core_start = 0
+
+    while core_start < length:
+        target = core_start + shard_chars
+        if target >= length:
+            core_end = length
+        else:
+            # 目安の位置より手前の境界で切る（断片の後半に境界がなければ目安の位置）
+            core_end = (
+                _last_boundary(text, core_start + shard_chars // 2, target) or target
+            )
+
+        start = core_start - margin
+        if start <= 0:
+            start = 0
+        else:
+            start = _last_boundary(text, max(0, start - margin), start) or start
+        end = core_end + margin
+        if end >= length:
+            end = length
+        else:
+            end = _first_boundary(text, end, min(length, end + margin)) or end
+
+        shards.append(Shard(start, end, core_start, core_end))
+        core_start = core_end
+
+    return shards
+
+
+# ワーカープロセスごとのルールエンジン
+_worker_engine: Optional[RuleEngine] = None
+
+
+def _init_worker(rules_dir: str, bundle_path: Optional[str]) -> None:
+    """ワーカープロセスの初期化"""
+    global _worker_engine
+    _worker_engine = RuleEngine(rules_dir, bundle_path=bundle_path)
+
+
+def shard_margin(
+    rule_engine: RuleEngine, regex_margin: int = PARALLEL_CHECK_REGEX_MARGIN
+) -> int:
+    """断片の重なり幅（どのパターンの一致も収まる長さ）"""
+    return rule_engine.match_margin(regex_margin)
+
+
+def check_shard(
+    engine: RuleEngine, text: str, offset: int, core_start: int, core_end: int
+) -> Tuple[List[Tuple[int, int, int]], List[Tuple[Tuple[int, int], CorrectionResult]]]:
+    """断片をチェックし、担当範囲に始まる一致を文書全体の位置で返す
+
+    文書全体を見る必要があるチェック（check_document）は含まない。
+    """
+    lo = core_start - offset
+    hi = core_end - offset
+
+    hits = [
+        (order, start + offset, end + offset)
+        for order, start, end in engine.find_rule_hits(text)
+        if lo <= start < hi
+    ]
+
+    grammar = []
+    for key, correction in engine.grammar_checker.check_local(text):
+        if lo <= correction.start_pos < hi:
+            correction.start_pos += offset
+            correction.end_pos += offset
+            grammar.append((key, correction))
+
+    return hits, grammar
+
+
+def _check_shard(
+    text: str, offset: int, core_start: int, core_end: int
+) -> Tuple[List[Tuple[int, int, int]], List[Tuple[Tuple[int, int], CorrectionResult]]]:
+    """ワーカープロセスで断片をチェック"""
+    assert _worker_engine is not None
+    return check_shard(_worker_engine, text, offset, core_start, core_end)
+
+
+class ParallelChecker:
+    """断片に分けてワーカープロセスでチェック"""
+
+    def __init__(
+        self,
+        rule_engine: RuleEngine,
+        workers: int = PARALLEL_CHECK_WORKERS,
+        min_chars: int = PARALLEL_CHECK_MIN_CHARS,
+        shard_chars: int = PARALLEL_CHECK_SHARD_CHARS,
+        regex_margin: int = PARALLEL_CHECK_REGEX_MARGIN,
+    ):
+        self.rule_engine = rule_engine
+        self.workers = workers
+        self.min_chars = min_chars
+        self.shard_chars = shard_chars
+        self.margin = shard_margin(rule_engine, regex_margin)
+
+        # サーバーはスレッドを使うので fork ではなく spawn で起動する
+        self._executor = ProcessPoolExecutor(
+            workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(rule_engine.rules_dir), rule_engine.bundle_path),
+        )
+
+    def should_split(self, text: str) -> bool:
+        return self.workers > 1 and len(text) >= self.min_chars
+
+    def _wait(
+        self, futures: List[Future], cancel_event: Optional[threading.Event]
+    ) -> None:
+        pending = set(futures)
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                raise CheckCancelled()
+            done, pending = wait(
+                pending, timeout=_POLL_INTERVAL, return_when=FIRST_EXCEPTION
+            )
+            for future in done:
+                future.result()
+
+    def check(
+        self,
+        text: str,
+        cancel_event: Optional[threading.Event] = None,
+        notation: bool = True,
+    ) -> CorrectionStore:
+        """RuleEngine._check_text_compact と同じ結果を並列に計算"""
+        futures = [
+            self._executor.submit(
+                _check_shard,
+                text[shard.start : shard.end],
+                shard.start,
+                shard.core_start,
+                shard.core_end,
+            )
+            for shard in split_shards(text, self.shard_chars, self.margin)
+        ]
+
+        try:
+            # 文書全体のチェックはワーカーの処理中に親プロセスで実行
+            grammar = self.rule_engine.grammar_checker.check_document(text, notation)
+            self._wait(futures, cancel_event)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        hits: List[Tuple[int, int, int]] = []
+        for future in futures:
+            shard_hits, shard_grammar = future.result()
+            hits.extend(shard_hits)
+            grammar.extend(shard_grammar)
+        hits.sort()
+
+        store = self.rule_engine.new_store(text)
+        self.rule_engine.add_rule_hits(store, hits)
+        store.extend_results(GrammarChecker.merge_results(grammar))
+        return store
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,270 @@
+"""
+ルールセットのコンパイル時解析
+
+照合器を構築する前に、ルールファイル（YAML）のパターンと文法チェッカーの
+パターン表（GrammarChecker.LOCAL_CHECKS）をまとめて調べ、冗長なパターンを報告する。
+
+- no_op: RuleEngine が照合しない種別（check_only / check_pattern）
+- self_replacement: 自分自身に置き換えるパターン
+- duplicate: 先に定義された同じパターン・同じ置換
+- unreachable: 先に定義された同じパターンで置換が違うもの
+- subsumed: 短いパターンを含み、その短いパターンの修正を当てたのと同じ結果に
+  なるパターン（「させて頂く」→「させていただく」は「させて頂」→「させていただ」で
+  足りる）
+
+実際に取り除く（removed）のは、チェックの結果が変わらないと言えるものだけ。
+
+- 文法チェッカーの表の self_replacement（照合時にも飛ばしている）
+- 文法チェッカーの同じ表の中の duplicate / unreachable（同じ位置の修正は
+  表の先のものだけが残る）
+
+ほかは報告だけで、ルールは書き換えない。ルールファイルのパターンは同じ位置でも
+すべて結果に出て、ルールが違えば名前・カテゴリ・確信度も違うので、取り除くと
+修正の一覧・/rules・テナントのルール無効化の結果が変わる。subsumed は前後の
+文脈（隣の一致との重なり）を見ていないので、当てた結果が同じになるとも限らない。
+
+    python -m app.cli lint-rules
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.services.matcher import LiteralMatcher
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python 3.10 以前
+    import sre_parse
+
+# 照合器を構築する前に結果の変わらないパターンを取り除くか
+RULESET_PRUNE = os.getenv("RULESET_PRUNE", "true").lower() == "true"
+
+# RuleEngine が照合しないパターンの種別
+NO_OP_TYPES = frozenset(["check_only", "check_pattern"])
+
+# 文法チェッカーのパターン表（番号, 規則名, 確信度, [(正規表現, 置換, 説明)]）
+GrammarTables = List[Tuple[int, str, float, List[Tuple[str, str, str]]]]
+
+
+@dataclass
+class Finding:
+    """冗長なパターン"""
+
+    kind: str
+    rule_name: str
+    pattern: str
+    replacement: str
+    # 代わりに残したパターン（duplicate / unreachable / subsumed）
+    kept_rule: Optional[str] = None
+    kept_pattern: Optional[str] = None
+    # 取り除いたか（False なら報告だけ）
+    removed: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: value for key, value in vars(self).items() if value is not None}
+
+
+@dataclass
+class PruneReport:
+    """解析結果"""
+
+    patterns_before: int = 0
+    patterns_after: int = 0
+    findings: List[Finding] = field(default_factory=list)
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for finding in self.findings:
+            counts[finding.kind] = counts.get(finding.kind, 0) + 1
+        return counts
+
+    def removed(self) -> List[Finding]:
+        """取り除いたパターン"""
+        return [finding for finding in self.findings if finding.removed]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "patterns_before": self.patterns_before,
+            "patterns_after": self.patterns_after,
+            "counts": self.counts(),
+            "findings": [finding.to_dict() for finding in self.findings],
+        }
+
+
+@dataclass
+class _Entry:
+    """解析対象のパターン（ルールファイルと文法チェッカーの両方）"""
+
+    rule_name: str
+    # 照合する正規表現・リテラル（比較用）
+    key: str
+    replacement: str
+    # リテラルとして照合される文字列（正規表現は一致が固定の場合だけ）
+    literal: Optional[str]
+    # ("rules", ルール番号, パターン番号) または ("grammar", 表の番号, パターン番号)
+    location: Tuple[str, int, int]
+    # ほかのパターンで足りる（報告の対象）
+    redundant: bool = False
+    # 照合器から取り除く
+    removed: bool = False
+
+
+def regex_literal(regex: str) -> Optional[str]:
+    """正規表現が固定の文字列にしか一致しなければその文字列"""
+    try:
+        parsed = sre_parse.parse(regex)
+    except re.error:
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    chars = []
+    for op, av in parsed:
+        if op is not sre_parse.LITERAL:
+            return None
+        chars.append(chr(av))
+    return "".join(chars)
+
+
+def _collect(
+    rules: Sequence[Any], tables: GrammarTables, report: PruneReport
+) -> List[_Entry]:
+    """照合されるパターンを優先順に並べる（照合されないものは no_op）"""
+    entries = []
+    for rule_index, rule in enumerate(rules):
+        for pattern_index, pattern in enumerate(rule.patterns):
+            location = ("rules", rule_index, pattern_index)
+            if pattern.type in NO_OP_TYPES:
+                report.findings.append(
+                    Finding("no_op", rule.name, pattern.pattern, pattern.replacement)
+                )
+                continue
+            if pattern.type == "literal":
+                key = literal = pattern.pattern
+            else:
+                key = pattern.regex or pattern.pattern
+                literal = regex_literal(key)
+            entries.append(
+                _Entry(rule.name, key, pattern.replacement, literal, location)
+            )
+
+    for table_index, (_, rule_name, _, patterns) in enumerate(tables):
+        for pattern_index, (regex, replacement, _) in enumerate(patterns):
+            entries.append(
+                _Entry(
+                    rule_name,
+                    regex,
+                    replacement,
+                    regex_literal(regex),
+                    ("grammar", table_index, pattern_index),
+                )
+            )
+    return entries
+
+
+def _mark(
+    entry: _Entry,
+    kind: str,
+    report: PruneReport,
+    kept: Optional[_Entry] = None,
+    remove: bool = False,
+) -> None:
+    entry.redundant = True
+    entry.removed = remove
+    report.findings.append(
+        Finding(
+            kind,
+            entry.rule_name,
+            entry.key,
+            entry.replacement,
+            kept_rule=kept.rule_name if kept else None,
+            kept_pattern=kept.key if kept else None,
+            removed=remove,
+        )
+    )
+
+
+def _mark_redundant(entries: List[_Entry], report: PruneReport) -> None:
+    """自分自身への置換・重複・到達しないパターンに印を付ける"""
+    first: Dict[str, _Entry] = {}
+    # 文法チェッカーの表ごとに出てきたパターン（同じ位置なら表の先のものが残る）
+    in_table: Set[Tuple[int, str]] = set()
+    for entry in entries:
+        source, table_index, _ = entry.location
+        if entry.literal is not None and entry.literal == entry.replacement:
+            # 文法チェッカーはパターンと置換が同じ文字列なら照合しない
+            skipped = source == "grammar" and entry.key == entry.replacement
+            _mark(entry, "self_replacement", report, remove=skipped)
+            continue
+        # リテラルと同じ文字列だけに一致する正規表現も同じパターンとみなす
+        key = entry.literal if entry.literal is not None else "\0" + entry.key
+        shadowed = False
+        if source == "grammar":
+            shadowed = (table_index, key) in in_table
+            in_table.add((table_index, key))
+        kept = first.get(key)
+        if kept is None:
+            first[key] = entry
+        elif kept.replacement == entry.replacement:
+            _mark(entry, "duplicate", report, kept, remove=shadowed)
+        else:
+            _mark(entry, "unreachable", report, kept, remove=shadowed)
+
+
+def _mark_subsumed(entries: List[_Entry], report: PruneReport) -> None:
+    """短いパターンの修正で足りるパターンに印を付ける"""
+    literals = [entry for entry in entries if entry.literal and not entry.redundant]
+    if len(literals) < 2:
+        return
+    matcher = LiteralMatcher.build([entry.literal for entry in literals])
+
+    subsumed: List[Tuple[_Entry, _Entry]] = []
+    for entry in literals:
+        text = entry.literal
+        for pattern_id, start, end in matcher.finditer(text):
+            inner = literals[pattern_id]
+            if end - start == len(text):
+                continue
+            if text[:start] + inner.replacement + text[end:] == entry.replacement:
+                subsumed.append((entry, inner))
+                break
+
+    # 前後の文脈を見ていないので報告だけ
+    for entry, inner in subsumed:
+        _mark(entry, "subsumed", report, inner)
+
+
+def prune_ruleset(
+    rules: Sequence[Any], tables: GrammarTables
+) -> Tuple[GrammarTables, PruneReport]:
+    """冗長なパターンを報告し、結果の変わらないものを取り除いたパターン表を返す
+
+    rules は優先度順の Rule の列、tables は GrammarChecker.LOCAL_CHECKS と同じ形式。
+    ルール（rules）は書き換えない。
+    """
+    report = PruneReport(
+        patterns_before=sum(len(rule.patterns) for rule in rules)
+        + sum(len(patterns) for _, _, _, patterns in tables)
+    )
+    entries = _collect(rules, tables, report)
+    _mark_redundant(entries, report)
+    _mark_subsumed(entries, report)
+
+    removed = {entry.location for entry in entries if entry.removed}
+    pruned_tables = [
+        (
+            order,
+            name,
+            confidence,
+            [
+                pattern
+                for pattern_index, pattern in enumerate(patterns)
+                if ("grammar", index, pattern_index) not in removed
+            ],
+        )
+        for index, (order, name, confidence, patterns) in enumerate(tables)
+    ]
+
+    report.patterns_after = report.patterns_before - len(removed)
+    return pruned_tables, report
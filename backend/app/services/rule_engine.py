@@ -1,30 +1,65 @@
+import hashlib
+import logging
+import os
 import re
+import threading
+import time
 import yaml
-from typing import List, Dict, Any, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 from pathlib import Path
 from dataclasses import dataclass
 from enum import Enum
 
+from app.services.corrections import (
+    CorrectionMetaTable,
+    CorrectionResult,
+    CorrectionStore,
+    OverlayMetaTable,
+    resolve_overlaps,
+)
 from app.services.grammar_checker import GrammarChecker
+from app.services.matcher import LiteralMatcher
+from app.services.memory_accounting import memory_stage
+from app.services.normalizer import normalize_text
+from app.services.notation_checker import NotationChecker
+from app.services.rule_compiler import RULESET_PRUNE, PruneReport, prune_ruleset
+from app.services.ruleset_bundle import (
+    BundleError,
+    RuleRecord,
+    RulesetBundle,
+    ruleset_fingerprint,
+    write_bundle,
+)
+
+logger = logging.getLogger(__name__)
+
+# 標準のルールディレクトリ
+DEFAULT_RULES_DIR = Path(__file__).parent.parent / "rules"
+
+# リテラルパターンがこの数以上ならオートマトンで一括照合する
+# （純 Python のオートマトンは1文字ごとの遷移が重く、記事程度の文書で計測すると
+# str.find の繰り返しに追いつくのはパターンが 1,500 前後から。同梱のルールセットは
+# 26 個なので str.find を使う）
+AUTOMATON_MIN_PATTERNS = 1500
+
+# 照合前にテキストを正規化する（NFKC・ゼロ幅文字の除去、app.services.normalizer）
+TEXT_NORMALIZATION = os.getenv("TEXT_NORMALIZATION", "true").lower() == "true"
+# apply_until_stable の最大繰り返し回数
+FIXPOINT_MAX_ITERATIONS = int(os.getenv("FIXPOINT_MAX_ITERATIONS", "5"))
+# 正規表現パターンは一致の長さが決まらないので、この幅を一致の最大長とみなす
+REGEX_MATCH_MARGIN = 256
+
+
+class CheckCancelled(Exception):
+    """校正チェックが中断された"""
+
 
 class RuleCategory(str, Enum):
     GRAMMAR = "grammar"
     REDUNDANCY = "redundancy"
     FORMATTING = "formatting"
     POLITENESS = "politeness"
-
-
-@dataclass
-class CorrectionResult:
-    """校正結果"""
-    original_text: str
-    corrected_text: str
-    start_pos: int
-    end_pos: int
-    rule_name: str
-    category: str
-    description: str
-    confidence: float = 1.0
+    SPELLING = "spelling"
 
 
 @dataclass
@@ -46,14 +81,218 @@ class Rule:
     patterns: List[RulePattern]
 
 
+def parse_rules(data: Dict[str, Any]) -> List[Rule]:
+    """YAMLデータからルールを解析"""
+    rules = []
+    rules_data = data.get('rules', {})
+    
+    for rule_id, rule_config in rules_data.items():
+        patterns = []
+        
+        for pattern_config in rule_config.get('patterns', []):
+            pattern = RulePattern(
+                pattern=pattern_config['pattern'],
+                replacement=pattern_config['replacement'],
+                description=pattern_config['description'],
+                type=pattern_config.get('type', 'literal'),
+                regex=pattern_config.get('regex')
+            )
+            patterns.append(pattern)
+        
+        rule = Rule(
+            name=rule_config['name'],
+            category=rule_config['category'],
+            priority=rule_config['priority'],
+            patterns=patterns
+        )
+        rules.append(rule)
+    
+    return rules
+
+
+def find_literal(text: str, literal: str) -> Iterator[Tuple[int, int]]:
+    """文字列リテラルの出現位置を str.find で列挙（重なりも含む）"""
+    length = len(literal)
+    start = 0
+    while True:
+        pos = text.find(literal, start)
+        if pos == -1:
+            break
+        yield pos, pos + length
+        start = pos + 1
+
+
+@dataclass
+class FixpointResult:
+    """apply_until_stable の結果"""
+    text: str
+    # 各回に適用した修正（位置はその回の適用前のテキスト上）
+    rounds: List[List[CorrectionResult]]
+    # 修正がなくなった（上限回数で打ち切っていない）か
+    converged: bool
+    
+    @property
+    def iterations(self) -> int:
+        return len(self.rounds)
+
+
 class RuleEngine:
     """ルールベース校正エンジン"""
     
-    def __init__(self, rules_dir: str = None):
+    def __init__(self, rules_dir: str = None, bundle_path: Optional[str] = None):
         self.rules: List[Rule] = []
-        self.rules_dir = rules_dir or Path(__file__).parent.parent / "rules"
+        self.rules_dir = rules_dir or DEFAULT_RULES_DIR
+        # コンパイル済みバンドル（未指定なら環境変数 RULESET_BUNDLE）
+        self.bundle_path = bundle_path or os.getenv("RULESET_BUNDLE")
+        self.bundle: Optional[RulesetBundle] = None
+        # 結果の変わらないパターンを取り除くか（app.services.rule_compiler）
+        self.prune = RULESET_PRUNE
+        self.prune_report: Optional[PruneReport] = None
+        # ルールファイルの内容から計算した指紋
+        self.fingerprint = ruleset_fingerprint(self.rules_dir)
+        # 初期化の各段階にかかった時間（秒）
+        self.load_timings: Dict[str, float] = {}
+        
+        started = time.perf_counter()
         self.grammar_checker = GrammarChecker()
-        self.load_rules()
+        self.load_timings["grammar_checker"] = time.perf_counter() - started
+        
+        # 校正結果のメタデータ（ルール名・説明など）は全結果で共有する
+        self.correction_meta = CorrectionMetaTable()
+        # 大きなテキストを分割して並列にチェックする（app.services.parallel）
+        self.parallel = None
+        # 段落単位の結果キャッシュ（app.services.paragraph_cache）
+        self.paragraph_cache = None
+        self.normalize_input = TEXT_NORMALIZATION
+        
+        if self.bundle_path:
+            self._load_bundle(self.bundle_path)
+        else:
+            started = time.perf_counter()
+            self.load_rules()
+            self.load_timings["load_rules"] = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            self.prune_rules()
+            self.compile_rules()
+            self.load_timings["compile"] = time.perf_counter() - started
+    
+    @property
+    def result_version(self) -> str:
+        """チェック結果に影響するもの（ルールセット・語彙表・頻度表・正規化）の指紋"""
+        parts = [self.fingerprint, str(self.normalize_input)]
+        typo_checker = self.grammar_checker.typo_checker
+        if typo_checker is not None:
+            parts.append(typo_checker.index.fingerprint)
+        misconversion_checker = self.grammar_checker.misconversion_checker
+        if misconversion_checker is not None:
+            parts.append(misconversion_checker.table.fingerprint)
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _load_bundle(self, bundle_path: str) -> None:
+        """バンドルを mmap で読み込み（古い・壊れている場合は作り直す）"""
+        started = time.perf_counter()
+        records: List[RuleRecord] = []
+        try:
+            bundle: Optional[RulesetBundle] = RulesetBundle(bundle_path)
+            if bundle.fingerprint != self.fingerprint:
+                bundle = None
+            else:
+                records = bundle.rule_records()
+        except (OSError, BundleError) as e:
+            logger.warning("Rebuilding ruleset bundle %s: %s", bundle_path, e)
+            bundle = None
+        
+        if bundle is None:
+            self.load_rules()
+            self.prune_rules()
+            self.compile_rules()
+            write_bundle(
+                bundle_path, self.fingerprint, self.rules, self.literal_matcher
+            )
+            bundle = RulesetBundle(bundle_path)
+        else:
+            for name, category, priority, patterns in records:
+                self.rules.append(Rule(
+                    name=name,
+                    category=category,
+                    priority=priority,
+                    patterns=[
+                        RulePattern(
+                            pattern=fields[1],
+                            replacement=fields[2],
+                            description=fields[3],
+                            type=fields[0],
+                            regex=fields[4]
+                        )
+                        for fields in patterns
+                    ]
+                ))
+            # 文法チェッカーの表はバンドルに入っていないので毎回処理する
+            self.prune_rules()
+        self.load_timings["load_rules"] = time.perf_counter() - started
+        
+        # 表はコピーせず mmap 上のものを使う
+        started = time.perf_counter()
+        self.bundle = bundle
+        self.compile_rules(bundle.matcher())
+        self.load_timings["compile"] = time.perf_counter() - started
+    
+    def compile_rules(self, matcher: Optional[LiteralMatcher] = None) -> None:
+        """照合用のデータを構築"""
+        # 全パターンの通し番号（結果をルール・パターン順に並べるため）
+        self._pattern_order: Dict[int, int] = {}
+        # 通し番号ごとの結果メタデータ ID
+        self._order_meta_ids: List[int] = []
+        self._literal_meta_ids: List[int] = []
+        self._literal_orders: List[int] = []
+        literals: List[str] = []
+        
+        for rule in self.rules:
+            for pattern in rule.patterns:
+                self._pattern_order[id(pattern)] = len(self._pattern_order)
+                meta_id = self.correction_meta.intern(
+                    rule.name,
+                    rule.category,
+                    pattern.description,
+                    pattern.replacement
+                )
+                self._order_meta_ids.append(meta_id)
+                if pattern.type == "literal":
+                    literals.append(pattern.pattern)
+                    self._literal_orders.append(self._pattern_order[id(pattern)])
+                    self._literal_meta_ids.append(meta_id)
+        
+        # 固定の文法チェックのパターン表のメタデータも共有テーブルに登録しておく
+        for _, rule_name, confidence, patterns in self.grammar_checker.LOCAL_CHECKS:
+            for _, replacement, description in patterns:
+                self.correction_meta.intern(
+                    rule_name, "grammar", description, replacement, confidence
+                )
+        
+        self.literal_matcher = matcher or LiteralMatcher.build(literals)
+        self.use_automaton = len(literals) >= AUTOMATON_MIN_PATTERNS
+    
+    def new_store(self, text: str) -> CorrectionStore:
+        """チェック結果を入れるストア
+        
+        表記統一・誤字・誤変換のように入力によって修正後の文字列や説明が変わる
+        結果のメタデータは、共有テーブルに溜まらないようストアごとの差分テーブルに
+        登録する。
+        """
+        return CorrectionStore(text, OverlayMetaTable(self.correction_meta))
+    
+    def prune_rules(self) -> None:
+        """文法チェッカーのパターン表から結果の変わらないパターンを取り除く
+        
+        ルールファイルのルールは書き換えない（冗長なものは prune_report で報告する）。
+        """
+        if not self.prune:
+            return
+        tables, self.prune_report = prune_ruleset(
+            self.rules, self.grammar_checker.LOCAL_CHECKS
+        )
+        self.grammar_checker.LOCAL_CHECKS = tables
     
     def load_rules(self) -> None:
         """ルールファイルを読み込み"""
@@ -62,7 +301,7 @@ class RuleEngine:
         if not rules_path.exists():
             return
         
-        for rule_file in rules_path.glob("*.yml"):
+        for rule_file in sorted(rules_path.glob("*.yml")):
             with open(rule_file, 'r', encoding='utf-8') as f:
                 data = yaml.safe_load(f)
                 self._parse_rules(data)
@@ -72,28 +311,16 @@ class RuleEngine:
     
     def _parse_rules(self, data: Dict[str, Any]) -> None:
         """YAMLデータからルールを解析"""
-        rules_data = data.get('rules', {})
-        
-        for rule_id, rule_config in rules_data.items():
-            patterns = []
-            
-            for pattern_config in rule_config.get('patterns', []):
-                pattern = RulePattern(
-                    pattern=pattern_config['pattern'],
-                    replacement=pattern_config['replacement'],
-                    description=pattern_config['description'],
-                    type=pattern_config.get('type', 'literal'),
-                    regex=pattern_config.get('regex')
-                )
-                patterns.append(pattern)
-            
-            rule = Rule(
-                name=rule_config['name'],
-                category=rule_config['category'],
-                priority=rule_config['priority'],
-                patterns=patterns
-            )
-            self.rules.append(rule)
+        self.rules.extend(parse_rules(data))
+    
+    def pattern_orders(self, rule_names: Set[str]) -> Set[int]:
+        """指定したルールに属するパターンの通し番号"""
+        return {
+            self._pattern_order[id(pattern)]
+            for rule in self.rules
+            if rule.name in rule_names
+            for pattern in rule.patterns
+        }
     
     def check_text(self, text: str) -> List[CorrectionResult]:
         """テキストを校正チェック"""
@@ -110,63 +337,306 @@ class RuleEngine:
         
         return results
     
+    def check_normalized(
+        self,
+        text: str,
+        check: Callable[[str, bool], CorrectionStore],
+        disabled: Set[str] = frozenset(),
+        notation: bool = True,
+    ) -> CorrectionStore:
+        """正規化したテキストを check でチェックし、結果の位置を元のテキストに戻す
+        
+        check(テキスト, 表記統一をチェックするか) を呼ぶ。disabled は無効にする
+        文法チェックのルール名。notation が False なら表記統一のチェックをしない
+        （文書全体を見ない局所的な再チェック）。
+        """
+        normalized = normalize_text(text) if self.normalize_input else None
+        if normalized is None:
+            return check(text, notation)
+        
+        # 表記統一は正規化で消える表記（半角カナなど）を見るので、正規化した
+        # テキストではチェックせず元のテキストで判定
+        store = normalized.restore(
+            check(normalized.text, False), exclude_rules=NotationChecker.RULE_NAMES
+        )
+        if notation:
+            store.extend_results(
+                correction
+                for correction in self.grammar_checker.notation_checker.check(text)
+                if correction.rule_name not in disabled
+            )
+        return store
+    
+    def check_text_compact(
+        self, text: str, cancel_event: Optional[threading.Event] = None
+    ) -> CorrectionStore:
+        """テキストを校正チェック（省メモリな列指向の結果）
+        
+        照合は正規化したテキストに対して行い、位置は元のテキストで返す。
+        cancel_event がセットされるとルールの合間で CheckCancelled を送出する。
+        """
+        return self.check_normalized(
+            text,
+            lambda target, notation: self._check_text_compact(
+                target, cancel_event, notation
+            )
+        )
+    
+    def _check_text_compact(
+        self,
+        text: str,
+        cancel_event: Optional[threading.Event] = None,
+        notation: bool = True,
+    ) -> CorrectionStore:
+        if self.parallel is not None and self.parallel.should_split(text):
+            return self.parallel.check(text, cancel_event, notation)
+        if self.paragraph_cache is not None:
+            return self.paragraph_cache.check(text, cancel_event, notation)
+        
+        store = self.new_store(text)
+        
+        with memory_stage("rules"):
+            if self.use_automaton:
+                self._match_automaton(text, store)
+            else:
+                for rule in self.rules:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise CheckCancelled()
+                    for pattern in rule.patterns:
+                        meta_id = self.correction_meta.intern(
+                            rule.name,
+                            rule.category,
+                            pattern.description,
+                            pattern.replacement
+                        )
+                        for start, end in self._find_pattern(text, pattern):
+                            store.add(start, end, meta_id)
+        
+        if cancel_event is not None and cancel_event.is_set():
+            raise CheckCancelled()
+        with memory_stage("grammar"):
+            store.extend_results(self.grammar_checker.check_grammar(text, notation))
+        
+        return store
+    
+    def _match_automaton(self, text: str, store: CorrectionStore) -> None:
+        """リテラルをオートマトンで一括照合し、正規表現は個別に照合"""
+        self.add_rule_hits(store, self.find_rule_hits(text))
+    
+    def find_rule_hits(self, text: str) -> List[Tuple[int, int, int]]:
+        """ルールの照合結果を (パターン通し番号, 開始, 終了) で列挙
+        
+        ルール・パターン順、位置順に並ぶ（str.find による照合と同じ順序）。
+        """
+        if not self.use_automaton:
+            return [
+                (self._pattern_order[id(pattern)], start, end)
+                for rule in self.rules
+                for pattern in rule.patterns
+                for start, end in self._find_pattern(text, pattern)
+            ]
+        
+        orders = self._literal_orders
+        hits = [
+            (orders[pattern_id], start, end)
+            for pattern_id, start, end in self.literal_matcher.finditer(text)
+        ]
+        
+        for rule in self.rules:
+            for pattern in rule.patterns:
+                if pattern.type != "regex":
+                    continue
+                order = self._pattern_order[id(pattern)]
+                for start, end in self._find_pattern(text, pattern):
+                    hits.append((order, start, end))
+        
+        hits.sort()
+        return hits
+    
+    def add_rule_hits(
+        self, store: CorrectionStore, hits: List[Tuple[int, int, int]]
+    ) -> None:
+        """find_rule_hits の結果を格納"""
+        meta_ids = self._order_meta_ids
+        for order, start, end in hits:
+            store.add(start, end, meta_ids[order])
+    
+    def _find_pattern(
+        self, text: str, pattern: RulePattern
+    ) -> Iterator[Tuple[int, int]]:
+        """パターンの出現位置を列挙"""
+        if pattern.type == "literal":
+            # 文字列リテラル検索
+            yield from find_literal(text, pattern.pattern)
+        
+        elif pattern.type == "regex":
+            # 正規表現検索
+            regex_pattern = pattern.regex or pattern.pattern
+            for match in re.finditer(regex_pattern, text):
+                yield match.start(), match.end()
+    
     def _apply_rule(self, text: str, rule: Rule) -> List[CorrectionResult]:
         """単一ルールを適用"""
         results = []
         
         for pattern in rule.patterns:
-            if pattern.type == "literal":
-                # 文字列リテラル検索
-                start = 0
-                while True:
-                    pos = text.find(pattern.pattern, start)
-                    if pos == -1:
-                        break
-                    
-                    result = CorrectionResult(
-                        original_text=pattern.pattern,
-                        corrected_text=pattern.replacement,
-                        start_pos=pos,
-                        end_pos=pos + len(pattern.pattern),
-                        rule_name=rule.name,
-                        category=rule.category,
-                        description=pattern.description
-                    )
-                    results.append(result)
-                    start = pos + 1
-            
-            elif pattern.type == "regex":
-                # 正規表現検索
-                regex_pattern = pattern.regex or pattern.pattern
-                for match in re.finditer(regex_pattern, text):
-                    result = CorrectionResult(
-                        original_text=match.group(),
-                        corrected_text=pattern.replacement,
-                        start_pos=match.start(),
-                        end_pos=match.end(),
-                        rule_name=rule.name,
-                        category=rule.category,
-                        description=pattern.description
-                    )
-                    results.append(result)
+            for start, end in self._find_pattern(text, pattern):
+                result = CorrectionResult(
+                    original_text=text[start:end],
+                    corrected_text=pattern.replacement,
+                    start_pos=start,
+                    end_pos=end,
+                    rule_name=rule.name,
+                    category=rule.category,
+                    description=pattern.description
+                )
+                results.append(result)
         
         return results
     
-    def apply_corrections(self, text: str, corrections: List[CorrectionResult]) -> str:
-        """校正を適用してテキストを修正"""
-        # 後ろから修正して位置ずれを防ぐ
-        sorted_corrections = sorted(corrections, key=lambda x: x.start_pos, reverse=True)
+    def apply_corrections(
+        self, text: str, corrections: Union[List[CorrectionResult], CorrectionStore]
+    ) -> str:
+        """校正を適用してテキストを修正
+        
+        位置が重なる修正は、開始位置が早く長いものを優先して1つだけ適用する。
+        """
+        if isinstance(corrections, CorrectionStore):
+            return corrections.apply()
+        
+        selected = resolve_overlaps(
+            [c.start_pos for c in corrections], [c.end_pos for c in corrections]
+        )
+        
+        pieces = []
+        position = 0
+        for i in selected:
+            correction = corrections[i]
+            pieces.append(text[position:correction.start_pos])
+            pieces.append(correction.corrected_text)
+            position = correction.end_pos
+        pieces.append(text[position:])
+        
+        return "".join(pieces)
+    
+    def match_margin(self, regex_margin: int = REGEX_MATCH_MARGIN) -> int:
+        """どのパターンの一致も収まる長さ（部分的に再チェックする際の余白）"""
+        has_regex = any(
+            pattern.type == "regex"
+            for rule in self.rules
+            for pattern in rule.patterns
+        )
+        return max(
+            self.literal_matcher.max_length,
+            GrammarChecker.max_pattern_length(),
+            regex_margin if has_regex else 0,
+        )
+    
+    def _check_local(self, text: str) -> CorrectionStore:
+        """文書の一部だけで判定できるチェック（文体統一・表記統一はしない）"""
+        store = self.new_store(text)
+        self.add_rule_hits(store, self.find_rule_hits(text))
+        store.extend_results(
+            GrammarChecker.merge_results(self.grammar_checker.check_local(text))
+        )
+        return store
+    
+    def check_window(self, text: str) -> CorrectionStore:
+        """書き換えた範囲の前後の再チェック（1回目と同じく正規化して照合）"""
+        return self.check_normalized(
+            text, lambda target, _: self._check_local(target), notation=False
+        )
+    
+    def apply_until_stable(
+        self,
+        text: str,
+        max_iterations: int = FIXPOINT_MAX_ITERATIONS,
+        initial: Optional[CorrectionStore] = None,
+        check_window: Optional[Callable[[str], CorrectionStore]] = None,
+        margin: Optional[int] = None,
+    ) -> FixpointResult:
+        """修正がなくなるまで適用を繰り返す
         
-        modified_text = text
-        for correction in sorted_corrections:
-            before = modified_text[:correction.start_pos]
-            after = modified_text[correction.end_pos:]
-            modified_text = before + correction.corrected_text + after
+        2回目以降は前の回に書き換えた範囲の前後（最長パターン長）だけを
+        チェックし直し、書き換えた範囲にかかる修正だけを適用する。文書全体を
+        見るチェック（文体統一など）は1回目のみ。initial は1回目のチェック結果。
+        check_window は再チェック（既定は check_window）で、テナントの差分を
+        重ねる場合はその差分も含めたチェックと最長パターン長（margin）を渡す。
+        """
+        if check_window is None:
+            check_window = self.check_window
+        if margin is None:
+            margin = self.match_margin()
+        store = initial if initial is not None else self.check_text_compact(text)
+        candidates = list(store)
+        # 前の回に書き換えた範囲（現在のテキスト上、None なら全体が対象）
+        edited: Optional[List[Tuple[int, int]]] = None
+        rounds: List[List[CorrectionResult]] = []
         
-        return modified_text
+        while True:
+            if edited is not None:
+                candidates = [
+                    c for c in candidates
+                    if any(
+                        c.start_pos < max(end, start + 1) and c.end_pos > start
+                        for start, end in edited
+                    )
+                ]
+            # 何も変えない修正は適用しない
+            candidates = [c for c in candidates if c.corrected_text != c.original_text]
+            selected = [
+                candidates[i]
+                for i in resolve_overlaps(
+                    [c.start_pos for c in candidates], [c.end_pos for c in candidates]
+                )
+            ]
+            if not selected:
+                return FixpointResult(text, rounds, converged=True)
+            if len(rounds) >= max_iterations:
+                return FixpointResult(text, rounds, converged=False)
+            
+            rounds.append(selected)
+            pieces = []
+            edited = []
+            position = 0
+            shift = 0
+            for correction in selected:
+                pieces.append(text[position:correction.start_pos])
+                pieces.append(correction.corrected_text)
+                new_start = correction.start_pos + shift
+                edited.append((new_start, new_start + len(correction.corrected_text)))
+                shift += len(correction.corrected_text) - (
+                    correction.end_pos - correction.start_pos
+                )
+                position = correction.end_pos
+            pieces.append(text[position:])
+            text = "".join(pieces)
+            
+            # 書き換えた範囲の前後だけをチェックし直す（重なる窓はまとめる）
+            candidates = []
+            window_end = -1
+            windows: List[List[int]] = []
+            for start, end in edited:
+                lo = max(0, start - margin)
+                hi = min(len(text), end + margin)
+                if windows and lo <= window_end:
+                    windows[-1][1] = max(windows[-1][1], hi)
+                else:
+                    windows.append([lo, hi])
+                window_end = windows[-1][1]
+            for lo, hi in windows:
+                for c in check_window(text[lo:hi]):
+                    c.start_pos += lo
+                    c.end_pos += lo
+                    candidates.append(c)
     
     def should_apply_ai_processing(self, text: str) -> bool:
         """AI処理が必要かどうかを判定"""
+        # 文章が長い場合（200文字以上）はAI処理推奨
+        # （大きな文書を全文チェックし直さないよう先に判定する）
+        if len(text) > 200:
+            return True
+        
         corrections = self.check_text(text)
         
         # 複雑な文法エラーや文脈依存の問題がある場合はAI処理が必要
@@ -176,8 +646,4 @@ class RuleEngine:
             if correction.category in complex_categories:
                 return True
         
-        # 文章が長い場合（200文字以上）はAI処理推奨
-        if len(text) > 200:
-            return True
-        
         return False
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""
+コンパイル済みルールセットバンドル
+
+YAML のルールを解析・コンパイルした結果（文字列プール、ルール・パターンの
+メタデータ、Aho-Corasick の表）を1つのバイナリファイルに書き出す。読み込み時は
+mmap して表を memoryview のまま使うため、同じバンドルを開いた複数のワーカー
+プロセスは OS のページキャッシュを共有する。
+
+ファイル形式（リトルエンディアン、write_sections / SectionFile は他の
+コンパイル済みデータでも使う）:
+    ヘッダ    magic(8) version(u32) fingerprint(32) section_count(u32)
+    目次      name(16) offset(u64) length(u64) をセクション数ぶん
+    セクション 8 バイト境界に揃えて並べる
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from app.services.matcher import TABLE_NAMES, LiteralMatcher
+
+MAGIC = b"PRBUNDLE"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<8sI32sI")
+_SECTION = struct.Struct("<16sQQ")
+_ALIGN = 8
+
+# 1ルールあたりの項目: name, category, priority, 最初のパターン番号
+_RULE_FIELDS = 4
+# 1パターンあたりの項目: type, pattern, replacement, description, regex（-1 は None）
+_PATTERN_FIELDS = 5
+
+# (name, category, priority, [(type, pattern, replacement, description, regex)])
+RuleRecord = Tuple[str, str, int, List[Tuple[Optional[str], ...]]]
+
+
+class BundleError(Exception):
+    """バンドルが壊れている・形式が異なる"""
+
+
+def ruleset_fingerprint(rules_dir: Union[str, Path]) -> str:
+    """ルールファイルの内容から指紋（SHA-256）を計算"""
+    digest = hashlib.sha256(b"%s:%d" % (MAGIC, FORMAT_VERSION))
+    rules_path = Path(rules_dir)
+    if rules_path.exists():
+        for rule_file in sorted(rules_path.glob("*.yml")):
+            content = rule_file.read_bytes()
+            digest.update(rule_file.name.encode("utf-8"))
+            digest.update(struct.pack("<Q", len(content)))
+            digest.update(content)
+    return digest.hexdigest()
+
+
+class _StringPool:
+    """重複を除いた UTF-8 文字列プール"""
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.offsets = array("i", [0])
+        self._index: Dict[str, int] = {}
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        string_id = self._index.get(value)
+        if string_id is None:
+            string_id = len(self.offsets) - 1
+            self.data += value.encode("utf-8")
+            self.offsets.append(len(self.data))
+            self._index[value] = string_id
+        return string_id
+
+
+def write_bundle(
+    path: Union[str, Path],
+    fingerprint: str,
+    rules: Sequence[Any],
+    matcher: LiteralMatcher,
+) -> None:
+    """ルールとオートマトンをバンドルに書き出し（一時ファイル経由で置き換え）"""
+    pool = _StringPool()
+    rule_table = array("i")
+    pattern_table = array("i")
+    pattern_count = 0
+
+    for rule in rules:
+        rule_table.extend(
+            (pool.add(rule.name), pool.add(rule.category), rule.priority, pattern_count)
+        )
+        for pattern in rule.patterns:
+            pattern_table.extend(
+                (
+                    pool.add(pattern.type),
+                    pool.add(pattern.pattern),
+                    pool.add(pattern.replacement),
+                    pool.add(pattern.description),
+                    pool.add(pattern.regex),
+                )
+            )
+            pattern_count += 1
+
+    sections: List[Tuple[str, bytes]] = [
+        ("strings", bytes(pool.data)),
+        ("string_offsets", pool.offsets.tobytes()),
+        ("rules", rule_table.tobytes()),
+        ("patterns", pattern_table.tobytes()),
+    ]
+    for name, table in matcher.tables().items():
+        sections.append(("ac_" + name, array("i", table).tobytes()))
+
+    write_sections(path, MAGIC, FORMAT_VERSION, fingerprint, sections)
+
+
+def write_sections(
+    path: Union[str, Path],
+    magic: bytes,
+    version: int,
+    fingerprint: str,
+    sections: Sequence[Tuple[str, bytes]],
+) -> None:
+    """セクションを並べたバイナリファイルを書き出し（一時ファイル経由で置き換え）"""
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    directory = []
+    for name, data in sections:
+        offset += -offset % _ALIGN
+        directory.append((name, offset, len(data)))
+        offset += len(data)
+
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(magic, version, bytes.fromhex(fingerprint), len(sections)))
+        for name, section_offset, length in directory:
+            f.write(_SECTION.pack(name.encode("ascii"), section_offset, length))
+        for (name, data), (_, section_offset, _) in zip(sections, directory):
+            f.write(b"\0" * (section_offset - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SectionFile:
+    """mmap したセクションファイル"""
+
+    def __init__(self, path: Union[str, Path], magic: bytes, version: int):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                # 空のファイルは mmap できない
+                raise BundleError(f"empty bundle: {self.path}") from e
+
+        try:
+            file_magic, file_version, fingerprint, section_count = _HEADER.unpack_from(
+                self._mmap, 0
+            )
+        except struct.error as e:
+            raise BundleError(f"invalid bundle header: {self.path}") from e
+        if file_magic != magic or file_version != version:
+            raise BundleError(f"unsupported bundle format: {self.path}")
+        self.fingerprint = fingerprint.hex()
+
+        view = memoryview(self._mmap)
+        self._sections: Dict[str, memoryview] = {}
+        try:
+            for i in range(section_count):
+                name, offset, length = _SECTION.unpack_from(
+                    self._mmap, _HEADER.size + _SECTION.size * i
+                )
+                if offset + length > len(self._mmap):
+                    raise BundleError(f"truncated bundle: {self.path}")
+                self._sections[name.rstrip(b"\0").decode("ascii")] = view[
+                    offset : offset + length
+                ]
+        except (struct.error, UnicodeDecodeError) as e:
+            raise BundleError(f"invalid bundle sections: {self.path}") from e
+
+    def section(self, name: str) -> memoryview:
+        try:
+            return self._sections[name]
+        except KeyError:
+            raise BundleError(f"missing section {name}: {self.path}") from None
+
+
+class RulesetBundle(SectionFile):
+    """mmap したバンドル"""
+
+    def __init__(self, path: Union[str, Path]):
+        super().__init__(path, MAGIC, FORMAT_VERSION)
+        self._strings = self.section("strings")
+        self._string_offsets = self._cast(self.section("string_offsets"))
+        for name in TABLE_NAMES:
+            self._cast(self.section("ac_" + name))
+
+    def _cast(self, section: memoryview) -> memoryview:
+        try:
+            return section.cast("i")
+        except TypeError as e:
+            raise BundleError(f"misaligned section: {self.path}") from e
+
+    def string(self, string_id: int) -> Optional[str]:
+        """文字列プールから文字列を取り出し"""
+        if string_id < 0:
+            return None
+        start = self._string_offsets[string_id]
+        end = self._string_offsets[string_id + 1]
+        return str(self._strings[start:end], "utf-8")
+
+    def rule_records(self) -> List[RuleRecord]:
+        """ルール・パターンのメタデータを復元（表が壊れていれば BundleError）"""
+        try:
+            return self._rule_records()
+        except (IndexError, ValueError) as e:
+            # 範囲外の ID・UTF-8 でない文字列（UnicodeDecodeError を含む）
+            raise BundleError(f"invalid rule tables: {self.path}") from e
+
+    def _rule_records(self) -> List[RuleRecord]:
+        rule_table = self._cast(self.section("rules"))
+        pattern_table = self._cast(self.section("patterns"))
+        pattern_count = len(pattern_table) // _PATTERN_FIELDS
+        rule_count = len(rule_table) // _RULE_FIELDS
+
+        records = []
+        for r in range(rule_count):
+            base = r * _RULE_FIELDS
+            name_id, category_id, priority, first = rule_table[
+                base : base + _RULE_FIELDS
+            ]
+            if r + 1 < rule_count:
+                last = rule_table[base + _RULE_FIELDS + 3]
+            else:
+                last = pattern_count
+
+            patterns = []
+            for p in range(first, last):
+                fields = pattern_table[p * _PATTERN_FIELDS : (p + 1) * _PATTERN_FIELDS]
+                patterns.append(tuple(self.string(i) for i in fields))
+            records.append(
+                (self.string(name_id), self.string(category_id), priority, patterns)
+            )
+        return records
+
+    def matcher(self) -> LiteralMatcher:
+        """mmap 上の表をそのまま使うオートマトン"""
+        return LiteralMatcher(
+            {name: self._sections["ac_" + name].cast("i") for name in TABLE_NAMES}
+        )
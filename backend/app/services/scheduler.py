@@ -0,0 +1,324 @@
+"""
+優先度レーンと重み付き公平スケジューリング
+
+リクエストを interactive / standard / bulk のレーンに分類し、レーンごとの
+キューから重みに応じて（ストライドスケジューリング）校正処理を取り出して
+実行する。SCHEDULER_CLIENT_RATE を設定するとクライアント単位のトークンバケットで
+流量を制限する。キューが深くなったときは bulk レーンから先に受付を打ち切る。
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, FrozenSet, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection
+
+
+class Lane(str, Enum):
+    INTERACTIVE = "interactive"
+    STANDARD = "standard"
+    BULK = "bulk"
+
+
+# レーンごとの重み（取り出し回数の比）
+DEFAULT_WEIGHTS = {Lane.INTERACTIVE: 8, Lane.STANDARD: 4, Lane.BULK: 1}
+
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+# 待ち行列の合計がこの深さを超えたら bulk レーンの受付を打ち切る
+SCHEDULER_BULK_SHED_DEPTH = int(os.getenv("SCHEDULER_BULK_SHED_DEPTH", "32"))
+# 待ち行列の合計がこの深さを超えたら standard レーンの受付も打ち切る
+SCHEDULER_MAX_QUEUE_DEPTH = int(os.getenv("SCHEDULER_MAX_QUEUE_DEPTH", "256"))
+# クライアントごとの流量制限（リクエスト/秒, 0 で無効）とバースト
+SCHEDULER_CLIENT_RATE = float(os.getenv("SCHEDULER_CLIENT_RATE", "0"))
+SCHEDULER_CLIENT_BURST = float(os.getenv("SCHEDULER_CLIENT_BURST", "100"))
+# X-Client-Id / X-Forwarded-For を信頼する接続元（リバースプロキシ）のアドレス（カンマ区切り）
+SCHEDULER_TRUSTED_PROXIES = frozenset(
+    address.strip()
+    for address in os.getenv("SCHEDULER_TRUSTED_PROXIES", "").split(",")
+    if address.strip()
+)
+
+LANE_HEADER = "x-priority-lane"
+CLIENT_HEADER = "x-client-id"
+FORWARDED_HEADER = "x-forwarded-for"
+
+# 待ち時間の分位点を計算するために保持する直近の件数
+_WAIT_SAMPLES = 1024
+
+
+def classify_lane(connection: HTTPConnection, default: Lane) -> Lane:
+    """ヘッダー X-Priority-Lane があればそのレーン、なければエンドポイントの既定"""
+    value = connection.headers.get(LANE_HEADER, "").strip().lower()
+    try:
+        return Lane(value) if value else default
+    except ValueError:
+        return default
+
+
+def client_id(
+    connection: HTTPConnection,
+    trusted_proxies: FrozenSet[str] = SCHEDULER_TRUSTED_PROXIES,
+) -> str:
+    """流量制限の単位
+
+    ヘッダーはクライアントが自由に付けられるので、接続元が信頼するプロキシの
+    ときだけ X-Client-Id（なければ X-Forwarded-For のうちプロキシを除いた
+    最も近いアドレス）を使い、それ以外は接続元アドレスを使う。
+    """
+    peer = connection.client.host if connection.client else "unknown"
+    if peer not in trusted_proxies:
+        return peer
+    value = connection.headers.get(CLIENT_HEADER)
+    if value:
+        return value
+    forwarded = [
+        address.strip()
+        for address in connection.headers.get(FORWARDED_HEADER, "").split(",")
+        if address.strip()
+    ]
+    for address in reversed(forwarded):
+        if address not in trusted_proxies:
+            return address
+    return peer
+
+
+class SchedulerRejected(Exception):
+    """スケジューラーがリクエストを受け付けなかった"""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(SchedulerRejected):
+    """クライアントの流量制限を超えた"""
+
+    status_code = 429
+
+
+class Overloaded(SchedulerRejected):
+    """待ち行列が深すぎるため受付を打ち切った"""
+
+    status_code = 503
+
+
+class TokenBucket:
+    """トークンバケット"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return (1 - self.tokens) / self.rate if self.rate else 1.0
+
+
+@dataclass
+class _Job:
+    func: Callable[..., Any]
+    args: Tuple[Any, ...]
+    future: asyncio.Future
+    enqueued: float
+
+
+@dataclass
+class LaneStats:
+    """レーンごとの統計"""
+
+    submitted: int = 0
+    started: int = 0
+    completed: int = 0
+    rate_limited: int = 0
+    shed: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+    wait_samples: Deque[float] = field(
+        default_factory=lambda: deque(maxlen=_WAIT_SAMPLES)
+    )
+
+    def record_wait(self, wait: float) -> None:
+        self.started += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.wait_samples.append(wait)
+
+    def snapshot(self, depth: int) -> Dict[str, Any]:
+        samples = sorted(self.wait_samples)
+
+        def quantile(fraction: float) -> float:
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+        return {
+            "queue_depth": depth,
+            "submitted": self.submitted,
+            "started": self.started,
+            "completed": self.completed,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "wait_avg_ms": round(self.wait_total / max(self.started, 1) * 1000, 3),
+            "wait_p50_ms": round(quantile(0.50) * 1000, 3),
+            "wait_p95_ms": round(quantile(0.95) * 1000, 3),
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+class LaneScheduler:
+    """レーン別の重み付き公平キュー"""
+
+    def __init__(
+        self,
+        workers: int = SCHEDULER_WORKERS,
+        weights: Optional[Dict[Lane, int]] = None,
+        bulk_shed_depth: int = SCHEDULER_BULK_SHED_DEPTH,
+        max_queue_depth: int = SCHEDULER_MAX_QUEUE_DEPTH,
+        client_rate: float = SCHEDULER_CLIENT_RATE,
+        client_burst: float = SCHEDULER_CLIENT_BURST,
+        max_clients: int = 10000,
+    ):
+        self.workers = workers
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.shed_depths = {
+            Lane.BULK: bulk_shed_depth,
+            Lane.STANDARD: max_queue_depth,
+            Lane.INTERACTIVE: max_queue_depth * 2,
+        }
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+
+        self._queues: Dict[Lane, Deque[_Job]] = {lane: deque() for lane in Lane}
+        # ストライドスケジューリングの仮想時刻
+        self._passes: Dict[Lane, float] = {lane: 0.0 for lane in Lane}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[Lane, LaneStats] = {lane: LaneStats() for lane in Lane}
+        self._wakeup: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def start(self) -> None:
+        """ワーカーを起動（イベントループ内で呼ぶ）"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Condition()
+        self._tasks = [
+            asyncio.ensure_future(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for queue in self._queues.values():
+            while queue:
+                job = queue.popleft()
+                if not job.future.done():
+                    job.future.cancel()
+
+    def _check_rate(self, client_id: str) -> None:
+        if not self.client_rate:
+            return
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                # 古いクライアントから忘れる
+                self._buckets.pop(next(iter(self._buckets)))
+            bucket = TokenBucket(self.client_rate, self.client_burst)
+            self._buckets[client_id] = bucket
+        if not bucket.try_acquire():
+            raise RateLimited("リクエストが多すぎます", retry_after=bucket.retry_after())
+
+    async def submit(
+        self, lane: Lane, client_id: str, func: Callable[..., Any], *args: Any
+    ) -> Any:
+        """レーンに処理を投入して結果を待つ"""
+        self.start()
+        assert self._wakeup is not None
+        stats = self._stats[lane]
+
+        try:
+            self._check_rate(client_id)
+        except RateLimited:
+            stats.rate_limited += 1
+            raise
+        if self.queue_depth >= self.shed_depths[lane]:
+            stats.shed += 1
+            raise Overloaded("サーバーが混雑しています")
+
+        queue = self._queues[lane]
+        if not queue:
+            # 空だったレーンが溜めた分の優先権を持ち越さないようにする
+            active = [self._passes[other] for other in Lane if self._queues[other]]
+            if active:
+                self._passes[lane] = max(self._passes[lane], min(active))
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append(_Job(func, args, future, time.perf_counter()))
+        stats.submitted += 1
+        async with self._wakeup:
+            self._wakeup.notify()
+
+        return await future
+
+    def _next_job(self) -> Optional[Tuple[Lane, _Job]]:
+        candidates = [lane for lane in Lane if self._queues[lane]]
+        if not candidates:
+            return None
+        lane = min(candidates, key=lambda candidate: self._passes[candidate])
+        self._passes[lane] += 1 / self.weights[lane]
+        return lane, self._queues[lane].popleft()
+
+    async def _worker(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            async with self._wakeup:
+                await self._wakeup.wait_for(lambda: self.queue_depth > 0)
+                lane, job = self._next_job()  # type: ignore[misc]
+
+            if job.future.cancelled():
+                # 待っている間に呼び出し元が取り消した
+                continue
+            self._stats[lane].record_wait(time.perf_counter() - job.enqueued)
+            try:
+                result = await run_in_threadpool(job.func, *job.args)
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            self._stats[lane].completed += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """レーンごとの待ち時間・件数"""
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "lanes": {
+                lane.value: self._stats[lane].snapshot(len(self._queues[lane]))
+                for lane in Lane
+            },
+        }
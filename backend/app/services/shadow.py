@@ -0,0 +1,303 @@
+"""
+候補ルールセットのシャドー評価
+
+本番のルールセットの横に候補のルールセット（SHADOW_RULES_DIR）を読み込み、
+/check のリクエストの一部（SHADOW_SAMPLE_RATE）について、レスポンスを返した
+あとに候補のルールセットでもチェックして結果を比べる。修正件数・一致しない
+修正・リクエストごとの CPU 時間を集計し、GET /shadow/report で参照できる。
+
+シャドー評価は本番の処理を遅くしないよう、次の場合は評価せずに捨てる。
+
+- 評価待ちの待ち行列（SHADOW_QUEUE_SIZE）がいっぱい
+- CPU 時間の予算（1秒あたり SHADOW_CPU_BUDGET 秒）を使い切っている
+- スケジューラーに処理待ちのリクエストがある
+
+    SHADOW_RULES_DIR=rules-candidate SHADOW_SAMPLE_RATE=0.05 uvicorn app.main:app
+"""
+
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.services.corrections import CorrectionStore
+from app.services.rule_engine import RuleEngine
+
+logger = logging.getLogger(__name__)
+
+# 候補のルールセット（空ならシャドー評価をしない）
+SHADOW_RULES_DIR = os.getenv("SHADOW_RULES_DIR", "")
+# 評価するリクエストの割合
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.05"))
+# 1秒あたりに使ってよい CPU 時間（秒）
+SHADOW_CPU_BUDGET = float(os.getenv("SHADOW_CPU_BUDGET", "0.05"))
+# 評価待ちの最大件数
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "32"))
+
+# CPU 時間の予算を貯めておける秒数（短い間の偏りをならす）
+_BUDGET_WINDOW = 10.0
+# 保持する不一致の例の件数
+_EXAMPLE_LIMIT = 20
+_POLL_TIMEOUT = 0.5
+
+
+def correction_keys(store: CorrectionStore) -> Counter:
+    """修正の多重集合（開始位置, 終了位置, ルール名, 修正後の文字列）"""
+    return Counter(
+        (r["start_pos"], r["end_pos"], r["rule_name"], r["corrected_text"])
+        for r in store.records()
+    )
+
+
+class CpuBudget:
+    """CPU 時間の予算（使った分だけ後から差し引くトークンバケット）"""
+
+    def __init__(self, rate: float, window: float = _BUDGET_WINDOW):
+        self.rate = rate
+        self.capacity = rate * window
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, now: Optional[float] = None) -> bool:
+        with self._lock:
+            self._refill(time.monotonic() if now is None else now)
+            return self.tokens > 0
+
+    def charge(self, seconds: float) -> None:
+        with self._lock:
+            self.tokens -= seconds
+
+
+@dataclass
+class ShadowSample:
+    """評価するリクエスト（本番の結果と CPU 時間）"""
+
+    text: str
+    live: CorrectionStore
+    live_cpu: float
+
+
+class ShadowStats:
+    """本番と候補の比較の集計"""
+
+    def __init__(self) -> None:
+        self.offered = 0
+        self.sampled = 0
+        self.evaluated = 0
+        self.errors = 0
+        self.dropped: Counter = Counter()
+        self.live_corrections = 0
+        self.candidate_corrections = 0
+        self.disagreeing_requests = 0
+        self.only_live = 0
+        self.only_candidate = 0
+        self.live_cpu = 0.0
+        self.candidate_cpu = 0.0
+        # ルールごとの、候補で増えた修正・なくなった修正の件数
+        self.added: Counter = Counter()
+        self.removed: Counter = Counter()
+        self.examples: Deque[Dict[str, Any]] = deque(maxlen=_EXAMPLE_LIMIT)
+
+    def record(
+        self,
+        live: Counter,
+        candidate: Counter,
+        live_cpu: float,
+        candidate_cpu: float,
+    ) -> None:
+        only_live = live - candidate
+        only_candidate = candidate - live
+        self.evaluated += 1
+        self.live_corrections += sum(live.values())
+        self.candidate_corrections += sum(candidate.values())
+        self.live_cpu += live_cpu
+        self.candidate_cpu += candidate_cpu
+        if not only_live and not only_candidate:
+            return
+
+        self.disagreeing_requests += 1
+        self.only_live += sum(only_live.values())
+        self.only_candidate += sum(only_candidate.values())
+        for (_, _, rule_name, _), count in only_live.items():
+            self.removed[rule_name] += count
+        for (_, _, rule_name, _), count in only_candidate.items():
+            self.added[rule_name] += count
+        self.examples.append(
+            {
+                "only_live": [list(key) for key in sorted(only_live)[:5]],
+                "only_candidate": [list(key) for key in sorted(only_candidate)[:5]],
+            }
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        evaluated = max(self.evaluated, 1)
+        rules = sorted(set(self.added) | set(self.removed))
+        return {
+            "offered": self.offered,
+            "sampled": self.sampled,
+            "evaluated": self.evaluated,
+            "errors": self.errors,
+            "dropped": dict(self.dropped),
+            "corrections": {
+                "live": self.live_corrections,
+                "candidate": self.candidate_corrections,
+                "only_live": self.only_live,
+                "only_candidate": self.only_candidate,
+            },
+            "disagreeing_requests": self.disagreeing_requests,
+            "cpu_ms": {
+                "live_mean": round(self.live_cpu / evaluated * 1000, 3),
+                "candidate_mean": round(self.candidate_cpu / evaluated * 1000, 3),
+                "ratio": (
+                    round(self.candidate_cpu / self.live_cpu, 3)
+                    if self.live_cpu
+                    else None
+                ),
+            },
+            "rules": {
+                name: {"added": self.added[name], "removed": self.removed[name]}
+                for name in rules
+            },
+            "examples": list(self.examples),
+        }
+
+
+class ShadowEvaluator:
+    """候補のルールセットを別スレッドで評価"""
+
+    def __init__(
+        self,
+        live: RuleEngine,
+        candidate: RuleEngine,
+        sample_rate: float = SHADOW_SAMPLE_RATE,
+        cpu_budget: float = SHADOW_CPU_BUDGET,
+        queue_size: int = SHADOW_QUEUE_SIZE,
+        busy: Optional[Callable[[], bool]] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.live = live
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self.budget = CpuBudget(cpu_budget)
+        self.busy = busy
+        self.stats = ShadowStats()
+        self._rng = rng or random.Random()
+        self._queue: "queue.Queue[ShadowSample]" = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="shadow-evaluator", daemon=True
+        )
+        self._thread.start()
+
+    def _drop(self, reason: str) -> bool:
+        with self._lock:
+            self.stats.dropped[reason] += 1
+        return False
+
+    def should_sample(self) -> bool:
+        """このリクエストを評価するか（本番のチェックの前に呼ぶ）"""
+        with self._lock:
+            self.stats.offered += 1
+        if self._rng.random() >= self.sample_rate:
+            return False
+        if self.busy is not None and self.busy():
+            return self._drop("load")
+        if not self.budget.available():
+            return self._drop("budget")
+        return True
+
+    def submit(self, sample: ShadowSample) -> bool:
+        """評価待ちに追加（待ち行列がいっぱいなら捨てる）"""
+        try:
+            self._queue.put_nowait(sample)
+        except queue.Full:
+            return self._drop("queue_full")
+        with self._lock:
+            self.stats.sampled += 1
+        return True
+
+    def evaluate(self, sample: ShadowSample) -> None:
+        """候補のルールセットでチェックして本番の結果と比べる"""
+        started = time.thread_time()
+        candidate = self.candidate.check_text_compact(sample.text)
+        candidate_cpu = time.thread_time() - started
+        self.budget.charge(candidate_cpu)
+
+        live_keys = correction_keys(sample.live)
+        candidate_keys = correction_keys(candidate)
+        with self._lock:
+            self.stats.record(live_keys, candidate_keys, sample.live_cpu, candidate_cpu)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                sample = self._queue.get(timeout=_POLL_TIMEOUT)
+            except queue.Empty:
+                continue
+            try:
+                if self.budget.available():
+                    self.evaluate(sample)
+                else:
+                    # 待っている間に予算を使い切った
+                    self._drop("budget")
+            except Exception:
+                logger.exception("Shadow evaluation failed")
+                with self._lock:
+                    self.stats.errors += 1
+            finally:
+                self._queue.task_done()
+
+    def drain(self) -> None:
+        """評価待ちがなくなるまで待つ"""
+        self._queue.join()
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            report = self.stats.snapshot()
+        report.update(
+            {
+                "enabled": True,
+                "live_ruleset": self.live.fingerprint,
+                "candidate_ruleset": self.candidate.fingerprint,
+                "sample_rate": self.sample_rate,
+                "cpu_budget": self.budget.rate,
+                "queue_depth": self._queue.qsize(),
+            }
+        )
+        return report
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats = ShadowStats()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(_POLL_TIMEOUT * 2)
+
+
+def create_shadow_evaluator(
+    live: RuleEngine,
+    rules_dir: str = SHADOW_RULES_DIR,
+    busy: Optional[Callable[[], bool]] = None,
+) -> Optional[ShadowEvaluator]:
+    """候補のルールセットが設定されていればシャドー評価を作成
+
+    候補のバンドルは本番のバンドルの横の別のファイルにする（同じパスを使うと
+    指紋の違うバンドルで本番のバンドルを上書きしてしまう）。
+    """
+    if not rules_dir:
+        return None
+    bundle_path = f"{live.bundle_path}.shadow" if live.bundle_path else None
+    candidate = RuleEngine(rules_dir, bundle_path=bundle_path)
+    return ShadowEvaluator(live, candidate, busy=busy)
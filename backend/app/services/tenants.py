@@ -0,0 +1,329 @@
+"""
+テナントごとのルール差分
+
+顧客ごとの表記ルール（禁止語・表記の揺れ・製品名など）を、共有のルールエンジンに
+重ねる小さな差分として扱う。基本ルールの照合表・文法チェッカーは全テナントで
+共有し、テナントごとに持つのは差分ルールのパターン（多ければオートマトン）と
+メタデータだけなので、メモリはテナント数ではなく差分の大きさに比例する。
+差分の結果は基本ルールの結果より先に登録するので、同じ範囲に重なったときは
+差分の修正が適用される。
+
+差分は TENANT_RULES_DIR/<テナントID>.yml に置く。
+
+    disable:              # 無効にする基本ルール・文法チェックのルール名
+      - "重複表現修正"
+    rules:                # 基本ルールと同じ形式（同名のルールは基本ルールを置き換える）
+      product_names:
+        name: "製品名表記"
+        category: "formatting"
+        priority: 1
+        patterns:
+          - pattern: "ぷるーふ"
+            replacement: "Proof"
+            description: "製品名の表記"
+
+差分は最初に使われたときにコンパイルし、使われていないテナントから LRU で捨てる。
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import yaml
+
+from app.services.corrections import CorrectionStore, OverlayMetaTable
+from app.services.matcher import LiteralMatcher
+from app.services.rule_engine import (
+    AUTOMATON_MIN_PATTERNS,
+    FIXPOINT_MAX_ITERATIONS,
+    REGEX_MATCH_MARGIN,
+    CheckCancelled,
+    FixpointResult,
+    Rule,
+    RuleEngine,
+    find_literal,
+    parse_rules,
+)
+
+TENANT_RULES_DIR = os.getenv("TENANT_RULES_DIR", "")
+# コンパイル済みの差分を保持するテナント数
+TENANT_CACHE_SIZE = int(os.getenv("TENANT_CACHE_SIZE", "128"))
+
+TENANT_HEADER = "x-tenant-id"
+
+_TENANT_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class TenantError(Exception):
+    """テナントの差分ルールを読み込めない"""
+
+
+@dataclass
+class TenantOverlay:
+    """テナント1件ぶんの差分ルール"""
+
+    tenant_id: str
+    mtime_ns: int
+    rules: List[Rule]
+    # 無効にする基本ルール名（差分で置き換えるものを含む）
+    disabled: Set[str]
+    # 無効にする基本ルールのパターン通し番号
+    disabled_orders: Set[int]
+    meta: OverlayMetaTable
+    literals: List[str]
+    # リテラルが AUTOMATON_MIN_PATTERNS 以上のときだけ作る（少なければ str.find）
+    matcher: Optional[LiteralMatcher]
+    literal_meta_ids: List[int]
+    regex_patterns: List[Tuple[Any, int]]
+
+    @property
+    def pattern_count(self) -> int:
+        return sum(len(rule.patterns) for rule in self.rules)
+
+    def check_text_compact(
+        self,
+        engine: RuleEngine,
+        text: str,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> CorrectionStore:
+        """基本ルールに差分を重ねてチェック"""
+        return engine.check_normalized(
+            text,
+            lambda target, notation: self._check(
+                engine, target, cancel_event, notation=notation
+            ),
+            disabled=self.disabled,
+        )
+
+    def check_window(self, engine: RuleEngine, text: str) -> CorrectionStore:
+        """RuleEngine.check_window に差分を重ねたもの"""
+        return engine.check_normalized(
+            text,
+            lambda target, _: self._check(engine, target, local=True),
+            disabled=self.disabled,
+            notation=False,
+        )
+
+    def match_margin(self, engine: RuleEngine) -> int:
+        """基本ルールと差分のどのパターンの一致も収まる長さ"""
+        margin = max(
+            [engine.match_margin()] + [len(literal) for literal in self.literals]
+        )
+        if self.regex_patterns:
+            margin = max(margin, REGEX_MATCH_MARGIN)
+        return margin
+
+    def _check(
+        self,
+        engine: RuleEngine,
+        text: str,
+        cancel_event: Optional[threading.Event] = None,
+        local: bool = False,
+        notation: bool = True,
+    ) -> CorrectionStore:
+        """local なら文書全体を見るチェック（文体統一・表記統一）をしない
+
+        notation が False なら表記統一だけをしない。
+        """
+        # 入力によって変わる文法チェックの結果はリクエストごとの差分テーブルへ
+        store = CorrectionStore(text, OverlayMetaTable(self.meta))
+
+        # 重なりの解決は同じ範囲なら先に登録したものを選ぶので、差分を先に登録する
+        for start, end, meta_id in sorted(self._overlay_hits(text)):
+            store.add(start, end, meta_id)
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise CheckCancelled()
+
+        hits = engine.find_rule_hits(text)
+        if self.disabled_orders:
+            hits = [hit for hit in hits if hit[0] not in self.disabled_orders]
+        engine.add_rule_hits(store, hits)
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise CheckCancelled()
+        checker = engine.grammar_checker
+        if local:
+            grammar = checker.merge_results(checker.check_local(text))
+        else:
+            grammar = checker.check_grammar(text, notation)
+        store.extend_results(
+            correction
+            for correction in grammar
+            if correction.rule_name not in self.disabled
+        )
+
+        return store
+
+    def _overlay_hits(self, text: str) -> List[Tuple[int, int, int]]:
+        """差分ルールの照合結果を (開始, 終了, メタデータ ID) で列挙"""
+        if self.matcher is not None:
+            hits = [
+                (start, end, self.literal_meta_ids[pattern_id])
+                for pattern_id, start, end in self.matcher.finditer(text)
+            ]
+        else:
+            hits = [
+                (start, end, meta_id)
+                for literal, meta_id in zip(self.literals, self.literal_meta_ids)
+                for start, end in find_literal(text, literal)
+            ]
+        for regex, meta_id in self.regex_patterns:
+            for match in regex.finditer(text):
+                hits.append((match.start(), match.end(), meta_id))
+        return hits
+
+
+def compile_overlay(
+    engine: RuleEngine, tenant_id: str, data: Dict[str, Any], mtime_ns: int = 0
+) -> TenantOverlay:
+    """差分ルールをコンパイル"""
+    rules = sorted(parse_rules(data), key=lambda rule: rule.priority)
+    disabled = set(data.get("disable") or []) | {rule.name for rule in rules}
+
+    meta = OverlayMetaTable(engine.correction_meta)
+    literals: List[str] = []
+    literal_meta_ids: List[int] = []
+    regex_patterns: List[Tuple[Any, int]] = []
+
+    for rule in rules:
+        for pattern in rule.patterns:
+            meta_id = meta.intern(
+                rule.name, rule.category, pattern.description, pattern.replacement
+            )
+            if pattern.type == "literal":
+                literals.append(pattern.pattern)
+                literal_meta_ids.append(meta_id)
+            elif pattern.type == "regex":
+                regex_patterns.append(
+                    (re.compile(pattern.regex or pattern.pattern), meta_id)
+                )
+
+    return TenantOverlay(
+        tenant_id=tenant_id,
+        mtime_ns=mtime_ns,
+        rules=rules,
+        disabled=disabled,
+        disabled_orders=engine.pattern_orders(disabled),
+        meta=meta,
+        literals=literals,
+        matcher=(
+            LiteralMatcher.build(literals)
+            if len(literals) >= AUTOMATON_MIN_PATTERNS
+            else None
+        ),
+        literal_meta_ids=literal_meta_ids,
+        regex_patterns=regex_patterns,
+    )
+
+
+class TenantRegistry:
+    """テナント差分の遅延コンパイルと LRU キャッシュ"""
+
+    def __init__(
+        self,
+        engine: RuleEngine,
+        tenants_dir: str = TENANT_RULES_DIR,
+        capacity: int = TENANT_CACHE_SIZE,
+    ):
+        self.engine = engine
+        self.tenants_dir = Path(tenants_dir) if tenants_dir else None
+        self.capacity = capacity
+        self._cache: "OrderedDict[str, TenantOverlay]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "compiles": 0, "evictions": 0}
+
+    def get(self, tenant_id: Optional[str]) -> Optional[TenantOverlay]:
+        """テナントの差分（差分ファイルがなければ None）
+
+        ファイルが更新されていればコンパイルし直す。
+        """
+        if not tenant_id or self.tenants_dir is None:
+            return None
+        if not _TENANT_ID.match(tenant_id):
+            raise TenantError(f"invalid tenant id: {tenant_id}")
+
+        path = self.tenants_dir / f"{tenant_id}.yml"
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._cache.pop(tenant_id, None)
+            return None
+
+        with self._lock:
+            overlay = self._cache.get(tenant_id)
+            if overlay is not None and overlay.mtime_ns == mtime_ns:
+                self._cache.move_to_end(tenant_id)
+                self.stats["hits"] += 1
+                return overlay
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+            overlay = compile_overlay(self.engine, tenant_id, data, mtime_ns)
+        except (
+            OSError,
+            yaml.YAMLError,
+            AttributeError,
+            KeyError,
+            TypeError,
+            re.error,
+        ) as e:
+            raise TenantError(f"failed to load rules for tenant {tenant_id}: {e}")
+
+        with self._lock:
+            self.stats["compiles"] += 1
+            self._cache[tenant_id] = overlay
+            self._cache.move_to_end(tenant_id)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+                self.stats["evictions"] += 1
+        return overlay
+
+    def check_text_compact(
+        self,
+        tenant_id: Optional[str],
+        text: str,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> CorrectionStore:
+        """テナントの差分を重ねてチェック（差分がなければ基本ルールのみ）"""
+        overlay = self.get(tenant_id)
+        if overlay is None:
+            return self.engine.check_text_compact(text, cancel_event)
+        return overlay.check_text_compact(self.engine, text, cancel_event)
+
+    def apply_until_stable(
+        self,
+        tenant_id: Optional[str],
+        text: str,
+        max_iterations: int = FIXPOINT_MAX_ITERATIONS,
+        initial: Optional[CorrectionStore] = None,
+    ) -> FixpointResult:
+        """テナントの差分を重ねて修正がなくなるまで適用を繰り返す"""
+        overlay = self.get(tenant_id)
+        if overlay is None:
+            return self.engine.apply_until_stable(text, max_iterations, initial)
+        if initial is None:
+            initial = overlay.check_text_compact(self.engine, text)
+        return self.engine.apply_until_stable(
+            text,
+            max_iterations,
+            initial,
+            check_window=lambda window: overlay.check_window(self.engine, window),
+            margin=overlay.match_margin(self.engine),
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            overlays = list(self._cache.values())
+        return {
+            "cached_tenants": len(overlays),
+            "capacity": self.capacity,
+            "overlay_patterns": sum(overlay.pattern_count for overlay in overlays),
+            **self.stats,
+        }
@@ -0,0 +1,354 @@
+"""
+語彙表による誤字チェック（SymSpell 方式の削除索引）
+
+語彙表の各語から最大 max_distance 文字を削除した文字列をすべて列挙し、
+その64ビットハッシュ → 語ID の転置索引を事前に作っておく。照合時は入力語の
+削除文字列のハッシュを索引から二分探索で引き、得られた候補だけについて
+編集距離を計算する。長い語は先頭 prefix_length 文字だけを索引に使う。
+
+索引は ruleset_bundle と同じセクション形式のファイルに書き出し、mmap した
+配列を numpy でそのまま検索するので、大きな語彙表でも読み込みは一瞬で済む。
+
+    python -m app.cli build-typo-index lexicon.txt -o lexicon.idx
+    TYPO_LEXICON=lexicon.txt TYPO_INDEX=lexicon.idx uvicorn app.main:app
+
+語彙表は1行1語（タブ区切りで出現頻度を付けられる）の UTF-8 テキスト。
+"""
+
+import hashlib
+import os
+import re
+import struct
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from app.services.corrections import CorrectionResult
+from app.services.ruleset_bundle import BundleError, SectionFile, write_sections
+
+MAGIC = b"PRTYPOIX"
+FORMAT_VERSION = 1
+
+DEFAULT_MAX_DISTANCE = 2
+DEFAULT_PREFIX_LENGTH = 7
+
+# 照合対象の語の最小文字数（短い語は候補が多すぎて誤検出になる）
+MIN_TOKEN_LENGTH = 3
+# この文字数以下の語は編集距離1までしか候補にしない
+SHORT_TOKEN_LENGTH = 4
+
+# 形態素解析が使えないときの候補語（カタカナ語・英字の製品名）
+_TOKEN_PATTERN = re.compile(r"[ァ-ヴー]{3,}|[A-Za-z][A-Za-z0-9]{2,}")
+_CANDIDATE_PATTERN = re.compile(r"^(?:[ァ-ヴー]+|[A-Za-z][A-Za-z0-9]*)$")
+
+_PARAMS = struct.Struct("<II")
+
+
+def string_hash(value: str) -> int:
+    """文字列の64ビットハッシュ（削除索引では衝突しても候補が増えるだけ）"""
+    data = value.encode("utf-8")
+    return (zlib.crc32(data) << 32) | zlib.adler32(data)
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """最大 max_distance 文字を削除した文字列（元の語を含み、空文字列は含まない）"""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {
+            candidate[:i] + candidate[i + 1 :]
+            for candidate in frontier
+            if len(candidate) > 1
+            for i in range(len(candidate))
+        }
+        results |= frontier
+    return results
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """制限付きの編集距離（隣接文字の入れ替えを1とする）
+
+    limit を超える場合は limit + 1 を返す。
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    # 共通の前後を除いてから計算する（誤字は局所的なので大半が除ける）
+    start = 0
+    shorter = min(len(a), len(b))
+    while start < shorter and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < shorter - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start : len(a) - end]
+    b = b[start : len(b) - end]
+    if not a or not b:
+        return min(max(len(a), len(b)), limit + 1)
+
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            value = previous[j - 1] + (a[i - 1] != b[j - 1])
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if (
+                i > 1
+                and j > 1
+                and a[i - 1] == b[j - 2]
+                and a[i - 2] == b[j - 1]
+                and previous2[j - 2] + 1 < value
+            ):
+                value = previous2[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def read_lexicon(path: Union[str, Path]) -> Dict[str, int]:
+    """語彙表を読み込み（語 → 出現頻度）"""
+    lexicon: Dict[str, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            word, _, frequency = line.rstrip("\n").partition("\t")
+            word = word.strip()
+            if not word or word.startswith("#"):
+                continue
+            lexicon[word] = lexicon.get(word, 0) + (int(frequency) if frequency else 1)
+    return lexicon
+
+
+def lexicon_fingerprint(path: Union[str, Path]) -> str:
+    """語彙表の内容から指紋（SHA-256）を計算"""
+    digest = hashlib.sha256(b"%s:%d" % (MAGIC, FORMAT_VERSION))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_typo_index(
+    path: Union[str, Path],
+    lexicon: Dict[str, int],
+    fingerprint: str,
+    max_distance: int = DEFAULT_MAX_DISTANCE,
+    prefix_length: int = DEFAULT_PREFIX_LENGTH,
+) -> None:
+    """削除索引を作成して書き出し"""
+    words = sorted(lexicon)
+    data = bytearray()
+    offsets = array("I", [0])
+    frequencies = array("I")
+    lengths = array("H")
+    keys = array("Q")
+    word_ids = array("I")
+
+    for word_id, word in enumerate(words):
+        data += word.encode("utf-8")
+        offsets.append(len(data))
+        frequencies.append(min(lexicon[word], 0xFFFFFFFF))
+        lengths.append(min(len(word), 0xFFFF))
+        for deleted in deletes(word[:prefix_length], max_distance):
+            keys.append(string_hash(deleted))
+            word_ids.append(word_id)
+
+    key_array = np.frombuffer(keys, dtype=np.uint64)
+    id_array = np.frombuffer(word_ids, dtype=np.uint32)
+    order = np.lexsort((id_array, key_array))
+    sorted_keys = key_array[order]
+    postings = id_array[order]
+
+    # 同じハッシュの語IDを posting_start[i]:posting_start[i + 1] にまとめる
+    unique_keys, starts = np.unique(sorted_keys, return_index=True)
+    posting_start = np.append(starts, len(sorted_keys)).astype(np.uint32)
+
+    write_sections(
+        path,
+        MAGIC,
+        FORMAT_VERSION,
+        fingerprint,
+        [
+            ("params", _PARAMS.pack(max_distance, prefix_length)),
+            ("words", bytes(data)),
+            ("word_offsets", offsets.tobytes()),
+            ("frequencies", frequencies.tobytes()),
+            ("lengths", lengths.tobytes()),
+            ("keys", unique_keys.astype(np.uint64).tobytes()),
+            ("posting_start", posting_start.tobytes()),
+            ("postings", postings.astype(np.uint32).tobytes()),
+        ],
+    )
+
+
+class TypoIndex(SectionFile):
+    """mmap した削除索引"""
+
+    def __init__(self, path: Union[str, Path]):
+        super().__init__(path, MAGIC, FORMAT_VERSION)
+        self.max_distance, self.prefix_length = _PARAMS.unpack(self.section("params"))
+        self._words = self.section("words")
+        self._word_offsets = self.section("word_offsets").cast("I")
+        self.frequencies = np.frombuffer(self.section("frequencies"), np.uint32)
+        self._keys = np.frombuffer(self.section("keys"), np.uint64)
+        # 候補ごとの参照は少量なので numpy を介さず memoryview で読む
+        self._lengths = self.section("lengths").cast("H")
+        self._posting_start = self.section("posting_start").cast("I")
+        self._postings = self.section("postings").cast("I")
+
+    def __len__(self) -> int:
+        return len(self.frequencies)
+
+    def word(self, word_id: int) -> str:
+        start = self._word_offsets[word_id]
+        end = self._word_offsets[word_id + 1]
+        return str(self._words[start:end], "utf-8")
+
+    def _candidate_ids(self, token: str, max_distance: int) -> List[int]:
+        """削除文字列のハッシュが一致し、文字数の差が max_distance 以内の語ID"""
+        hashes = np.fromiter(
+            (
+                string_hash(deleted)
+                for deleted in deletes(token[: self.prefix_length], max_distance)
+            ),
+            dtype=np.uint64,
+        )
+        positions = np.searchsorted(self._keys, hashes)
+        in_range = positions < len(self._keys)
+        positions = positions[in_range]
+        positions = positions[self._keys[positions] == hashes[in_range]]
+
+        starts = self._posting_start
+        postings = self._postings
+        candidate_ids: Set[int] = set()
+        for position in positions.tolist():
+            candidate_ids.update(postings[starts[position] : starts[position + 1]])
+
+        lengths = self._lengths
+        length = len(token)
+        return [i for i in candidate_ids if abs(lengths[i] - length) <= max_distance]
+
+    def lookup(
+        self, token: str, max_distance: Optional[int] = None
+    ) -> List[Tuple[str, int, int]]:
+        """編集距離 max_distance 以内の語を (語, 距離, 頻度) で返す
+
+        距離の近い順、頻度の高い順に並ぶ。語彙表にある語なら距離0の1件だけ。
+        """
+        limit = self.max_distance if max_distance is None else max_distance
+        limit = min(limit, self.max_distance)
+
+        suggestions = []
+        for word_id in self._candidate_ids(token, limit):
+            word = self.word(word_id)
+            if word == token:
+                return [(word, 0, int(self.frequencies[word_id]))]
+            distance = edit_distance(token, word, limit)
+            if distance <= limit:
+                suggestions.append((word, distance, int(self.frequencies[word_id])))
+
+        suggestions.sort(key=lambda s: (s[1], -s[2], s[0]))
+        return suggestions
+
+
+def load_typo_index(
+    lexicon_path: Optional[str], index_path: Optional[str]
+) -> Optional[TypoIndex]:
+    """索引を読み込み（語彙表より古い・壊れている場合は作り直す）"""
+    if not index_path:
+        if not lexicon_path:
+            return None
+        index_path = lexicon_path + ".idx"
+
+    if lexicon_path:
+        fingerprint = lexicon_fingerprint(lexicon_path)
+        try:
+            index: Optional[TypoIndex] = TypoIndex(index_path)
+            if index.fingerprint != fingerprint:
+                index = None
+        except (OSError, BundleError):
+            index = None
+        if index is None:
+            write_typo_index(index_path, read_lexicon(lexicon_path), fingerprint)
+            index = TypoIndex(index_path)
+        return index
+
+    return TypoIndex(index_path)
+
+
+class TypoChecker:
+    """語彙表に近いが一致しない語を誤字候補として指摘"""
+
+    def __init__(self, index: TypoIndex):
+        self.index = index
+
+    @classmethod
+    def from_env(cls) -> Optional["TypoChecker"]:
+        """環境変数 TYPO_LEXICON / TYPO_INDEX から作成（未設定なら None）"""
+        index = load_typo_index(os.getenv("TYPO_LEXICON"), os.getenv("TYPO_INDEX"))
+        return cls(index) if index is not None else None
+
+    def _tokens(
+        self, text: str, surfaces: Optional[Sequence[str]]
+    ) -> Iterable[Tuple[int, str]]:
+        """照合対象の語と位置"""
+        if surfaces is None:
+            for match in _TOKEN_PATTERN.finditer(text):
+                yield match.start(), match.group()
+            return
+
+        # 形態素の表層形を順に探して位置を求める
+        position = 0
+        for surface in surfaces:
+            start = text.find(surface, position)
+            if start == -1:
+                continue
+            position = start + len(surface)
+            if len(surface) >= MIN_TOKEN_LENGTH and _CANDIDATE_PATTERN.match(surface):
+                yield start, surface
+
+    def check(
+        self, text: str, surfaces: Optional[Sequence[str]] = None
+    ) -> List[CorrectionResult]:
+        """誤字候補をチェック
+
+        surfaces は形態素解析の表層形（なければカタカナ語・英字の並びを使う）。
+        """
+        corrections = []
+        cache: Dict[str, List[Tuple[str, int, int]]] = {}
+
+        for start, token in self._tokens(text, surfaces):
+            suggestions = cache.get(token)
+            if suggestions is None:
+                limit = 1 if len(token) <= SHORT_TOKEN_LENGTH else None
+                suggestions = self.index.lookup(token, limit)
+                cache[token] = suggestions
+            if not suggestions or suggestions[0][1] == 0:
+                continue
+
+            word, distance, _ = suggestions[0]
+            corrections.append(
+                CorrectionResult(
+                    original_text=token,
+                    corrected_text=word,
+                    start_pos=start,
+                    end_pos=start + len(token),
+                    rule_name="誤字候補",
+                    category="spelling",
+                    description=f"「{word}」の誤記の可能性",
+                    confidence=0.8 if distance == 1 else 0.6,
+                )
+            )
+
+        return corrections
@@ -0,0 +1,286 @@
+"""
+/check の負荷試験
+
+asyncio で同時接続数を段階的に変えながら /check にリクエストを送り、
+スループット・レイテンシのパーセンタイル・エラー率を JSON で出力する。
+スループットとレイテンシは成功（200）したリクエストだけで求める（goodput）。
+サーバーが負荷を断る（429・503）と速く返るので、断られたリクエストを含めると
+過負荷のときほど速く見えてしまう。断られた件数はエラーとは分けて数える。同時接続ごとに
+X-Client-Id を付けて送るので、サーバー側で SCHEDULER_TRUSTED_PROXIES に
+送信元を入れておくと接続ごとに別のクライアントとして制限される
+（--start-server で起動したサーバーでは 127.0.0.1 を信頼する）。
+出力はキーの順序と桁数を固定しているので、コミット間で diff を取れる。
+
+    python -m app.cli loadtest --url http://127.0.0.1:8000 --concurrency 1,4,16
+    python -m app.cli loadtest --start-server --server-workers 4 -o report.json
+"""
+
+import asyncio
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+CHECK_PATH = "/api/v1/proofreading/check"
+CLIENT_HEADER = "X-Client-Id"
+# サーバーが負荷を理由に断ったレスポンス（流量制限・待ち行列の溢れ）
+REJECTED_STATUSES = (429, 503)
+
+# 種類ごとの目標サイズ（UTF-8 のバイト数）
+TRAFFIC_SIZES = {
+    "chat": 60,
+    "article": 5 * 1024,
+    "manuscript": 1024 * 1024,
+}
+
+DEFAULT_MIX = {"chat": 0.8, "article": 0.19, "manuscript": 0.01}
+
+# 校正対象になる表現を含む文と、含まない文
+SAMPLE_SENTENCES = [
+    "このケーキは食べれる。",
+    "頭痛が痛いので今日は休みます。",
+    "私はは学校は行く。",
+    "すいません、資料を送らせて頂きます。",
+    "結果は（成功）でした。",
+    "明日の会議は十時から始まります。",
+    "これは例文である。",
+    "新しい機能についての説明です。",
+]
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """トラフィック構成（例: chat=0.8,article=0.2）を解析"""
+    mix: Dict[str, float] = {}
+    for item in value.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in TRAFFIC_SIZES:
+            raise ValueError(f"unknown traffic kind: {kind}")
+        mix[kind] = float(weight) if weight else 1.0
+    return mix
+
+
+def build_text(kind: str, rng: random.Random) -> str:
+    """指定の種類のサイズになるまで例文を並べる"""
+    target = TRAFFIC_SIZES[kind]
+    sentences: List[str] = []
+    size = 0
+    while size < target:
+        sentence = rng.choice(SAMPLE_SENTENCES)
+        sentences.append(sentence)
+        size += len(sentence.encode("utf-8"))
+        if kind != "chat" and len(sentences) % 8 == 0:
+            sentences.append("\n")
+    return "".join(sentences)
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """最近順位法によるパーセンタイル"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class LevelResult:
+    """同時接続数ごとの計測結果"""
+
+    concurrency: int
+    requests: int
+    errors: int
+    # 流量制限・負荷制限（429 / 503）で断られた件数（errors には含めない）
+    rejected: int
+    duration_s: float
+    # 成功したリクエストの毎秒件数（レイテンシも成功したものだけ）
+    throughput_rps: float
+    error_rate: float
+    rejection_rate: float
+    latency_p50_ms: float
+    latency_p95_ms: float
+    latency_p99_ms: float
+    latency_max_ms: float
+
+
+class LoadGenerator:
+    """/check への負荷生成"""
+
+    def __init__(
+        self,
+        base_url: str,
+        mix: Optional[Dict[str, float]] = None,
+        seed: int = 0,
+        variants: int = 4,
+        timeout: float = 120.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.mix = mix or DEFAULT_MIX
+        self.seed = seed
+        self.timeout = timeout
+        self.transport = transport
+
+        # 本文は事前に生成しておき、計測中の生成コストを除く
+        rng = random.Random(seed)
+        self.texts = {
+            kind: [build_text(kind, rng) for _ in range(variants)] for kind in self.mix
+        }
+
+    async def run_level(
+        self, concurrency: int, requests: int, rng: random.Random
+    ) -> LevelResult:
+        """同時接続数を固定して指定件数のリクエストを送信"""
+        kinds = list(self.mix)
+        weights = [self.mix[k] for k in kinds]
+        schedule = rng.choices(kinds, weights, k=requests)
+        bodies = [rng.choice(self.texts[kind]) for kind in schedule]
+
+        latencies: List[float] = []
+        errors = 0
+        rejected = 0
+        next_index = 0
+
+        async with httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            transport=self.transport,
+            limits=httpx.Limits(max_connections=concurrency),
+        ) as client:
+
+            async def worker(index: int) -> None:
+                nonlocal next_index, errors, rejected
+                # 同時接続ごとに別のクライアントとして流量制限を受ける
+                headers = {CLIENT_HEADER: f"loadtest-{index}"}
+                while next_index < len(bodies):
+                    text = bodies[next_index]
+                    next_index += 1
+                    started = time.perf_counter()
+                    try:
+                        response = await client.post(
+                            CHECK_PATH, json={"text": text}, headers=headers
+                        )
+                        status = response.status_code
+                    except httpx.HTTPError:
+                        status = 0
+                    if status == 200:
+                        latencies.append(time.perf_counter() - started)
+                    elif status in REJECTED_STATUSES:
+                        rejected += 1
+                    else:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(i) for i in range(concurrency)))
+            duration = time.perf_counter() - started
+
+        latencies.sort()
+        return LevelResult(
+            concurrency=concurrency,
+            requests=requests,
+            errors=errors,
+            rejected=rejected,
+            duration_s=round(duration, 3),
+            throughput_rps=round(len(latencies) / duration, 2) if duration else 0.0,
+            error_rate=round(errors / requests, 4) if requests else 0.0,
+            rejection_rate=round(rejected / requests, 4) if requests else 0.0,
+            latency_p50_ms=round(percentile(latencies, 0.50) * 1000, 2),
+            latency_p95_ms=round(percentile(latencies, 0.95) * 1000, 2),
+            latency_p99_ms=round(percentile(latencies, 0.99) * 1000, 2),
+            latency_max_ms=round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        )
+
+    async def sweep(
+        self, levels: Sequence[int], requests_per_level: int
+    ) -> Dict[str, Any]:
+        """同時接続数を段階的に変えて計測"""
+        rng = random.Random(self.seed)
+        results = []
+        for concurrency in levels:
+            result = await self.run_level(concurrency, requests_per_level, rng)
+            results.append(asdict(result))
+
+        return {
+            "target": self.base_url + CHECK_PATH,
+            "mix": self.mix,
+            "seed": self.seed,
+            "requests_per_level": requests_per_level,
+            "levels": results,
+        }
+
+
+def compare_reports(
+    baseline: Dict[str, Any], current: Dict[str, Any], max_regression: float
+) -> List[str]:
+    """基準レポートと比較し、許容幅を超えた悪化を列挙"""
+    regressions = []
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in current["levels"]:
+        base = baseline_levels.get(level["concurrency"])
+        if base is None:
+            continue
+        for key in ("latency_p95_ms", "latency_p99_ms"):
+            if base[key] and level[key] > base[key] * (1 + max_regression):
+                regressions.append(
+                    f"concurrency {level['concurrency']}: {key} "
+                    f"{base[key]} -> {level[key]}"
+                )
+        if level["throughput_rps"] < base["throughput_rps"] * (1 - max_regression):
+            regressions.append(
+                f"concurrency {level['concurrency']}: throughput_rps "
+                f"{base['throughput_rps']} -> {level['throughput_rps']}"
+            )
+        for key in ("error_rate", "rejection_rate"):
+            if level.get(key, 0.0) > base.get(key, 0.0):
+                regressions.append(
+                    f"concurrency {level['concurrency']}: {key} "
+                    f"{base.get(key, 0.0)} -> {level.get(key, 0.0)}"
+                )
+    return regressions
+
+
+@contextmanager
+def local_server(
+    port: int, workers: int = 1, ready_timeout: float = 60.0
+) -> Iterator[str]:
+    """uvicorn をサブプロセスで起動し、readiness を待ってから URL を返す"""
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        env={"SCHEDULER_TRUSTED_PROXIES": "127.0.0.1", **os.environ},
+    )
+    try:
+        deadline = time.monotonic() + ready_timeout
+        while True:
+            try:
+                if httpx.get(base_url + "/health/ready").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("uvicorn did not become ready")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
@@ -10,6 +10,7 @@ os.environ["ENVIRONMENT"] = "testing"
 
 from app.main import app
 from app.core.database import get_db, Base
+from app.services.rule_engine import RuleEngine
 
 
 # Create test database
@@ -39,10 +40,18 @@ def client():
     """Create test client"""
     Base.metadata.create_all(bind=engine)
     with TestClient(app) as test_client:
+        # ヘルスチェックは準備完了を待たないので、ここでウォームアップ完了を待つ
+        test_client.portal.call(app.state.engine_state.wait_ready)
         yield test_client
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(scope="module", name="engine")
+def rule_engine():
+    """Shared rule engine for service-level tests"""
+    return RuleEngine()
+
+
 @pytest.fixture(scope="function")
 def db_session():
     """Create database session for each test"""
@@ -0,0 +1,121 @@
+import json
+
+import pytest
+
+from app.cli import main
+from app.services import bulk_proofreader
+from app.services.bulk_proofreader import BulkProofreader, iter_documents
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """テスト用コーパス"""
+    corpus_dir = tmp_path / "corpus"
+    corpus_dir.mkdir()
+    (corpus_dir / "a.txt").write_text("このケーキは食べれる", encoding="utf-8")
+    (corpus_dir / "b.txt").write_text("頭痛が痛いです", encoding="utf-8")
+    with open(corpus_dir / "c.jsonl", "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "doc-1", "text": "すいません"}, ensure_ascii=False) + "\n")
+        f.write("\n")
+        f.write(json.dumps({"text": "正しい文章です。"}, ensure_ascii=False) + "\n")
+    return corpus_dir
+
+
+def _read_output(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_iter_documents(corpus):
+    """入力文書の列挙テスト"""
+    documents = list(iter_documents([str(corpus)]))
+    ids = [d[0] for d in documents]
+
+    assert len(documents) == 4
+    assert "doc-1" in ids
+    assert any(i.endswith("c.jsonl:3") for i in ids)
+
+
+def test_mmap_large_file(tmp_path, monkeypatch):
+    """大きなファイルの mmap 読み込みテスト"""
+    monkeypatch.setattr(bulk_proofreader, "MMAP_THRESHOLD", 1)
+    path = tmp_path / "large.txt"
+    path.write_text("食べれる" * 100, encoding="utf-8")
+
+    assert bulk_proofreader.read_text_file(path) == "食べれる" * 100
+
+
+def test_bulk_proofread_inline(corpus, tmp_path):
+    """単一プロセスでの一括校正テスト"""
+    output = tmp_path / "out.jsonl"
+    proofreader = BulkProofreader(str(output), workers=0, apply_corrections=True)
+    stats = proofreader.run([str(corpus)])
+
+    results = _read_output(output)
+    assert stats.documents == 4
+    assert stats.corrections > 0
+    assert len(results) == 4
+    assert "食べられる" in results[0]["corrected_text"]
+
+
+def test_invalid_jsonl_lines_reported_per_document(tmp_path):
+    """本文のない行・壊れた JSON の行は文書ごとのエラーとして書き出すテスト"""
+    path = tmp_path / "corpus.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "no-text", "title": "本文なし"}) + "\n")
+        f.write('{"id": "broken", "text": \n')
+        f.write(json.dumps({"id": "ok", "text": "すいません"}, ensure_ascii=False) + "\n")
+
+    output = tmp_path / "out.jsonl"
+    stats = BulkProofreader(str(output), workers=0).run([str(path)])
+
+    results = _read_output(output)
+    assert [r["id"] for r in results] == ["no-text", f"{path}:2", "ok"]
+    assert results[0]["error"] == "missing text"
+    assert results[1]["error"].startswith("invalid JSON")
+    assert results[2]["corrections"]
+    assert stats.documents == 3
+    assert stats.errors == 2
+
+
+def test_bulk_proofread_process_pool(corpus, tmp_path):
+    """プロセスプールでの一括校正テスト（入力順・完了順）"""
+    ordered_output = tmp_path / "ordered.jsonl"
+    BulkProofreader(str(ordered_output), workers=2).run([str(corpus)])
+
+    unordered_output = tmp_path / "unordered.jsonl"
+    BulkProofreader(str(unordered_output), workers=2, ordered=False).run([str(corpus)])
+
+    ordered = _read_output(ordered_output)
+    unordered = _read_output(unordered_output)
+    assert [r["id"] for r in ordered] == [d[0] for d in iter_documents([str(corpus)])]
+    assert sorted(r["id"] for r in unordered) == sorted(r["id"] for r in ordered)
+
+
+def test_bulk_proofread_resume(corpus, tmp_path):
+    """チェックポイントからの再開テスト"""
+    output = tmp_path / "out.jsonl"
+    proofreader = BulkProofreader(str(output), workers=0, checkpoint_interval=1)
+    proofreader.run([str(corpus / "a.txt"), str(corpus / "b.txt")])
+
+    # クラッシュで書きかけの行が残った状態を再現
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"id": "broken')
+
+    stats = proofreader.run([str(corpus)], resume=True)
+    results = _read_output(output)
+
+    assert stats.skipped == 2
+    assert stats.documents == 2
+    assert len(results) == 4
+    assert len({r["id"] for r in results}) == 4
+
+
+def test_cli_proofread(corpus, tmp_path, capsys):
+    """CLI エントリポイントテスト"""
+    output = tmp_path / "out.jsonl"
+    exit_code = main(["proofread", str(corpus), "-o", str(output), "--workers", "0"])
+
+    assert exit_code == 0
+    assert len(_read_output(output)) == 4
+    assert "throughput" in capsys.readouterr().err
@@ -0,0 +1,104 @@
+from app.services.corrections import (
+    CorrectionMetaTable,
+    CorrectionResult,
+    CorrectionStore,
+    OverlayMetaTable,
+    resolve_overlaps,
+)
+from app.services.rule_engine import RuleEngine
+
+
+def test_meta_table_interning():
+    """メタデータの共有テスト"""
+    table = CorrectionMetaTable()
+    first = table.intern("ら抜き言葉修正", "grammar", "ら抜き言葉", "食べられる")
+    second = table.intern("ら抜き言葉修正", "grammar", "ら抜き言葉", "食べられる")
+    other = table.intern("ら抜き言葉修正", "grammar", "ら抜き言葉", "見られる")
+
+    assert first == second
+    assert first != other
+    assert len(table) == 2
+
+
+def test_store_lazy_view():
+    """CorrectionResult への遅延変換テスト"""
+    text = "このケーキは食べれる"
+    store = CorrectionStore(text)
+    meta_id = store.meta.intern("ら抜き言葉修正", "grammar", "ら抜き言葉", "食べられる")
+    store.add(6, 10, meta_id)
+
+    assert len(store) == 1
+    correction = store[0]
+    assert isinstance(correction, CorrectionResult)
+    assert correction.original_text == "食べれる"
+    assert correction.corrected_text == "食べられる"
+    assert list(store.records())[0]["start_pos"] == 6
+
+
+def test_store_sort_and_filter():
+    """並べ替えと絞り込みテスト"""
+    text = "すいません、食べれる"
+    store = CorrectionStore(text)
+    store.add_result(
+        CorrectionResult("食べれる", "食べられる", 6, 10, "ら抜き言葉修正", "grammar", "ら抜き言葉")
+    )
+    store.add_result(
+        CorrectionResult("すいません", "すみません", 0, 5, "敬語修正", "politeness", "謝罪", 0.8)
+    )
+
+    ordered = store.sorted()
+    assert [c.start_pos for c in ordered] == [0, 6]
+
+    assert len(store.filter(categories={"grammar"})) == 1
+    assert len(store.filter(min_confidence=0.9)) == 1
+    assert len(store.filter(rule_names={"敬語修正"})) == 1
+
+
+def test_resolve_overlaps():
+    """重なる修正の選択テスト"""
+    # (0, 3) と (1, 3) は重なるので長い方を採用
+    assert resolve_overlaps([1, 0, 5], [3, 3, 7]) == [1, 2]
+
+
+def test_compact_matches_check_text():
+    """列指向の結果が従来の結果と一致するテスト"""
+    engine = RuleEngine()
+    text = "私はは学校は行って、本をを読みます。食べれるケーキで頭痛が痛い（笑）"
+
+    compact = engine.check_text_compact(text)
+    corrections = engine.check_text(text)
+
+    assert list(compact) == corrections
+    assert compact.apply() == engine.apply_corrections(text, corrections)
+    assert engine.apply_corrections(text, compact) == compact.apply()
+
+
+def test_nested_overlay_meta_table():
+    """差分テーブルに重ねた差分テーブルのテスト"""
+    base = CorrectionMetaTable()
+    shared = base.intern("敬語修正", "grammar", "謙譲語", "させていただく")
+    tenant = OverlayMetaTable(base)
+    tenant_id = tenant.intern("製品名表記", "formatting", "製品名", "Proof")
+    request = OverlayMetaTable(tenant)
+    request_id = request.intern("表記統一", "formatting", "空白", " word ")
+
+    assert request.intern("敬語修正", "grammar", "謙譲語", "させていただく") == shared
+    assert request.intern("製品名表記", "formatting", "製品名", "Proof") == tenant_id
+    assert request[tenant_id][3] == "Proof"
+    assert request[request_id][3] == " word "
+    assert len(tenant) == 1
+    assert len(base) == 1
+
+
+def test_shared_meta_table_stays_flat():
+    """入力によって変わる結果のメタデータを共有テーブルに溜めないテスト"""
+    engine = RuleEngine()
+    engine.check_text_compact("これは apple です。")
+    size = len(engine.correction_meta)
+
+    for i in range(50):
+        text = f"これは apple です。これは banana です。これはword{i}です。"
+        store = engine.check_text_compact(text)
+        assert f" word{i} " in {c.corrected_text for c in store}
+
+    assert len(engine.correction_meta) == size
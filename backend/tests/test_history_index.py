@@ -0,0 +1,106 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models import ProofreadingHistory
+from app.services.history_index import (
+    backfill_index,
+    candidate_ids,
+    preview_rule,
+    record_history,
+    required_trigrams,
+)
+from app.services.rule_engine import Rule, RulePattern
+
+DOCUMENTS = [
+    "私はは学校に行く。",
+    "今日は晴れです。",
+    "ｻｰﾊﾞｰを再起動した。",
+    "明日は雨です。私はは家にいる。",
+]
+
+
+@pytest.fixture
+def history(db_session):
+    for text in DOCUMENTS:
+        record_history(db_session, text, None, [], 1)
+    return db_session
+
+
+def _rule(*patterns):
+    return Rule(name="テスト", category="grammar", priority=1, patterns=list(patterns))
+
+
+def test_required_trigrams():
+    """パターンが必ず含む3-gram の取り出しテスト"""
+    literal = RulePattern("私はは", "私は", "")
+    assert required_trigrams(literal) == {"私はは"}
+    assert required_trigrams(RulePattern("はは", "は", "")) is None
+
+    regex = RulePattern("(?<=時間)を(?=過ごす)", "に", "", type="regex")
+    assert required_trigrams(regex) == {"過ごす"}
+    regex = RulePattern("させて(いただ|頂)きます", "", "", type="regex")
+    assert required_trigrams(regex) == {"させて", "きます"}
+    assert required_trigrams(RulePattern("(?i)server", "", "", type="regex")) is None
+
+
+def test_preview_narrows_candidates(history, engine):
+    """3-gram 索引で候補を絞り込み、全件を調べた場合と同じ結果になるテスト"""
+    rule = _rule(RulePattern("私はは", "私は", "重複"))
+    assert len(candidate_ids(history, rule)) == 2
+
+    preview = preview_rule(history, engine, rule, sample_limit=1)
+    assert preview.narrowed
+    assert preview.total_documents == 4
+    assert preview.candidate_documents == 2
+    assert preview.matched_documents == 2
+    assert preview.hit_count == 2
+    assert len(preview.samples) == 1
+    sample = preview.samples[0]
+    assert sample["before"].replace("私はは", "私は") == sample["after"]
+
+    # 短いパターンは絞り込めないので全件を調べる
+    full = preview_rule(history, engine, _rule(RulePattern("はは", "は", "重複")))
+    assert not full.narrowed
+    assert full.candidate_documents == 4
+    assert full.hit_count == preview.hit_count
+
+
+def test_preview_matches_normalized_text(history, engine):
+    """半角カナの本文にも正規化後の表記のルールが一致するテスト"""
+    rule = _rule(RulePattern("サーバーを再起動", "サーバーを再起動", "表記"))
+    preview = preview_rule(history, engine, rule)
+    assert preview.narrowed
+    assert preview.matched_documents == 1
+    sample = preview.samples[0]
+    assert DOCUMENTS[2][sample["start_pos"] : sample["end_pos"]] == "ｻｰﾊﾞｰを再起動"
+
+
+def test_backfill_index(db_session, engine):
+    """索引を入れる前の履歴を後から索引に追加するテスト"""
+    db_session.add(ProofreadingHistory(original_text="本をを読む。"))
+    db_session.commit()
+    rule = _rule(RulePattern("本をを", "本を", "重複"))
+    assert candidate_ids(db_session, rule) == set()
+
+    assert backfill_index(db_session) == 1
+    assert backfill_index(db_session) == 0
+    assert preview_rule(db_session, engine, rule).matched_documents == 1
+
+
+def test_check_recording_without_preview_api(client, db_session, monkeypatch):
+    """/check の結果が履歴に記録され、プレビューは API として公開しないテスト"""
+    monkeypatch.setattr("app.api.proofreading.HISTORY_RECORDING", True)
+    # 履歴はレスポンスのあとに専用のセッションで書き込む
+    monkeypatch.setattr(
+        "app.api.proofreading.SessionLocal", sessionmaker(bind=db_session.get_bind())
+    )
+    response = client.post("/api/v1/proofreading/check", json={"text": "本をを読みます。"})
+    assert response.status_code == 200
+    assert db_session.query(ProofreadingHistory).count() == 1
+
+    # 任意の正規表現を全利用者の履歴に当てて抜粋を返すので CLI だけで使う
+    response = client.post(
+        "/api/v1/proofreading/rules/preview",
+        json={"patterns": [{"pattern": "本をを", "replacement": "本を"}]},
+    )
+    assert response.status_code in (404, 405)
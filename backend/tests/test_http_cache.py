@@ -0,0 +1,101 @@
+from app.core.compression import (
+    choose_encoding,
+    encoded_etag,
+    parse_accept_encoding,
+    strip_encoding_suffix,
+)
+
+CHECK_URL = "/api/v1/proofreading/check"
+RULES_URL = "/api/v1/proofreading/rules"
+
+
+def test_check_etag_and_not_modified(client):
+    """同じリクエストの再送に 304 を返し、本文が変われば ETag も変わるテスト"""
+    body = {"text": "私はは学校に行く。", "apply_corrections": True}
+    response = client.post(CHECK_URL, json=body)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    cached = client.post(CHECK_URL, json=body, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    # オプションが違えば別の結果
+    other = client.post(
+        CHECK_URL,
+        json={**body, "apply_corrections": False},
+        headers={"If-None-Match": etag},
+    )
+    assert other.status_code == 200
+    assert other.headers["etag"] != etag
+
+    changed = client.post(
+        CHECK_URL,
+        json={**body, "text": "本をを読む。"},
+        headers={"If-None-Match": f'W/{etag}, "other"'},
+    )
+    assert changed.status_code == 200
+
+
+def test_rules_versioned_caching(client):
+    """ルール一覧の ETag とバージョン付き URL の長期キャッシュのテスト"""
+    response = client.get(RULES_URL)
+    assert response.status_code == 200
+    version = response.headers["x-ruleset-version"]
+    assert response.headers["etag"] == f'"{version}"'
+    assert "must-revalidate" in response.headers["cache-control"]
+
+    cached = client.get(RULES_URL, headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+    pinned = client.get(RULES_URL, params={"version": version})
+    assert "immutable" in pinned.headers["cache-control"]
+    assert pinned.json() == response.json()
+
+
+def test_response_compression(client):
+    """大きなレスポンスだけを Accept-Encoding に応じて圧縮するテスト"""
+    body = {"text": "これは例文である。私はは学校は行く。\n" * 100}
+    response = client.post(CHECK_URL, json=body, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content) / 4
+    assert response.json()["corrections"]
+
+    raw = client.post(CHECK_URL, json=body, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert raw.json() == response.json()
+
+    small = client.get("/health/live", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+
+def test_compressed_etag(client):
+    """圧縮した表現の ETag に接尾辞を付け、再検証では接尾辞付きでも一致するテスト"""
+    body = {"text": "これは例文である。私はは学校は行く。\n" * 100}
+    raw = client.post(CHECK_URL, json=body, headers={"Accept-Encoding": "identity"})
+    response = client.post(CHECK_URL, json=body, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == encoded_etag(raw.headers["etag"], "gzip")
+    assert response.headers["etag"] != raw.headers["etag"]
+
+    cached = client.post(
+        CHECK_URL,
+        json=body,
+        headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]},
+    )
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == response.headers["etag"]
+
+    assert strip_encoding_suffix('"abc-br"') == '"abc"'
+    assert strip_encoding_suffix('"abc"') == '"abc"'
+
+
+def test_choose_encoding():
+    """Accept-Encoding の q 値の解釈テスト"""
+    assert parse_accept_encoding("gzip;q=0.5, br") == {"gzip": 0.5, "br": 1.0}
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("*") in ("br", "gzip")
+    assert choose_encoding("") is None
@@ -0,0 +1,251 @@
+import time
+
+import pytest
+
+from app.services.jobs import (
+    InMemoryBroker,
+    JobStatus,
+    JobTooLarge,
+    JobWorker,
+    QueueFull,
+    create_broker,
+)
+from app.services.tenants import TenantRegistry
+
+DOCUMENT = "これは例文である。私はは学校は行く。\n" * 40 + "すいません、資料を送らせて頂きます。本をを読みます。\n" * 40
+
+
+TENANT_RULES = """
+disable:
+  - "重複助詞修正"
+rules:
+  product_names:
+    name: "製品名表記"
+    category: "formatting"
+    priority: 1
+    patterns:
+      - pattern: "ぷるーふ"
+        replacement: "Proof"
+        description: "製品名の表記"
+"""
+
+
+def _record_key(record):
+    return record["start_pos"], record["end_pos"], record["rule_name"]
+
+
+def test_worker_matches_direct_check(engine):
+    """断片ごとに処理したジョブの結果が一括チェックと一致するテスト"""
+    broker = InMemoryBroker()
+    job = broker.submit(DOCUMENT, apply_corrections=True)
+    assert broker.dequeue(0) == job.job_id
+
+    worker = JobWorker(broker, engine, chunk_chars=300)
+    finished = worker.run_job(job.job_id)
+
+    expected = engine.check_text_compact(DOCUMENT)
+    records = broker.corrections(job.job_id)
+    assert sorted(records, key=_record_key) == sorted(
+        expected.records(), key=_record_key
+    )
+    assert finished.status == JobStatus.COMPLETED
+    assert finished.progress == 1.0
+    assert finished.correction_count == len(records)
+    assert finished.corrected_text == expected.apply()
+    # 完了したジョブの本文は保持しない
+    assert broker.text(job.job_id) is None
+
+
+def test_worker_normalizes_and_uses_tenant_overlay(engine, tmp_path):
+    """ジョブも /check と同じく正規化して照合し、テナントの差分を重ねるテスト"""
+    (tmp_path / "acme.yml").write_text(TENANT_RULES, encoding="utf-8")
+    tenants = TenantRegistry(engine, str(tmp_path))
+    text = "ぷるーふのｹｰｷは食べ\u200bれる。本をを読む。\n" * 30
+
+    broker = InMemoryBroker()
+    job = broker.submit(text, apply_corrections=True, tenant_id="acme")
+    worker = JobWorker(broker, engine, chunk_chars=200, tenants=tenants)
+    finished = worker.run_job(job.job_id)
+
+    expected = tenants.check_text_compact("acme", text)
+    records = broker.corrections(job.job_id)
+    assert sorted(records, key=_record_key) == sorted(
+        expected.records(), key=_record_key
+    )
+    rules = {record["rule_name"] for record in records}
+    assert {"製品名表記", "ら抜き言葉修正", "半角カナ修正"} <= rules
+    assert "重複助詞修正" not in rules
+    assert finished.corrected_text == expected.apply()
+
+
+def test_stale_job_requeued(engine):
+    """ワーカーが落ちたジョブを待ち行列に戻してやり直すテスト"""
+    broker = InMemoryBroker()
+    job = broker.submit(DOCUMENT)
+    assert broker.dequeue(0) == job.job_id
+    assert broker.processing() == [job.job_id]
+
+    # 処理の途中で落ちたワーカー
+    crashed = broker.get(job.job_id)
+    crashed.status = JobStatus.RUNNING
+    crashed.attempts = 1
+    broker.update(crashed)
+    broker.append_corrections(job.job_id, [{"start_pos": 0}])
+
+    assert broker.requeue_stale(timeout=60) == 0
+    assert broker.requeue_stale(timeout=0) == 1
+    assert broker.get(job.job_id).status == JobStatus.QUEUED
+    assert broker.dequeue(0) == job.job_id
+
+    finished = JobWorker(broker, engine).run_job(job.job_id)
+    assert broker.ack(job.job_id)
+    assert finished.status == JobStatus.COMPLETED
+    assert finished.attempts == 2
+    records = broker.corrections(job.job_id)
+    assert sorted(records, key=_record_key) == sorted(
+        engine.check_text_compact(DOCUMENT).records(), key=_record_key
+    )
+
+    # 試す回数を超えたジョブは失敗にする
+    job = broker.submit(DOCUMENT)
+    broker.dequeue(0)
+    given_up = broker.get(job.job_id)
+    given_up.attempts = 3
+    broker.update(given_up)
+    assert broker.requeue_stale(timeout=0, max_attempts=3) == 0
+    assert broker.get(job.job_id).status == JobStatus.FAILED
+    assert broker.processing() == []
+
+
+class TakenOverWorker(JobWorker):
+    """処理の途中で止まったとみなされ、別のワーカーにやり直されるワーカー"""
+
+    def __init__(self, broker, engine, other, **kwargs):
+        super().__init__(broker, engine, **kwargs)
+        self.other = other
+        self.taken_over = None
+
+    def _collect(self, job, store, offset, edits):
+        if self.taken_over is None:
+            assert self.broker.requeue_stale(timeout=0) == 1
+            assert self.broker.dequeue(0) == job.job_id
+            self.taken_over = self.other.run_job(job.job_id)
+        super()._collect(job, store, offset, edits)
+
+
+def test_slow_worker_does_not_write_after_takeover(engine):
+    """止まったとみなされたワーカーがやり直し中のジョブに書き込まないテスト"""
+    broker = InMemoryBroker()
+    job = broker.submit(DOCUMENT, apply_corrections=True)
+    assert broker.dequeue(0) == job.job_id
+
+    other = JobWorker(broker, engine, chunk_chars=300)
+    slow = TakenOverWorker(broker, engine, other, chunk_chars=300)
+    assert slow.run_job(job.job_id) is None
+
+    finished = slow.taken_over
+    assert finished.status == JobStatus.COMPLETED
+    assert finished.attempts == 2
+    assert broker.get(job.job_id).attempts == 2
+    expected = engine.check_text_compact(DOCUMENT)
+    records = broker.corrections(job.job_id)
+    assert sorted(records, key=_record_key) == sorted(
+        expected.records(), key=_record_key
+    )
+    assert broker.get(job.job_id).corrected_text == expected.apply()
+
+    # 遅れたワーカーは担当中のワーカーの処理中の記録を外せない
+    assert not broker.ack(job.job_id, 1)
+    assert not broker.update(broker.get(job.job_id), attempt=1)
+    assert not broker.append_corrections(job.job_id, [{"start_pos": 0}], 1)
+    assert broker.processing() == [job.job_id]
+    assert broker.ack(job.job_id, 2)
+
+
+def test_heartbeat_keeps_slow_job(engine, monkeypatch):
+    """文書全体のチェックが長くかかっても生存の知らせで待ち行列に戻さないテスト"""
+    broker = InMemoryBroker()
+    job = broker.submit("本をを読む。")
+    assert broker.dequeue(0) == job.job_id
+    worker = JobWorker(broker, engine, visibility_timeout=0.2)
+    requeued = []
+    check_document = worker._check_document
+
+    def slow_check_document(*args):
+        time.sleep(0.4)
+        requeued.append(broker.requeue_stale(timeout=0.2))
+        return check_document(*args)
+
+    monkeypatch.setattr(worker, "_check_document", slow_check_document)
+    finished = worker.run_job(job.job_id)
+
+    assert requeued == [0]
+    assert finished.status == JobStatus.COMPLETED
+    assert finished.attempts == 1
+
+
+def test_result_size_limit(engine):
+    """修正件数の上限で結果が打ち切られるテスト"""
+    broker = InMemoryBroker()
+    job = broker.submit(DOCUMENT)
+    finished = JobWorker(broker, engine, max_corrections=10).run_job(job.job_id)
+
+    assert finished.truncated
+    assert finished.correction_count == 10
+    assert len(broker.corrections(job.job_id)) == 10
+    assert len(broker.corrections(job.job_id, offset=8, limit=5)) == 2
+
+
+def test_broker_limits_and_ttl():
+    """本文の大きさ・待ち行列の長さの制限と期限切れのテスト"""
+    broker = InMemoryBroker(ttl=60, max_queue=1)
+    broker.max_text_chars = 10
+    with pytest.raises(JobTooLarge):
+        broker.submit("あ" * 11)
+
+    job = broker.submit("本をを読む")
+    with pytest.raises(QueueFull):
+        broker.submit("本をを読む")
+
+    assert broker.get(job.job_id).status == JobStatus.QUEUED
+    broker.ttl = -1
+    broker.update(broker.get(job.job_id))
+    assert broker.get(job.job_id) is None
+    assert broker.get("missing") is None
+
+
+def test_create_broker():
+    """URL に応じたブローカーの作成テスト"""
+    assert isinstance(create_broker("memory://"), InMemoryBroker)
+    with pytest.raises(ValueError):
+        create_broker("amqp://localhost")
+
+
+def test_jobs_api(client):
+    """POST /jobs で登録し、GET /jobs/{id} で結果を取得するテスト"""
+    response = client.post(
+        "/api/v1/proofreading/jobs",
+        json={"text": DOCUMENT, "apply_corrections": True},
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    for _ in range(200):
+        status = client.get(f"/api/v1/proofreading/jobs/{job_id}").json()
+        if status["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+
+    assert status["status"] == "completed"
+    assert status["progress"] == 1.0
+    assert status["correction_count"] == len(status["corrections"]) > 0
+    assert status["next_offset"] == status["correction_count"]
+    assert "はは" not in status["corrected_text"]
+
+    page = client.get(
+        f"/api/v1/proofreading/jobs/{job_id}", params={"offset": 5, "limit": 3}
+    ).json()
+    assert page["corrections"] == status["corrections"][5:8]
+    assert page["next_offset"] == 8
+
+    assert client.get("/api/v1/proofreading/jobs/unknown").status_code == 404
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import live_checker
+from app.services.live_checker import LiveCheckSession
+from app.services.rule_engine import CheckCancelled, RuleEngine
+
+
+class SlowEngine(RuleEngine):
+    """中断されるまで終わらないチェックを持つルールエンジン"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.cancelled = 0
+
+    def check_text_compact(self, text, cancel_event=None):
+        if text == "slow":
+            self.started.set()
+            if cancel_event.wait(5):
+                self.cancelled += 1
+                raise CheckCancelled()
+        return super().check_text_compact(text, cancel_event)
+
+
+def test_check_text_compact_cancel():
+    """中断フラグでチェックが中断されるテスト"""
+    engine = RuleEngine()
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    with pytest.raises(CheckCancelled):
+        engine.check_text_compact("食べれる", cancel_event)
+
+
+def test_debounce_sends_latest_revision_only():
+    """連続入力では最新リビジョンの結果だけを返すテスト"""
+
+    async def scenario():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        session = LiveCheckSession(RuleEngine(), send, debounce_ms=20)
+        for revision, text in enumerate(["食", "食べ", "食べれ", "食べれる"]):
+            session.submit(revision, text)
+        await asyncio.sleep(0.2)
+        await session.close()
+        return session, sent
+
+    session, sent = asyncio.run(scenario())
+
+    assert [m["revision"] for m in sent] == [3]
+    assert sent[0]["corrections"][0]["corrected_text"] == "食べられる"
+    assert session.stats["checked"] == 1
+    assert session.stats["cancelled"] == 3
+
+
+def test_running_check_is_cancelled():
+    """実行中の古いリビジョンのチェックが中断されるテスト"""
+
+    async def scenario():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        engine = SlowEngine()
+        session = LiveCheckSession(engine, send, debounce_ms=0)
+        session.submit(1, "slow")
+        while not engine.started.is_set():
+            await asyncio.sleep(0.01)
+
+        session.submit(2, "頭痛が痛い")
+        await asyncio.sleep(0.2)
+        await session.close()
+        return engine, sent
+
+    engine, sent = asyncio.run(scenario())
+
+    assert engine.cancelled == 1
+    assert [m["revision"] for m in sent] == [2]
+
+
+def test_stale_revision_ignored():
+    """追い越された古いリビジョンを無視するテスト"""
+
+    async def scenario():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        session = LiveCheckSession(RuleEngine(), send, debounce_ms=0)
+        session.submit(5, "食べれる")
+        session.submit(4, "見れる")
+        await asyncio.sleep(0.2)
+        await session.close()
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert [m["revision"] for m in sent] == [5]
+
+
+class BrokenEngine(RuleEngine):
+    """チェックが想定外の例外で失敗するルールエンジン"""
+
+    def check_text_compact(self, text, cancel_event=None):
+        raise RuntimeError("broken")
+
+
+def test_unexpected_error_reported():
+    """チェックの想定外の失敗をリビジョンのエラーとして返すテスト"""
+
+    async def scenario():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def closed_send(message):
+            raise RuntimeError("connection closed")
+
+        session = LiveCheckSession(BrokenEngine(), send, debounce_ms=0)
+        session.submit(1, "食べれる")
+        await asyncio.sleep(0.2)
+        await session.close()
+
+        # 送信にも失敗する場合はタスクの例外にしない
+        closed = LiveCheckSession(BrokenEngine(), closed_send, debounce_ms=0)
+        closed.submit(1, "食べれる")
+        tasks = list(closed._tasks)
+        await asyncio.sleep(0.2)
+        await closed.close()
+        return session, sent, tasks
+
+    session, sent, tasks = asyncio.run(scenario())
+
+    assert sent == [{"revision": 1, "error": "チェックに失敗しました"}]
+    assert session.stats["failed"] == 1
+    assert session.stats["sent"] == 0
+    assert all(task.exception() is None for task in tasks)
+
+
+def test_live_websocket(client: TestClient, monkeypatch):
+    """WebSocket エンドポイントテスト"""
+    monkeypatch.setattr(live_checker, "DEBOUNCE_MS", 50)
+
+    with client.websocket_connect("/api/v1/proofreading/live") as websocket:
+        websocket.send_json({"revision": 1, "text": "食べれ"})
+        websocket.send_json(
+            {"revision": 2, "text": "食べれるケーキ", "apply_corrections": True}
+        )
+        data = websocket.receive_json()
+
+        assert data["revision"] == 2
+        assert data["corrected_text"] == "食べられるケーキ"
+        assert len(data["corrections"]) > 0
+
+        websocket.send_json({"text": "リビジョンなし"})
+        assert "error" in websocket.receive_json()
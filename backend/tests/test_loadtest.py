@@ -0,0 +1,113 @@
+import asyncio
+import json
+import random
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.loadtest import (
+    CLIENT_HEADER,
+    LoadGenerator,
+    build_text,
+    compare_reports,
+    parse_mix,
+    percentile,
+)
+
+
+def test_parse_mix():
+    """トラフィック構成の解析テスト"""
+    assert parse_mix("chat=0.8,article=0.2") == {"chat": 0.8, "article": 0.2}
+    assert parse_mix("manuscript") == {"manuscript": 1.0}
+
+    with pytest.raises(ValueError):
+        parse_mix("unknown=1")
+
+
+def test_build_text_size():
+    """生成する本文のサイズテスト"""
+    rng = random.Random(0)
+    assert len(build_text("chat", rng).encode("utf-8")) >= 60
+    assert len(build_text("article", rng).encode("utf-8")) >= 5 * 1024
+
+
+def test_percentile():
+    """パーセンタイル計算テスト"""
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 0.50) == 50.0
+    assert percentile(values, 0.95) == 95.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_sweep_report(client: TestClient):
+    """同時接続数スイープのレポートテスト"""
+    # client フィクスチャで lifespan を起動済みのアプリに、同じイベントループから直接送る
+    transport = httpx.ASGITransport(app=app)
+    generator = LoadGenerator(
+        "http://testserver", {"chat": 0.9, "article": 0.1}, transport=transport
+    )
+    report = client.portal.call(generator.sweep, [1, 4], 8)
+
+    assert [level["concurrency"] for level in report["levels"]] == [1, 4]
+    for level in report["levels"]:
+        assert level["requests"] == 8
+        assert level["errors"] == 0
+        assert level["rejected"] == 0
+        assert level["latency_p50_ms"] <= level["latency_p95_ms"]
+        assert level["latency_p95_ms"] <= level["latency_p99_ms"]
+    json.dumps(report)
+
+
+def test_compare_reports():
+    """基準レポートとの比較テスト"""
+    level = {
+        "concurrency": 4,
+        "throughput_rps": 100.0,
+        "error_rate": 0.0,
+        "rejection_rate": 0.0,
+        "latency_p95_ms": 10.0,
+        "latency_p99_ms": 20.0,
+    }
+    baseline = {"levels": [level]}
+
+    assert compare_reports(baseline, {"levels": [dict(level)]}, 0.2) == []
+
+    slower = dict(level, latency_p95_ms=15.0, throughput_rps=50.0)
+    regressions = compare_reports(baseline, {"levels": [slower]}, 0.2)
+    assert len(regressions) == 2
+
+
+def test_rejected_requests_excluded_from_goodput():
+    """断られたリクエストをレイテンシ・スループットに入れず、別に数えるテスト"""
+
+    served = []
+
+    async def handler(request):
+        if request.headers[CLIENT_HEADER] == "loadtest-0":
+            await asyncio.sleep(0)
+            return httpx.Response(429)
+        await asyncio.sleep(0.01)
+        served.append(request)
+        return httpx.Response(200, json={})
+
+    generator = LoadGenerator(
+        "http://testserver", {"chat": 1.0}, transport=httpx.MockTransport(handler)
+    )
+    report = asyncio.run(generator.sweep([2], 20))
+    level = report["levels"][0]
+
+    assert level["rejected"] == 20 - len(served) > 0
+    # スループットは成功したリクエストだけ
+    assert abs(level["throughput_rps"] * level["duration_s"] - len(served)) < 0.5
+    assert level["errors"] == 0
+    # 即座に返る 429 でレイテンシが下がらない
+    assert level["latency_p50_ms"] >= 10.0
+    assert level["rejection_rate"] == level["rejected"] / 20
+
+    regressions = compare_reports(
+        {"levels": [dict(level, rejection_rate=0.0)]}, report, 0.2
+    )
+    assert any("rejection_rate" in regression for regression in regressions)
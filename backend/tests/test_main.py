@@ -1,6 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
 
+from app.core.lifecycle import EngineState
+
 
 def test_health_check(client: TestClient):
     """Test health check endpoint"""
@@ -15,4 +17,43 @@ def test_root_endpoint(client: TestClient):
     assert response.status_code == 200
     data = response.json()
     assert "message" in data
-    assert "version" in data
\ No newline at end of file
+    assert "version" in data
+
+
+def test_liveness_check(client: TestClient):
+    """Test liveness probe"""
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+
+def test_readiness_check(client: TestClient):
+    """Test readiness probe reports warm engine and startup timings"""
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ready"
+    for phase in ("grammar_checker", "load_rules", "warmup", "total"):
+        assert phase in data["startup_timings"]
+
+
+@pytest.mark.parametrize(
+    "url", ["/health/ready", "/api/v1/proofreading/health"]
+)
+def test_health_not_ready(client: TestClient, monkeypatch, url):
+    """Test health checks answer 503 without waiting while the engine starts"""
+    monkeypatch.setattr(client.app.state, "engine_state", EngineState())
+    response = client.get(url)
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+
+    failed = EngineState(error="boom")
+    failed.ready_event.set()
+    monkeypatch.setattr(client.app.state, "engine_state", failed)
+    response = client.get(url)
+    assert response.status_code == 503
+    assert response.json() == {
+        "status": "failed",
+        "error": "boom",
+        "startup_timings": {},
+    }
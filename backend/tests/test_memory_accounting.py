@@ -0,0 +1,175 @@
+import tracemalloc
+
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.api import proofreading
+from app.core.memory import MemoryMiddleware
+from app.services.memory_accounting import (
+    MemoryStats,
+    StageTracker,
+    memory_stage,
+    project_text_bytes,
+)
+
+CHECK_URL = "/api/v1/proofreading/check"
+METRICS_URL = "/api/v1/proofreading/metrics"
+TEXT = "\n".join(["すいません、資料を送らせて頂きます。私はは明日学校でで本をを読みます。"] * 20)
+
+
+@pytest.fixture
+def tracing():
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+def test_stage_tracker_nested_stages(tracing):
+    """入れ子の段階の peak・retained と、同時に1リクエストだけ計測するテスト"""
+    tracker = StageTracker.try_start()
+    assert tracker is not None
+    assert StageTracker.try_start() is None
+
+    kept = []
+    with tracker.activate():
+        with memory_stage("grammar"):
+            with memory_stage("morphology"):
+                temporary = bytearray(400_000)
+                del temporary
+            kept.append(bytearray(100_000))
+    report = tracker.finish()
+
+    morphology = report["stages"]["morphology"]
+    grammar = report["stages"]["grammar"]
+    assert morphology["peak"] >= 400_000
+    assert morphology["retained"] < 50_000
+    assert grammar["peak"] >= morphology["peak"]
+    assert grammar["retained"] >= 100_000
+    assert report["peak"] >= grammar["peak"]
+
+    # 計測を終えると次のリクエストを計測できる
+    tracker = StageTracker.try_start()
+    assert tracker is not None
+    tracker.finish()
+
+
+def test_memory_stage_outside_tracked_context(tracing):
+    """計測を有効にしていないスレッド（コンテキスト）では記録しないテスト"""
+    tracker = StageTracker.try_start()
+    with memory_stage("rules"):
+        bytearray(100_000)
+    assert tracker.finish()["stages"] == {}
+
+
+def test_check_records_stages(client, tracing):
+    """/check の段階ごとの確保量を /metrics で参照するテスト"""
+    before = client.get(METRICS_URL).json()["memory"]["tracked_requests"]
+    response = client.post(CHECK_URL, json={"text": TEXT, "apply_corrections": True})
+    assert response.status_code == 200
+
+    memory = client.get(METRICS_URL).json()["memory"]
+    assert memory["tracked_requests"] == before + 1
+    assert {"parse", "grammar", "apply", "serialize"} <= set(memory["stages"])
+    assert memory["stages"]["serialize"]["peak_max"] > 0
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"apply_corrections": True},
+        {"apply_until_stable": True, "max_iterations": 3},
+    ],
+)
+def test_over_budget_streams_same_response(client, monkeypatch, options):
+    """予算を超えるとストリーミングで同じ JSON を返すテスト"""
+    body = {"text": TEXT, **options}
+    # 圧縮すると ETag に接尾辞が付くので、どちらも圧縮しない表現で比べる
+    identity = {"Accept-Encoding": "identity"}
+    expected = client.post(CHECK_URL, json=body, headers=identity)
+    assert "x-response-mode" not in expected.headers
+
+    monkeypatch.setattr(proofreading, "MEMORY_REQUEST_BUDGET", 1)
+    before = client.get(METRICS_URL).json()["memory"]["compacted"]
+    response = client.post(CHECK_URL, json=body, headers=identity)
+    assert response.status_code == 200
+    assert response.headers["x-response-mode"] == "compact"
+    assert response.headers["etag"] == expected.headers["etag"]
+    assert response.json() == expected.json()
+    assert client.get(METRICS_URL).json()["memory"]["compacted"] == before + 1
+
+
+def test_over_budget_rejected(client, monkeypatch):
+    """MEMORY_BUDGET_ACTION=reject ならチェックを始める前に 413 を返すテスト"""
+    checked = []
+    run_check = proofreading._run_check
+
+    def recording_run_check(*args):
+        checked.append(args)
+        return run_check(*args)
+
+    monkeypatch.setattr(proofreading, "_run_check", recording_run_check)
+    monkeypatch.setattr(proofreading, "MEMORY_BUDGET_ACTION", "reject")
+    budget = project_text_bytes(len(TEXT))
+    monkeypatch.setattr(proofreading, "MEMORY_REQUEST_BUDGET", budget - 1)
+    response = client.post(CHECK_URL, json={"text": TEXT})
+    assert response.status_code == 413
+    assert "/jobs" in response.json()["detail"]
+    assert checked == []
+
+    monkeypatch.setattr(proofreading, "MEMORY_REQUEST_BUDGET", budget)
+    assert client.post(CHECK_URL, json={"text": TEXT}).status_code == 200
+    assert len(checked) == 1
+
+
+def _budget_app(received):
+    async def check(request):
+        received.append(await request.body())
+        return JSONResponse({"ok": True})
+
+    app = Starlette(
+        routes=[Route(CHECK_URL, check, methods=["POST"])],
+        middleware=[Middleware(MemoryMiddleware, budget=8_000)],
+    )
+    app.state.memory_stats = MemoryStats()
+    return app
+
+
+def test_large_body_rejected_before_parsing():
+    """Content-Length から見積もって本文を読み込む前に 413 を返すテスト"""
+    received = []
+    app = _budget_app(received)
+    with TestClient(app) as test_client:
+        assert test_client.post(CHECK_URL, content=b"x" * 500).status_code == 200
+        response = test_client.post(CHECK_URL, content=b"x" * 5_000)
+
+    assert response.status_code == 413
+    assert received == [b"x" * 500]
+    assert app.state.memory_stats.snapshot()["rejected"] == 1
+
+
+def test_chunked_body_counted_while_receiving():
+    """Content-Length のない本文も受け取ったバイト数で判定するテスト"""
+    received = []
+    app = _budget_app(received)
+
+    def chunks(count):
+        for _ in range(count):
+            yield b"x" * 250
+
+    with TestClient(app) as test_client:
+        response = test_client.post(CHECK_URL, content=chunks(2))
+        assert "content-length" not in response.request.headers
+        assert response.status_code == 200
+        assert test_client.post(CHECK_URL, content=chunks(20)).status_code == 413
+
+    assert received == [b"x" * 500]
+    assert app.state.memory_stats.snapshot()["rejected"] == 1
@@ -0,0 +1,110 @@
+import time
+
+from app.cli import main
+from app.services.grammar_checker import GrammarChecker
+from app.services.misconversion import (
+    MisconversionChecker,
+    NgramTable,
+    build_ngram_table,
+    context_ngrams,
+    count_ngrams,
+)
+
+CONFUSABLES = 'groups:\n  - ["以外", "意外"]\n  - ["対象", "対照", "対称"]\n'
+
+CORPUS = (
+    "関係者以外の立ち入りを禁止します。\n" * 6
+    + "それ以外の方法はありません。\n" * 5
+    + "意外な結果になった。\n" * 6
+    + "意外と簡単だった。\n" * 4
+    + "調査の対象者を選ぶ。\n" * 6
+    + "比較対照実験を行う。\n" * 4
+    + "左右対称の図形を描く。\n" * 4
+)
+
+
+def _build_table(tmp_path):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text(CORPUS, encoding="utf-8")
+    confusables = tmp_path / "confusables.yml"
+    confusables.write_text(CONFUSABLES, encoding="utf-8")
+    path = tmp_path / "misconversion.tbl"
+    build_ngram_table(path, [corpus], confusables_path=confusables)
+    return path
+
+
+def test_count_ngrams():
+    """語と前後の文脈 n-gram の集計テスト"""
+    assert context_ngrams("以外", "者", "の立") == ["者以外", "以外の", "以外の立"]
+
+    counts = count_ngrams(["関係者以外の立ち入り\n"], [["以外", "意外"]], 2)
+    assert counts["以外"] == 1
+    assert counts["係者以外"] == 1
+    assert counts["以外の立"] == 1
+    assert "意外" not in counts
+
+
+def test_ngram_table_lookup(tmp_path):
+    """頻度表の一括検索テスト"""
+    table = NgramTable(_build_table(tmp_path))
+
+    assert table.context == 2
+    assert table.groups == [["以外", "意外"], ["対象", "対照", "対称"]]
+    assert table.count("者以外") == 6
+    assert table.count("意外な") == 6
+    assert list(table.counts(["以外の", "存在しない", "対称の"])) == [11, 0, 4]
+
+
+def test_misconversion_detected(tmp_path):
+    """文脈に合わない同音異義語が指摘されるテスト"""
+    checker = MisconversionChecker(NgramTable(_build_table(tmp_path)))
+    text = "関係者意外の立ち入りは禁止。以外な結果だった。調査の対称者。"
+
+    corrections = checker.check(text)
+    assert [(c.original_text, c.corrected_text) for c in corrections] == [
+        ("意外", "以外"),
+        ("以外", "意外"),
+        ("対称", "対象"),
+    ]
+    for correction in corrections:
+        assert text[correction.start_pos : correction.end_pos] == (
+            correction.original_text
+        )
+        assert correction.rule_name == "誤変換候補"
+
+
+def test_correct_usage_not_flagged(tmp_path):
+    """正しい用法・根拠の乏しい文脈は指摘しないテスト"""
+    checker = MisconversionChecker(NgramTable(_build_table(tmp_path)))
+
+    assert checker.check("関係者以外は意外と少ない。左右対称の図形。") == []
+    # コーパスにない文脈では判定しない
+    assert checker.check("彼は意外だ") == []
+
+
+def test_time_budget_per_kb(tmp_path):
+    """1KB あたりの処理時間が小さいテスト"""
+    checker = MisconversionChecker(NgramTable(_build_table(tmp_path)))
+    text = "関係者意外の立ち入りは禁止です。調査の対象者を選ぶ。" * 400
+    kilobytes = len(text.encode("utf-8")) / 1024
+
+    started = time.perf_counter()
+    corrections = checker.check(text)
+    elapsed = time.perf_counter() - started
+
+    assert len(corrections) == 400
+    assert elapsed / kilobytes < 0.002
+
+
+def test_grammar_checker_uses_table(tmp_path, monkeypatch):
+    """環境変数で頻度表を指定すると文法チェックに誤変換候補が加わるテスト"""
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text(CORPUS, encoding="utf-8")
+    path = tmp_path / "cli.tbl"
+    assert main(["build-ngram-table", str(corpus), "-o", str(path)]) == 0
+
+    monkeypatch.setenv("MISCONVERSION_TABLE", str(path))
+    checker = GrammarChecker()
+
+    corrections = checker.check_grammar("関係者意外の立ち入りはは禁止")
+    assert [c.rule_name for c in corrections] == ["重複助詞修正", "誤変換候補"]
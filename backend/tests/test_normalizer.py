@@ -0,0 +1,73 @@
+from app.services.normalizer import normalize_text
+from app.services.rule_engine import RuleEngine
+
+
+def test_unchanged_text():
+    """正規化で変わらないテキストはそのまま扱うテスト"""
+    assert normalize_text("abc") is None
+    # 全角英数字・全角記号・全角空白は変換しない
+    assert normalize_text("私は学校に行く。（笑）ＡＢＣ　１２３") is None
+
+
+def test_offset_map():
+    """正規化後の範囲が元のテキストの範囲に戻るテスト"""
+    text = "ｶﾞｲﾄﾞを食べ\u200bれる"
+    normalized = normalize_text(text)
+
+    assert normalized.text == "ガイドを食べれる"
+    start = normalized.text.index("食べれる")
+    original_start, original_end = normalized.original_span(start, start + 4)
+    assert text[original_start:original_end] == "食べ\u200bれる"
+    assert text[slice(*normalized.original_span(0, 3))] == "ｶﾞｲﾄﾞ"
+
+    # 1文字が複数文字に展開された場合は展開元の文字全体
+    expanded = normalize_text("㈱です")
+    assert expanded.text == "(株)です"
+    assert expanded.original_span(1, 2) == (0, 1)
+    assert expanded.original_span(3, 5) == (1, 3)
+
+
+def test_rules_match_normalized_text():
+    """ゼロ幅空白・半角カナを含む入力にもルールが一致し、位置が元のテキストになるテスト"""
+    engine = RuleEngine()
+    text = "ｹｰｷは食べ\u200bれる。すい\u200bません"
+    corrections = list(engine.check_text_compact(text))
+
+    by_rule = {c.rule_name: c for c in corrections}
+    ra_nuki = by_rule["ら抜き言葉修正"]
+    assert ra_nuki.original_text == "食べ\u200bれる"
+    assert ra_nuki.corrected_text == "食べられる"
+    assert text[ra_nuki.start_pos : ra_nuki.end_pos] == ra_nuki.original_text
+    assert by_rule["敬語修正"].original_text == "すい\u200bません"
+    # 半角カナの指摘は元のテキストで行う
+    assert by_rule["半角カナ修正"].original_text == "ｹｰｷ"
+
+    assert engine.check_text_compact(text).apply() == "ケーキは食べられる。すみません"
+
+
+def test_normalization_disabled():
+    """正規化を無効にすると揺れのある入力には一致しないテスト"""
+    engine = RuleEngine()
+    engine.normalize_input = False
+    corrections = list(engine.check_text_compact("食べ\u200bれる"))
+    assert not any(c.rule_name == "ら抜き言葉修正" for c in corrections)
+
+
+def test_notation_checked_once_on_original(monkeypatch):
+    """表記統一は正規化したテキストではチェックせず、元のテキストで1回だけ行うテスト"""
+    engine = RuleEngine()
+    notation_checker = engine.grammar_checker.notation_checker
+    check = notation_checker.check
+    checked = []
+
+    def recording_check(text):
+        checked.append(text)
+        return check(text)
+
+    monkeypatch.setattr(notation_checker, "check", recording_check)
+    text = "ｹｰｷは食べ\u200bれる。"
+    corrections = engine.check_text_compact(text)
+
+    assert checked == [text]
+    by_rule = {c.rule_name: c for c in corrections}
+    assert by_rule["半角カナ修正"].original_text == "ｹｰｷ"
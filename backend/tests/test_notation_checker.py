@@ -0,0 +1,67 @@
+import numpy as np
+
+from app.services.grammar_checker import GrammarChecker
+from app.services.notation_checker import (
+    FULL_ALNUM,
+    HALF_ALNUM,
+    HALF_KANA,
+    JAPANESE,
+    NotationChecker,
+    classify,
+    runs,
+)
+
+
+def _pairs(text):
+    return [(c.original_text, c.corrected_text) for c in NotationChecker().check(text)]
+
+
+def test_classify_and_runs():
+    """文字種の分類と連続区間の抽出テスト"""
+    classes = classify("あＡ1ｶ😀")
+    assert list(classes[:4]) == [JAPANESE, FULL_ALNUM, HALF_ALNUM, HALF_KANA]
+    assert len(classes) == 5
+
+    starts, ends = runs(np.array([True, True, False, True]))
+    assert list(starts) == [0, 3]
+    assert list(ends) == [2, 4]
+
+
+def test_alnum_width_majority():
+    """英数字は多数派の幅に連続区間ごとにまとめて揃えるテスト"""
+    text = "ABCとDEFと２０２４年"
+    corrections = NotationChecker().check(text)
+
+    assert [(c.original_text, c.corrected_text) for c in corrections] == [
+        ("２０２４", "2024")
+    ]
+    assert text[corrections[0].start_pos : corrections[0].end_pos] == "２０２４"
+    assert corrections[0].rule_name == "英数字全角半角統一"
+    # 同数なら判定しない
+    assert _pairs("ABCと２０２４") == []
+
+
+def test_punctuation_majority():
+    """句読点は多数派に揃えるテスト"""
+    assert _pairs("これは，テスト，です、以上．") == [("、", "，")]
+    assert _pairs("一つ、二つ、三つ。四つ．五つ。") == [("．", "。")]
+    assert _pairs("一つ、二つ。") == []
+
+
+def test_half_width_katakana():
+    """半角カタカナは濁点を合成して全角に直すテスト"""
+    assert _pairs("ｶﾞｲﾄﾞを読む") == [("ｶﾞｲﾄﾞ", "ガイド")]
+
+
+def test_word_spacing_majority():
+    """英単語の前後の空白の有無を多数派に揃えるテスト"""
+    assert _pairs("これは API を使う。次に Python で書く。そしてGoで書く。") == [("Go", " Go ")]
+    assert _pairs("GoとRustを使い、Java で書く。") == [("Java ", "Java")]
+    # 数字だけの並びは対象外
+    assert _pairs("第2回と第3回と Go を使う") == []
+
+
+def test_grammar_checker_includes_notation():
+    """文法チェックの結果に表記統一が含まれるテスト"""
+    corrections = GrammarChecker().check_grammar("本をを読む。ﾃｽﾄです。")
+    assert [c.rule_name for c in corrections] == ["重複助詞修正", "半角カナ修正"]
@@ -0,0 +1,63 @@
+
+from app.services.paragraph_cache import ParagraphCache, split_paragraphs
+
+SIGNATURE = "株式会社サンプル 営業部 山田太郎。本メールの内容は機密情報を含む場合があります。"
+DISCLAIMER = "すいません、資料を送らせて頂きます。頭痛が痛いので後で後悔する（笑）。"
+
+
+def _records(engine, text, cache=None):
+    engine.paragraph_cache = cache
+    try:
+        return list(engine.check_text_compact(text).records())
+    finally:
+        engine.paragraph_cache = None
+
+
+def test_split_paragraphs():
+    """改行で段落に分けるテスト"""
+    assert split_paragraphs("あ\nいう\n") == [(0, 1), (2, 4), (5, 5)]
+    assert split_paragraphs("") == [(0, 0)]
+
+
+def test_cached_paragraphs_match_full_check(engine):
+    """キャッシュした段落の結果を位置をずらして使い、全文のチェックと一致するテスト"""
+    cache = ParagraphCache(engine, min_chars=8)
+    documents = [
+        f"案件{i}の件で連絡しました。私はは明日伺います。\n{DISCLAIMER}\n{SIGNATURE}" for i in range(5)
+    ]
+    for text in documents:
+        assert _records(engine, text, cache) == _records(engine, text)
+
+    metrics = cache.metrics()
+    assert metrics["misses"] == 5 + 2
+    assert metrics["hits"] == 2 * 4
+    assert metrics["entries"] == 7
+
+
+def test_document_checks_use_full_text(engine):
+    """文体統一のような文書全体のチェックは段落がキャッシュにあっても全文で行うテスト"""
+    cache = ParagraphCache(engine, min_chars=1)
+    plain = "これは例文である。それは本である。"
+    assert not [r for r in _records(engine, plain, cache) if r["rule_name"] == "文体統一"]
+
+    mixed = plain + "\nこれは例文です。"
+    records = _records(engine, mixed, cache)
+    assert cache.metrics()["hits"] == 1
+    assert [r for r in records if r["rule_name"] == "文体統一"]
+    assert records == _records(engine, mixed)
+
+
+def test_size_bounded_eviction(engine):
+    """推定バイト数の上限を超えたら古い段落から捨てるテスト"""
+    cache = ParagraphCache(engine, max_bytes=20000, min_chars=1)
+    for i in range(100):
+        _records(engine, f"{i}番目の段落です。{DISCLAIMER}", cache)
+
+    metrics = cache.metrics()
+    assert metrics["evictions"] > 0
+    assert 0 < metrics["bytes"] <= 20000
+    assert metrics["entries"] < 100
+
+    # 最近使った段落は残っている
+    _records(engine, f"99番目の段落です。{DISCLAIMER}", cache)
+    assert cache.metrics()["hits"] == 1
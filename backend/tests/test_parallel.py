@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from app.services.parallel import ParallelChecker, split_shards
+from app.services.rule_engine import CheckCancelled
+
+# 文境界のない長い行・断片の境界をまたぐ表現を含む文書
+DOCUMENT = (
+    "これは例文である。私はは学校は行く。" * 30
+    + "\n"
+    + "頭痛が痛いのでははは休みます１２３４５６７８９０" * 20
+    + "\n"
+    + "すいません、資料を送らせて頂きます。本をを読みます。" * 30
+)
+
+
+@pytest.fixture(scope="module")
+def checker(engine):
+    checker = ParallelChecker(engine, workers=2, min_chars=0, shard_chars=200)
+    yield checker
+    checker.close()
+
+
+def test_split_shards_cover_text():
+    """断片の担当範囲が隙間なく並び、重なりが十分あるテスト"""
+    shards = split_shards(DOCUMENT, 200, 10)
+
+    assert len(shards) > 3
+    assert shards[0].core_start == 0
+    assert shards[-1].core_end == len(DOCUMENT)
+    for previous, shard in zip(shards, shards[1:]):
+        assert previous.core_end == shard.core_start
+    for shard in shards:
+        assert shard.start <= max(0, shard.core_start - 10)
+        assert shard.end >= min(len(DOCUMENT), shard.core_end + 10)
+    # 近くに文境界があれば重なりをそこまで広げる
+    assert DOCUMENT[shards[1].start - 1] == "。"
+
+
+def test_parallel_matches_serial(engine, checker):
+    """分割して並列にチェックした結果が逐次チェックと一致するテスト"""
+    expected = engine.check_text_compact(DOCUMENT)
+    store = checker.check(DOCUMENT)
+
+    assert list(store) == list(expected)
+    assert store.apply() == expected.apply()
+    # 文体統一は文書全体の出現数で判定される
+    assert any(c.rule_name == "文体統一" for c in store)
+
+
+def test_engine_delegates_large_text(engine, checker):
+    """大きなテキストだけが並列チェックに回されるテスト"""
+    checker.min_chars = 1000
+    engine.parallel = checker
+    try:
+        assert not checker.should_split("食べれる")
+        assert checker.should_split(DOCUMENT)
+        assert list(engine.check_text_compact(DOCUMENT)) == list(
+            checker.check(DOCUMENT)
+        )
+    finally:
+        engine.parallel = None
+        checker.min_chars = 0
+
+
+def test_parallel_cancel(checker):
+    """中断フラグで並列チェックが中断されるテスト"""
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    with pytest.raises(CheckCancelled):
+        checker.check(DOCUMENT, cancel_event)
@@ -99,4 +99,24 @@ def test_long_text(client: TestClient):
     
     assert response.status_code == 200
     data = response.json()
-    assert data["ai_processing_recommended"] == True
\ No newline at end of file
+    assert data["ai_processing_recommended"] == True
+
+
+def test_proofreading_apply_until_stable(client: TestClient):
+    """修正がなくなるまで適用し、適用の履歴を返すテスト"""
+    response = client.post(
+        "/api/v1/proofreading/check",
+        json={
+            "text": "本はははは読む。",
+            "apply_until_stable": True
+        }
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    
+    assert data["corrected_text"] == "本を読む。"
+    assert data["iterations"] == 3
+    assert data["converged"] is True
+    assert [step["iteration"] for step in data["correction_chain"]] == [1, 1, 2, 3]
+    assert data["correction_chain"][-1]["corrected_text"] == "本を読む"
@@ -0,0 +1,147 @@
+import pytest
+
+from app.services import rule_engine as rule_engine_module
+from app.services.grammar_checker import GrammarChecker
+from app.services.rule_compiler import prune_ruleset, regex_literal
+from app.services.rule_engine import Rule, RuleEngine, RulePattern
+from app.services.tenants import compile_overlay
+
+TEXTS = [
+    "すいません、資料を送らせて頂きます。私はは明日学校でで本をを読みます。",
+    "大きい犬の声がうるさい新しい町で、頭痛が痛いので後で後悔する。",
+    "ご確認させて頂いて、すみませんがよろしくお願いします。",
+]
+
+
+def _rule(name, patterns, priority=1):
+    return Rule(
+        name=name,
+        category="grammar",
+        priority=priority,
+        patterns=[
+            RulePattern(pattern, replacement, "", type=kind, regex=regex)
+            for pattern, replacement, kind, regex in patterns
+        ],
+    )
+
+
+def test_regex_literal():
+    """一致が固定の正規表現だけをリテラルとみなすテスト"""
+    assert regex_literal("させて頂") == "させて頂"
+    assert regex_literal(r"\.") == "."
+    assert regex_literal("はは?") is None
+    assert regex_literal("(?i)abc") is None
+
+
+def test_prune_findings():
+    """冗長なパターンを報告し、結果の変わらないものだけを取り除くテスト"""
+    rules = [
+        _rule(
+            "first",
+            [
+                ("させて頂", "させていただ", "literal", None),
+                ("新しい町", "新しい町", "literal", None),
+                ("すいません", "すみません", "literal", None),
+            ],
+        ),
+        _rule(
+            "second",
+            [
+                ("させて頂く", "させていただく", "literal", None),
+                ("すいません", "すみません", "regex", "すいません"),
+                ("させて頂", "させて戴", "literal", None),
+                ("犬", "", "check_only", None),
+            ],
+            priority=2,
+        ),
+        _rule("third", [("新しい町", "新しい町", "literal", None)], priority=3),
+    ]
+    tables = [
+        (
+            0,
+            "grammar",
+            0.9,
+            [
+                ("すいません", "すみません", ""),
+                ("ですます", "ですます", ""),
+                ("すいません", "済みません", ""),
+            ],
+        ),
+        (1, "other", 0.8, [("すいません", "すみません", "")]),
+    ]
+
+    pruned_tables, report = prune_ruleset(rules, tables)
+
+    findings = {(f.kind, f.rule_name, f.pattern, f.removed) for f in report.findings}
+    assert findings == {
+        ("self_replacement", "first", "新しい町", False),
+        ("self_replacement", "third", "新しい町", False),
+        ("subsumed", "second", "させて頂く", False),
+        ("duplicate", "second", "すいません", False),
+        ("unreachable", "second", "させて頂", False),
+        ("no_op", "second", "犬", False),
+        # 別のルールのパターンと重なっていても、表の中で最初なら残す
+        ("duplicate", "grammar", "すいません", False),
+        ("self_replacement", "grammar", "ですます", True),
+        ("unreachable", "grammar", "すいません", True),
+        ("duplicate", "other", "すいません", False),
+    }
+    assert pruned_tables == [
+        (0, "grammar", 0.9, [("すいません", "すみません", "")]),
+        (1, "other", 0.8, [("すいません", "すみません", "")]),
+    ]
+    assert (report.patterns_before, report.patterns_after) == (12, 10)
+    assert len(report.removed()) == 2
+    # 元の表は書き換えない
+    assert len(tables[0][3]) == 3
+
+
+def test_shipped_ruleset_report():
+    """同梱のルールセットでは包含を報告するだけでルールを書き換えないテスト"""
+    engine = RuleEngine()
+    report = engine.prune_report
+    assert report is not None
+
+    subsumed = {
+        (f.pattern, f.kept_pattern, f.removed)
+        for f in report.findings
+        if f.kind == "subsumed"
+    }
+    assert ("させて頂く", "させて頂", False) in subsumed
+    assert "させて頂く" in {
+        p[0]
+        for _, _, _, patterns in engine.grammar_checker.LOCAL_CHECKS
+        for p in patterns
+    }
+    # 取り除くのは文法チェッカーの表の自分自身への置換だけ
+    assert {(f.kind, f.pattern) for f in report.removed()} == {
+        ("self_replacement", "新しい町")
+    }
+    # クラスの表は書き換えない
+    assert engine.grammar_checker.LOCAL_CHECKS is not GrammarChecker.LOCAL_CHECKS
+
+
+def _rule_info(engine):
+    return [(rule.name, rule.category, len(rule.patterns)) for rule in engine.rules]
+
+
+def _tenant_records(engine, text):
+    overlay = compile_overlay(engine, "t", {"disable": ["敬語修正", "重複助詞修正"]}, 0)
+    return list(overlay.check_text_compact(engine, text).records())
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_pruning_keeps_check_results(monkeypatch, text):
+    """パターンを取り除いてもチェックの結果・ルール一覧が変わらないテスト"""
+    pruned = RuleEngine()
+    monkeypatch.setattr(rule_engine_module, "RULESET_PRUNE", False)
+    full = RuleEngine()
+    assert full.prune_report is None
+    assert pruned.result_version == full.result_version
+
+    assert pruned.check_text(text) == full.check_text(text)
+    assert list(pruned.check_text_compact(text).records()) == list(
+        full.check_text_compact(text).records()
+    )
+    assert _rule_info(pruned) == _rule_info(full)
+    assert _tenant_records(pruned, text) == _tenant_records(full, text)
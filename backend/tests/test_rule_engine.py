@@ -174,4 +174,29 @@ def test_confidence_scores():
     # 重複助詞は高いconfidenceを持つはず
     duplicate_corrections = [c for c in corrections if "重複" in c.description]
     if duplicate_corrections:
-        assert duplicate_corrections[0].confidence >= 0.8
\ No newline at end of file
+        assert duplicate_corrections[0].confidence >= 0.8
+
+
+def test_apply_until_stable():
+    """修正で新たに生じた誤りも適用されるまで繰り返すテスト"""
+    engine = RuleEngine()
+    text = "本はははは読む。"
+    
+    # 1回の適用では重複助詞が残る
+    assert engine.check_text_compact(text).apply() == "本はは読む。"
+    
+    result = engine.apply_until_stable(text)
+    assert result.text == "本を読む。"
+    assert result.converged
+    assert result.iterations == 3
+    # 2回目以降は書き換えた範囲にかかる修正だけ
+    assert [c.corrected_text for c in result.rounds[1]] == ["は"]
+    assert result.rounds[2][0].original_text == "本は読む"
+    
+    # 上限回数で打ち切る
+    capped = engine.apply_until_stable(text, max_iterations=1)
+    assert capped.text == "本はは読む。"
+    assert not capped.converged
+    
+    # 修正のないテキストはそのまま
+    assert engine.apply_until_stable("正しい文です。").iterations == 0
@@ -0,0 +1,129 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from app.services import rule_engine as rule_engine_module
+from app.services.matcher import LiteralMatcher
+from app.services.rule_engine import RuleEngine
+from app.services.ruleset_bundle import BundleError, RulesetBundle
+
+RULES_DIR = Path(__file__).parent.parent / "app" / "rules"
+
+SAMPLE_TEXT = "私はは学校は行って、本をを読みます。食べれるケーキで頭痛が痛い（笑）１２３"
+
+
+def _find_all(text, patterns):
+    """str.find による参照実装"""
+    hits = []
+    for pattern_id, pattern in enumerate(patterns):
+        start = 0
+        while True:
+            pos = text.find(pattern, start)
+            if pos == -1:
+                break
+            hits.append((pattern_id, pos, pos + len(pattern)))
+            start = pos + 1
+    return sorted(hits)
+
+
+def test_literal_matcher_overlapping_patterns():
+    """重なり・包含関係にあるパターンの照合テスト"""
+    patterns = ["はは", "私はは", "ははは", "は", "させて頂", "させて頂く"]
+    text = "私ははは、させて頂きます。させて頂く"
+    matcher = LiteralMatcher.build(patterns)
+
+    assert sorted(matcher.finditer(text)) == _find_all(text, patterns)
+    assert matcher.max_length == 5
+
+
+def test_literal_matcher_empty_inputs():
+    """空のパターン・テキストのテスト"""
+    matcher = LiteralMatcher.build(["", "あ"])
+    assert list(matcher.finditer("")) == []
+    assert list(matcher.finditer("ああ")) == [(1, 0, 1), (1, 1, 2)]
+
+
+def test_bundle_round_trip(tmp_path):
+    """バンドルの書き出しと mmap 読み込みのテスト"""
+    bundle_path = tmp_path / "rules.bundle"
+    engine = RuleEngine(bundle_path=str(bundle_path))
+    reference = RuleEngine()
+
+    assert bundle_path.exists()
+    assert engine.bundle is not None
+    assert engine.bundle.fingerprint == reference.fingerprint
+    assert engine.rules == reference.rules
+
+    # 2回目は書き出し済みのバンドルをそのまま使う
+    mtime = bundle_path.stat().st_mtime_ns
+    reopened = RuleEngine(bundle_path=str(bundle_path))
+    assert bundle_path.stat().st_mtime_ns == mtime
+    assert reopened.rules == reference.rules
+    assert list(reopened.check_text_compact(SAMPLE_TEXT)) == reference.check_text(
+        SAMPLE_TEXT
+    )
+
+
+def test_bundle_invalidated_by_fingerprint(tmp_path):
+    """ルール変更でバンドルが作り直されるテスト"""
+    rules_dir = tmp_path / "rules"
+    shutil.copytree(RULES_DIR, rules_dir)
+    bundle_path = tmp_path / "rules.bundle"
+
+    RuleEngine(str(rules_dir), bundle_path=str(bundle_path))
+    old_fingerprint = RulesetBundle(bundle_path).fingerprint
+
+    with open(rules_dir / "basic_rules.yml", "a", encoding="utf-8") as f:
+        f.write(
+            "\n  extra:\n"
+            '    name: "追加ルール"\n'
+            '    category: "redundancy"\n'
+            "    priority: 9\n"
+            "    patterns:\n"
+            '      - pattern: "馬から落馬"\n'
+            '        replacement: "落馬"\n'
+            '        description: "重複表現"\n'
+        )
+
+    engine = RuleEngine(str(rules_dir), bundle_path=str(bundle_path))
+    assert RulesetBundle(bundle_path).fingerprint != old_fingerprint
+    assert any(c.corrected_text == "落馬" for c in engine.check_text_compact("馬から落馬した"))
+
+
+def test_corrupt_bundle_is_rebuilt(tmp_path):
+    """壊れたバンドルが作り直されるテスト"""
+    bundle_path = tmp_path / "rules.bundle"
+    bundle_path.write_bytes(b"broken")
+
+    with pytest.raises(BundleError):
+        RulesetBundle(bundle_path)
+
+    engine = RuleEngine(bundle_path=str(bundle_path))
+    assert RulesetBundle(bundle_path).fingerprint == engine.fingerprint
+
+
+@pytest.mark.parametrize("cut", [0, 10, 60, -8])
+def test_truncated_bundle_falls_back_to_yaml(tmp_path, cut):
+    """空・途中で切れたバンドルでも YAML から読み直して作り直すテスト"""
+    bundle_path = tmp_path / "rules.bundle"
+    reference = RuleEngine(bundle_path=str(bundle_path))
+    data = bundle_path.read_bytes()
+    bundle_path.write_bytes(data[:cut])
+
+    engine = RuleEngine(bundle_path=str(bundle_path))
+    assert engine.rules == reference.rules
+    assert bundle_path.read_bytes() == data
+
+
+def test_automaton_matches_find(tmp_path, monkeypatch):
+    """オートマトン照合と str.find 照合の結果が一致するテスト"""
+    reference = RuleEngine()
+
+    monkeypatch.setattr(rule_engine_module, "AUTOMATON_MIN_PATTERNS", 0)
+    engine = RuleEngine(bundle_path=str(tmp_path / "rules.bundle"))
+    assert engine.use_automaton
+
+    assert list(engine.check_text_compact(SAMPLE_TEXT)) == list(
+        reference.check_text_compact(SAMPLE_TEXT)
+    )
@@ -0,0 +1,173 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import HTTPConnection
+
+from app.services.scheduler import (
+    Lane,
+    LaneScheduler,
+    Overloaded,
+    RateLimited,
+    TokenBucket,
+    client_id,
+)
+
+
+async def _block(scheduler, lane=Lane.BULK):
+    """ワーカーを塞ぐジョブを投入し、解放用のイベントを返す"""
+    release = threading.Event()
+    task = asyncio.ensure_future(scheduler.submit(lane, "blocker", release.wait, 5))
+    while scheduler.queue_depth or not scheduler._stats[lane].started:
+        await asyncio.sleep(0.01)
+    return release, task
+
+
+def test_weighted_fair_order():
+    """重みの大きいレーンが先に取り出されるテスト"""
+
+    async def scenario():
+        scheduler = LaneScheduler(workers=1, client_rate=0)
+        release, blocker = await _block(scheduler)
+        order = []
+
+        tasks = [
+            asyncio.ensure_future(scheduler.submit(lane, "c", order.append, lane))
+            for lane in [Lane.BULK] * 3 + [Lane.INTERACTIVE] * 8
+        ]
+        await asyncio.sleep(0.05)
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+        metrics = scheduler.metrics()
+        await scheduler.stop()
+        return order, metrics
+
+    order, metrics = asyncio.run(scenario())
+
+    # 8:1 の比で取り出し、bulk も飢餓状態にはならない
+    assert order[:9].count(Lane.INTERACTIVE) == 8
+    assert order[:9].count(Lane.BULK) == 1
+    assert metrics["lanes"]["interactive"]["completed"] == 8
+    assert metrics["lanes"]["bulk"]["completed"] == 4
+    assert metrics["lanes"]["bulk"]["wait_max_ms"] > 0
+
+
+def test_token_bucket():
+    """トークンバケットの補充テスト"""
+    bucket = TokenBucket(rate=1, burst=2)
+    now = bucket.updated
+
+    assert bucket.try_acquire(now)
+    assert bucket.try_acquire(now)
+    assert not bucket.try_acquire(now)
+    assert bucket.try_acquire(now + 1)
+
+
+def test_client_rate_limit():
+    """クライアントごとの流量制限テスト"""
+
+    async def scenario():
+        scheduler = LaneScheduler(workers=1, client_rate=0.01, client_burst=2)
+        await scheduler.submit(Lane.STANDARD, "a", len, "x")
+        await scheduler.submit(Lane.STANDARD, "a", len, "x")
+        with pytest.raises(RateLimited) as excinfo:
+            await scheduler.submit(Lane.STANDARD, "a", len, "x")
+        assert excinfo.value.status_code == 429
+        # 別のクライアントは制限されない
+        assert await scheduler.submit(Lane.STANDARD, "b", len, "xy") == 2
+        metrics = scheduler.metrics()
+        await scheduler.stop()
+        return metrics
+
+    metrics = asyncio.run(scenario())
+    assert metrics["lanes"]["standard"]["rate_limited"] == 1
+
+
+def _connection(peer, headers):
+    return HTTPConnection(
+        {
+            "type": "http",
+            "client": (peer, 50000),
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+def test_client_id_trusts_headers_only_from_proxies():
+    """X-Client-Id・X-Forwarded-For は信頼するプロキシからのときだけ使うテスト"""
+    proxies = frozenset({"10.0.0.1"})
+    headers = {"X-Client-Id": "rotating-1", "X-Forwarded-For": "203.0.113.5"}
+    # 直接の接続ではヘッダーを替えても接続元アドレスで制限される
+    assert client_id(_connection("198.51.100.7", headers), proxies) == "198.51.100.7"
+    assert client_id(_connection("10.0.0.1", headers), proxies) == "rotating-1"
+
+    forwarded = {"X-Forwarded-For": "spoofed, 203.0.113.5, 10.0.0.1"}
+    assert client_id(_connection("10.0.0.1", forwarded), proxies) == "203.0.113.5"
+
+
+def test_bulk_shed_first():
+    """キューが深くなると bulk レーンから打ち切られるテスト"""
+
+    async def scenario():
+        scheduler = LaneScheduler(
+            workers=1, client_rate=0, bulk_shed_depth=1, max_queue_depth=3
+        )
+        release, blocker = await _block(scheduler, Lane.STANDARD)
+        queued = asyncio.ensure_future(scheduler.submit(Lane.STANDARD, "c", len, "a"))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(Overloaded):
+            await scheduler.submit(Lane.BULK, "c", len, "a")
+        standard = asyncio.ensure_future(
+            scheduler.submit(Lane.STANDARD, "c", len, "ab")
+        )
+        await asyncio.sleep(0.01)
+
+        release.set()
+        results = await asyncio.gather(blocker, queued, standard)
+        metrics = scheduler.metrics()
+        await scheduler.stop()
+        return results, metrics
+
+    results, metrics = asyncio.run(scenario())
+    assert results[1:] == [1, 2]
+    assert metrics["lanes"]["bulk"]["shed"] == 1
+    assert metrics["lanes"]["standard"]["shed"] == 0
+
+
+def test_cancelled_job_skipped():
+    """待機中に取り消されたジョブを実行しないテスト"""
+
+    async def scenario():
+        scheduler = LaneScheduler(workers=1, client_rate=0)
+        release, blocker = await _block(scheduler)
+        executed = []
+        task = asyncio.ensure_future(
+            scheduler.submit(Lane.INTERACTIVE, "c", executed.append, 1)
+        )
+        await asyncio.sleep(0.01)
+        task.cancel()
+        release.set()
+        await blocker
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return executed
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_check_lane_header_and_metrics(client: TestClient):
+    """X-Priority-Lane ヘッダーとメトリクスエンドポイントのテスト"""
+    response = client.post(
+        "/api/v1/proofreading/check",
+        json={"text": "食べれる"},
+        headers={"X-Priority-Lane": "bulk", "X-Client-Id": "batch-1"},
+    )
+    assert response.status_code == 200
+
+    response = client.get("/api/v1/proofreading/metrics")
+    assert response.status_code == 200
+    lanes = response.json()["scheduler"]["lanes"]
+    assert set(lanes) == {"interactive", "standard", "bulk"}
+    assert lanes["bulk"]["completed"] >= 1
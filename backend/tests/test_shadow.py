@@ -0,0 +1,134 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from app.services.rule_engine import RuleEngine
+from app.services.ruleset_bundle import RulesetBundle
+from app.services.shadow import (
+    CpuBudget,
+    ShadowEvaluator,
+    ShadowSample,
+    create_shadow_evaluator,
+)
+
+RULES_DIR = Path(__file__).parent.parent / "app" / "rules"
+TEXT = "頭痛が痛いので、すごい疲れた。このケーキは食べれる。"
+
+CANDIDATE_RULE = """rules:
+  intensifier:
+    name: "強調表現修正"
+    category: "style"
+    priority: 5
+    patterns:
+      - pattern: "すごい疲れた"
+        replacement: "すごく疲れた"
+        description: "形容詞の連用形"
+"""
+
+
+@pytest.fixture(scope="module")
+def engines(tmp_path_factory):
+    candidate_dir = tmp_path_factory.mktemp("candidate") / "rules"
+    shutil.copytree(RULES_DIR, candidate_dir)
+    basic = candidate_dir / "basic_rules.yml"
+    basic.write_text(
+        basic.read_text(encoding="utf-8").replace("頭痛がする", "頭が痛い"),
+        encoding="utf-8",
+    )
+    (candidate_dir / "candidate_rules.yml").write_text(CANDIDATE_RULE, encoding="utf-8")
+    return RuleEngine(), RuleEngine(str(candidate_dir))
+
+
+def test_candidate_keeps_live_bundle(engines, tmp_path, monkeypatch):
+    """RULESET_BUNDLE を設定していても候補が本番のバンドルを上書きしないテスト"""
+    bundle_path = tmp_path / "rules.bundle"
+    monkeypatch.setenv("RULESET_BUNDLE", str(bundle_path))
+    live = RuleEngine()
+    assert RulesetBundle(bundle_path).fingerprint == live.fingerprint
+
+    evaluator = create_shadow_evaluator(live, engines[1].rules_dir)
+    try:
+        assert evaluator.candidate.fingerprint != live.fingerprint
+        assert RulesetBundle(bundle_path).fingerprint == live.fingerprint
+        shadow_bundle = RulesetBundle(f"{bundle_path}.shadow")
+        assert shadow_bundle.fingerprint == evaluator.candidate.fingerprint
+    finally:
+        evaluator.stop()
+
+
+def _sample(engine, text=TEXT):
+    return ShadowSample(text, engine.check_text_compact(text), 0.001)
+
+
+def test_compare_live_and_candidate(engines):
+    """本番と候補の修正の違いがルールごとに集計されるテスト"""
+    live, candidate = engines
+    shadow = ShadowEvaluator(live, candidate, sample_rate=1.0, cpu_budget=10.0)
+    try:
+        assert shadow.should_sample()
+        assert shadow.submit(_sample(live))
+        assert shadow.submit(_sample(live, "今日は晴れです。"))
+        shadow.drain()
+        report = shadow.report()
+    finally:
+        shadow.stop()
+
+    assert report["evaluated"] == 2
+    assert report["disagreeing_requests"] == 1
+    corrections = report["corrections"]
+    assert corrections["only_live"] == 1
+    assert corrections["only_candidate"] == 2
+    assert corrections["candidate"] == corrections["live"] + 1
+    assert report["rules"]["重複表現修正"] == {"added": 1, "removed": 1}
+    assert report["rules"]["強調表現修正"] == {"added": 1, "removed": 0}
+    assert report["cpu_ms"]["candidate_mean"] > 0
+    assert report["live_ruleset"] != report["candidate_ruleset"]
+
+
+def test_shadow_work_is_dropped(engines):
+    """予算切れ・混雑時・待ち行列があふれたときに評価を捨てるテスト"""
+    live, candidate = engines
+    shadow = ShadowEvaluator(live, candidate, sample_rate=1.0, cpu_budget=0.0)
+    shadow.stop()
+    assert not shadow.should_sample()
+
+    shadow.budget = CpuBudget(1.0)
+    shadow.busy = lambda: True
+    assert not shadow.should_sample()
+    shadow.busy = None
+    assert shadow.should_sample()
+
+    sample = _sample(live)
+    for _ in range(shadow._queue.maxsize):
+        assert shadow.submit(sample)
+    assert not shadow.submit(sample)
+    assert shadow.report()["dropped"] == {"budget": 1, "load": 1, "queue_full": 1}
+
+    unsampled = ShadowEvaluator(live, candidate, sample_rate=0.0)
+    unsampled.stop()
+    assert not unsampled.should_sample()
+    assert unsampled.report()["dropped"] == {}
+
+
+def test_shadow_report_api(client, engines):
+    """/check の後に評価され、/shadow/report で集計を参照できるテスト"""
+    assert client.get("/api/v1/proofreading/shadow/report").json() == {"enabled": False}
+
+    live, candidate = engines
+    state = client.app.state.engine_state
+    state.shadow = ShadowEvaluator(live, candidate, sample_rate=1.0, cpu_budget=10.0)
+    try:
+        response = client.post("/api/v1/proofreading/check", json={"text": TEXT})
+        assert response.status_code == 200
+        state.shadow.drain()
+        report = client.get(
+            "/api/v1/proofreading/shadow/report", params={"reset": True}
+        ).json()
+        assert report["enabled"]
+        assert report["evaluated"] == 1
+        assert report["rules"]["強調表現修正"]["added"] == 1
+        assert state.shadow.report()["evaluated"] == 0
+    finally:
+        state.shadow.stop()
+        state.shadow = None
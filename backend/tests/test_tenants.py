@@ -0,0 +1,223 @@
+import os
+
+import pytest
+import yaml
+from fastapi.testclient import TestClient
+
+from app.services import tenants as tenants_module
+from app.services.tenants import TenantError, TenantRegistry
+
+ACME_RULES = """
+disable:
+  - "重複表現修正"
+rules:
+  product_names:
+    name: "製品名表記"
+    category: "formatting"
+    priority: 1
+    patterns:
+      - pattern: "ぷるーふ"
+        replacement: "Proof"
+        description: "製品名の表記"
+  ra_nuki:
+    name: "ら抜き言葉修正"
+    category: "grammar"
+    priority: 1
+    patterns:
+      - pattern: "見れる"
+        replacement: "ご覧になれる"
+        description: "社内表記"
+"""
+
+TEXT = "ぷるーふは頭痛が痛いときも食べれるし見れる"
+
+
+@pytest.fixture
+def registry(engine, tmp_path):
+    (tmp_path / "acme.yml").write_text(ACME_RULES, encoding="utf-8")
+    return TenantRegistry(engine, str(tmp_path), capacity=2)
+
+
+def _corrections(store):
+    return {(c.original_text, c.corrected_text, c.rule_name) for c in store}
+
+
+def test_overlay_adds_and_disables_rules(engine, registry):
+    """差分ルールの追加・基本ルールの無効化・置き換えのテスト"""
+    meta_size = len(engine.correction_meta)
+    corrections = _corrections(registry.check_text_compact("acme", TEXT))
+
+    assert ("ぷるーふ", "Proof", "製品名表記") in corrections
+    assert ("見れる", "ご覧になれる", "ら抜き言葉修正") in corrections
+    # 無効化した基本ルールと、置き換えた基本ルールの元のパターン
+    assert not any(rule == "重複表現修正" for _, _, rule in corrections)
+    assert ("食べれる", "食べられる", "ら抜き言葉修正") not in corrections
+
+    # 共有のルールエンジンは変更されない
+    assert len(engine.correction_meta) == meta_size
+    base = _corrections(engine.check_text_compact(TEXT))
+    assert ("頭痛が痛い", "頭痛がする", "重複表現修正") in base
+    assert not any(rule == "製品名表記" for _, _, rule in base)
+
+
+def test_unknown_tenant_uses_base_rules(engine, registry):
+    """差分のないテナントは基本ルールだけでチェックされるテスト"""
+    assert registry.get("other") is None
+    assert list(registry.check_text_compact("other", TEXT)) == list(
+        engine.check_text_compact(TEXT)
+    )
+    assert list(registry.check_text_compact(None, TEXT)) == list(
+        engine.check_text_compact(TEXT)
+    )
+
+
+def test_overlay_apply_uses_overlay_meta(registry):
+    """差分ルールの修正が適用されるテスト"""
+    store = registry.check_text_compact("acme", "ぷるーふを見れる")
+    assert store.apply() == "Proofをご覧になれる"
+
+
+PREFERRED_RULES = """
+rules:
+  apology:
+    name: "謝罪表記"
+    category: "politeness"
+    priority: 1
+    patterns:
+      - pattern: "すいません"
+        replacement: "申し訳ありません"
+        description: "社内表記"
+"""
+
+
+def test_overlay_wins_same_span(engine, tmp_path):
+    """同じ範囲では無効にしていない基本ルールより差分の修正を適用するテスト"""
+    (tmp_path / "acme.yml").write_text(PREFERRED_RULES, encoding="utf-8")
+    registry = TenantRegistry(engine, str(tmp_path))
+    store = registry.check_text_compact("acme", "すいません、遅れます")
+
+    corrections = _corrections(store)
+    assert ("すいません", "すみません", "敬語修正") in corrections
+    assert ("すいません", "申し訳ありません", "謝罪表記") in corrections
+    assert store.apply() == "申し訳ありません、遅れます"
+
+    result = registry.apply_until_stable("acme", "すいません、遅れます")
+    assert result.text == "申し訳ありません、遅れます"
+
+
+def test_overlay_automaton_matches_find(engine, registry, monkeypatch):
+    """差分のリテラルをオートマトンで照合しても str.find と同じ結果になるテスト"""
+    expected = list(registry.check_text_compact("acme", TEXT).records())
+    assert registry.get("acme").matcher is None
+
+    monkeypatch.setattr(tenants_module, "AUTOMATON_MIN_PATTERNS", 0)
+    data = yaml.safe_load(ACME_RULES)
+    overlay = tenants_module.compile_overlay(engine, "acme", data)
+    assert overlay.matcher is not None
+    assert list(overlay.check_text_compact(engine, TEXT).records()) == expected
+
+
+def test_lru_eviction_and_reload(registry, tmp_path):
+    """LRU による追い出しとファイル更新時の再コンパイルのテスト"""
+    for name in ("beta", "gamma"):
+        (tmp_path / f"{name}.yml").write_text("rules: {}\n", encoding="utf-8")
+
+    acme = registry.get("acme")
+    assert registry.get("acme") is acme
+    registry.get("beta")
+    registry.get("gamma")
+    assert registry.metrics()["cached_tenants"] == 2
+    assert registry.stats["evictions"] == 1
+
+    path = tmp_path / "gamma.yml"
+    path.write_text(ACME_RULES, encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert registry.get("gamma").pattern_count == 2
+
+
+def test_invalid_tenant(registry, tmp_path):
+    """不正なテナントID・壊れた差分ファイルのテスト"""
+    with pytest.raises(TenantError):
+        registry.get("../etc/passwd")
+
+    (tmp_path / "broken.yml").write_text("rules: [", encoding="utf-8")
+    with pytest.raises(TenantError):
+        registry.get("broken")
+
+
+def test_check_with_tenant_header(client: TestClient, tmp_path, monkeypatch):
+    """X-Tenant-Id ヘッダーで差分ルールが選ばれるテスト"""
+    (tmp_path / "acme.yml").write_text(ACME_RULES, encoding="utf-8")
+    tenants = client.app.state.engine_state.tenants
+    monkeypatch.setattr(tenants, "tenants_dir", tmp_path)
+
+    response = client.post(
+        "/api/v1/proofreading/check",
+        json={"text": "ぷるーふ", "apply_corrections": True},
+        headers={"X-Tenant-Id": "acme"},
+    )
+    assert response.status_code == 200
+    assert response.json()["corrected_text"] == "Proof"
+
+    response = client.post(
+        "/api/v1/proofreading/check",
+        json={"text": "ぷるーふ"},
+        headers={"X-Tenant-Id": "bad/id"},
+    )
+    assert response.status_code == 400
+
+
+FIXPOINT_RULES = """
+disable:
+  - "重複表現修正"
+rules:
+  reading:
+    name: "読み表記"
+    category: "spelling"
+    priority: 1
+    patterns:
+      - pattern: "ずつう"
+        replacement: "頭痛"
+        description: "漢字で表記"
+      - pattern: "私は学校"
+        replacement: "わたしは学校"
+        description: "社内表記"
+"""
+
+
+def test_apply_until_stable_with_overlay(engine, tmp_path):
+    """2回目以降の再チェックにもテナントの差分を重ねるテスト"""
+    (tmp_path / "acme.yml").write_text(FIXPOINT_RULES, encoding="utf-8")
+    registry = TenantRegistry(engine, str(tmp_path))
+
+    # 無効にした基本ルールは2回目以降も使わない
+    result = registry.apply_until_stable("acme", "ずつうが痛い")
+    assert result.text == "頭痛が痛い"
+    assert result.converged
+
+    # 1回目の修正で現れた差分ルールの一致は2回目に適用する
+    result = registry.apply_until_stable("acme", "私はは学校へ行く")
+    assert result.text == "わたしは学校へ行く"
+    assert result.iterations == 2
+
+    # 差分のないテナントは基本ルールのみ
+    assert registry.apply_until_stable(None, "ずつうが痛い").text == "ずつうが痛い"
+
+
+def test_check_until_stable_with_tenant_header(
+    client: TestClient, tmp_path, monkeypatch
+):
+    """apply_until_stable の再チェックでもテナントの差分が使われるテスト"""
+    (tmp_path / "acme.yml").write_text(FIXPOINT_RULES, encoding="utf-8")
+    tenants = client.app.state.engine_state.tenants
+    monkeypatch.setattr(tenants, "tenants_dir", tmp_path)
+
+    response = client.post(
+        "/api/v1/proofreading/check",
+        json={"text": "ずつうが痛い。私はは学校へ行く", "apply_until_stable": True},
+        headers={"X-Tenant-Id": "acme"},
+    )
+    assert response.status_code == 200
+    assert response.json()["corrected_text"] == "頭痛が痛い。わたしは学校へ行く"
+    assert response.json()["converged"]
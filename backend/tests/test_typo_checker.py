@@ -0,0 +1,90 @@
+from app.cli import main
+from app.services.grammar_checker import GrammarChecker
+from app.services.typo_checker import (
+    TypoChecker,
+    TypoIndex,
+    deletes,
+    edit_distance,
+    load_typo_index,
+)
+
+LEXICON = "コンピューター\t100\nコンピュータ\t50\nインターフェース\t20\nアプリケーション\t30\nProofreader\t5\n"
+
+
+def _write_lexicon(tmp_path):
+    path = tmp_path / "lexicon.txt"
+    path.write_text(LEXICON, encoding="utf-8")
+    return path
+
+
+def test_edit_distance():
+    """隣接文字の入れ替えを含む編集距離のテスト"""
+    assert edit_distance("アプリケーション", "アプリケーション", 2) == 0
+    assert edit_distance("アプリケーショソ", "アプリケーション", 2) == 1
+    assert edit_distance("アプリケシーョン", "アプリケーション", 2) == 1
+    assert edit_distance("アプリション", "アプリケーション", 2) == 2
+    assert edit_distance("アプリ", "アプリケーション", 2) == 3
+
+
+def test_deletes():
+    """削除文字列の列挙テスト"""
+    assert deletes("abc", 1) == {"abc", "bc", "ac", "ab"}
+    assert "a" in deletes("abc", 2)
+    assert "" not in deletes("ab", 2)
+
+
+def test_index_lookup(tmp_path):
+    """索引の作成と照合のテスト"""
+    lexicon = _write_lexicon(tmp_path)
+    index_path = tmp_path / "lexicon.idx"
+    assert main(["build-typo-index", str(lexicon), "-o", str(index_path)]) == 0
+
+    index = TypoIndex(index_path)
+    assert len(index) == 5
+    assert index.lookup("コンピューター") == [("コンピューター", 0, 100)]
+    assert index.lookup("コンピューダー")[0][:2] == ("コンピューター", 1)
+    assert index.lookup("インタフェース")[0][:2] == ("インターフェース", 1)
+    assert index.lookup("Proofraeder")[0][:2] == ("Proofreader", 1)
+    assert index.lookup("テレビジョン") == []
+
+
+def test_index_rebuilt_when_lexicon_changes(tmp_path):
+    """語彙表の更新で索引が作り直されるテスト"""
+    lexicon = _write_lexicon(tmp_path)
+    index_path = str(tmp_path / "lexicon.idx")
+    first = load_typo_index(str(lexicon), index_path)
+    assert len(first) == 5
+
+    with open(lexicon, "a", encoding="utf-8") as f:
+        f.write("データベース\n")
+    second = load_typo_index(str(lexicon), index_path)
+    assert second.fingerprint != first.fingerprint
+    assert len(second) == 6
+
+
+def test_typo_checker_results(tmp_path):
+    """誤字候補が CorrectionResult として返るテスト"""
+    index = load_typo_index(str(_write_lexicon(tmp_path)), None)
+    checker = TypoChecker(index)
+    text = "新しいコンピューダーのアプリケーションを使う"
+
+    corrections = checker.check(text)
+    assert len(corrections) == 1
+    correction = corrections[0]
+    assert correction.original_text == "コンピューダー"
+    assert correction.corrected_text == "コンピューター"
+    assert text[correction.start_pos : correction.end_pos] == "コンピューダー"
+    assert correction.category == "spelling"
+
+    # 形態素の表層形が与えられた場合
+    surfaces = ["新しい", "コンピューダー", "の", "アプリケーション", "を", "使う"]
+    assert checker.check(text, surfaces) == corrections
+
+
+def test_grammar_checker_uses_typo_index(tmp_path, monkeypatch):
+    """環境変数で語彙表を指定すると文法チェックに誤字候補が加わるテスト"""
+    monkeypatch.setenv("TYPO_LEXICON", str(_write_lexicon(tmp_path)))
+    checker = GrammarChecker()
+
+    corrections = checker.check_grammar("インタフェースはは便利")
+    assert [c.rule_name for c in corrections] == ["重複助詞修正", "誤字候補"]
@@ -39,12 +39,20 @@ CREATE TABLE IF NOT EXISTS proofreading_history (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Character trigram index over history texts (used by rule previews)
+CREATE TABLE IF NOT EXISTS proofreading_history_trigrams (
+    trigram VARCHAR(3) NOT NULL,
+    history_id UUID NOT NULL REFERENCES proofreading_history(id) ON DELETE CASCADE,
+    PRIMARY KEY (trigram, history_id)
+);
+
 -- Create indexes for performance
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_correction_rules_type ON correction_rules(rule_type);
 CREATE INDEX IF NOT EXISTS idx_proofreading_history_user ON proofreading_history(user_id);
 CREATE INDEX IF NOT EXISTS idx_proofreading_history_created ON proofreading_history(created_at);
+CREATE INDEX IF NOT EXISTS idx_proofreading_history_trigrams_history ON proofreading_history_trigrams(history_id);
 
 -- Insert sample data
 INSERT INTO users (email, username, hashed_password, is_admin) 